@@ -116,6 +116,14 @@ class FileDownloadAdmin(admin.ModelAdmin):
 site.register(core_models.FileDownload, FileDownloadAdmin)
 
 
+class DumpWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('destination', 'record_type', 'last_modified', 'last_id', 'modified',)
+    list_filter = ('destination',)
+
+
+site.register(core_models.DumpWatermark, DumpWatermarkAdmin)
+
+
 class FormFilter(admin.FieldListFilter):
     template = 'core/admin-form-filter.html'
 
@@ -0,0 +1,126 @@
+"""
+PostgreSQL backend which shares connections between the threads of a process using `core.db_pool`.
+Pool sizes and timeouts are set in the database's POOL settings; pooling is off if MAX_SIZE is 0.
+"""
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+
+from core.db_pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+
+def connect(conn_params, isolation_level):
+    # matches django.db.backends.postgresql.base.DatabaseWrapper.get_new_connection
+    connection = psycopg2.connect(**conn_params)
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def check(connection):
+    """
+    Health check run before handing out a connection that has been idle for a while
+    """
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    """
+    Ends any transaction left open on a connection returned to the pool and discards session state,
+    such as settings, temporary tables, advisory locks and held cursors, so that it does not leak into other requests
+    """
+    if connection.closed:
+        return False
+    try:
+        status = connection.get_transaction_status()
+        if status in (psycopg2.extensions.TRANSACTION_STATUS_INTRANS, psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+            connection.rollback()
+        # DISCARD ALL cannot run inside a transaction
+        autocommit = connection.autocommit
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('DISCARD ALL')
+        connection.autocommit = autocommit
+    except psycopg2.Error:
+        return False
+    return connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def close_database_pools(database_name):
+    close_pools(matching=lambda key: dict(key[0]).get('database') == database_name)
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # test databases cannot be dropped or copied while pooled connections to them remain open
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_database_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.connection.close()
+        close_database_pools(self.connection.settings_dict['NAME'])
+        super()._clone_test_db(suffix, verbosity, keepdb=keepdb)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def get_pool(self, conn_params):
+        pool_settings = self.settings_dict.get('POOL') or {}
+        max_size = pool_settings.get('MAX_SIZE', 0)
+        if max_size <= 0:
+            return None
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        key = (tuple(sorted(conn_params.items())), isolation_level)
+        return get_pool(self.alias, key, lambda: ConnectionPool(
+            self.alias,
+            connect=lambda: connect(conn_params, isolation_level),
+            check=check,
+            reset=reset,
+            max_size=max_size,
+            timeout=pool_settings.get('TIMEOUT', 10),
+            max_age=pool_settings.get('MAX_AGE'),
+            max_idle=pool_settings.get('MAX_IDLE'),
+            check_after=pool_settings.get('CHECK_AFTER', 0),
+        ))
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.getconn()
+        except PoolTimeout as e:
+            raise psycopg2.OperationalError(str(e)) from e
+        self.pool = pool
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        pool, self.pool = self.pool, None
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps the closed connection until the transaction is rolled back so it cannot be shared
+                pool.discard(self.connection, 'closed-in-transaction')
+            else:
+                pool.putconn(self.connection)
@@ -0,0 +1,274 @@
+"""
+Process-wide pools of database connections shared by the threads of a uWSGI process.
+
+Django opens a connection per thread and closes it at the end of each request;
+with the pooled database backend, "closing" returns the connection to a pool instead
+so that later requests skip connection, TLS and authentication setup and so that
+the number of connections each process holds is capped.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger('mtp')
+
+pool_connections_gauge = Gauge(
+    'mtp_api_db_pool_connections',
+    'Number of database connections held by connection pools',
+    ['alias', 'state'],
+)
+pool_max_size_gauge = Gauge(
+    'mtp_api_db_pool_max_size',
+    'Maximum number of database connections each connection pool can hold',
+    ['alias'],
+)
+pool_wait_histogram = Histogram(
+    'mtp_api_db_pool_wait_seconds',
+    'Time spent waiting for a database connection from a pool, including opening new connections',
+    ['alias'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, float('inf')),
+)
+pool_timeout_counter = Counter(
+    'mtp_api_db_pool_timeouts',
+    'Number of times no pooled database connection became available in time',
+    ['alias'],
+)
+pool_opened_counter = Counter(
+    'mtp_api_db_pool_connections_opened',
+    'Number of database connections opened by connection pools',
+    ['alias'],
+)
+pool_discarded_counter = Counter(
+    'mtp_api_db_pool_connections_discarded',
+    'Number of pooled database connections closed, by reason',
+    ['alias', 'reason'],
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of at most `max_size` connections made using `connect()`.
+    `check(connection)` is called on connections that have been idle for at least `check_after` seconds
+    before they are handed out and `reset(connection)` when they are returned; connections are
+    discarded if either returns False. Connections are also discarded once older than `max_age`
+    or after being idle for longer than `max_idle` seconds.
+    """
+
+    def __init__(self, alias, connect, check=None, reset=None,
+                 max_size=10, timeout=10, max_age=None, max_idle=None, check_after=0):
+        self.alias = alias
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.check_after = check_after
+
+        self.condition = threading.Condition()
+        self.pid = os.getpid()
+        self.closed = False
+        # idle connections and the time they were returned, most recently returned last
+        self.idle = collections.deque()
+        # the time every connection held by the pool was opened, whether idle or in use
+        self.opened_at = {}
+        self.opening = 0
+
+    @property
+    def size(self):
+        return len(self.opened_at) + self.opening
+
+    @property
+    def in_use(self):
+        return len(self.opened_at) - len(self.idle)
+
+    def getconn(self):
+        self.check_process()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            connection = None
+            with self.condition:
+                while True:
+                    if self.idle:
+                        connection, returned_at = self.idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self.opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        pool_timeout_counter.labels(alias=self.alias).inc()
+                        raise PoolTimeout(
+                            f'No connection to database "{self.alias}" became available '
+                            f'within {self.timeout} seconds; all {self.max_size} are in use'
+                        )
+                    self.condition.wait(remaining)
+
+            if connection is None:
+                connection = self.open()
+            elif not self.is_usable(connection, returned_at):
+                continue
+            pool_wait_histogram.labels(alias=self.alias).observe(time.monotonic() - start)
+            return connection
+
+    def putconn(self, connection):
+        if self.pid != os.getpid() or id(connection) not in self.opened_at:
+            # connection belongs to another process or was already discarded
+            close_connection(connection)
+            return
+        if self.closed:
+            self.discard(connection, 'pool-closed')
+            return
+        if self.reset and not self.reset(connection):
+            self.discard(connection, 'broken')
+            return
+        if self.has_expired(connection):
+            self.discard(connection, 'expired')
+            return
+
+        now = time.monotonic()
+        stale_connections = []
+        with self.condition:
+            self.idle.append((connection, now))
+            while self.max_idle is not None and now - self.idle[0][1] > self.max_idle:
+                stale_connection, _ = self.idle.popleft()
+                self.opened_at.pop(id(stale_connection), None)
+                stale_connections.append(stale_connection)
+            self.condition.notify(1 + len(stale_connections))
+        for stale_connection in stale_connections:
+            pool_discarded_counter.labels(alias=self.alias, reason='idle').inc()
+            close_connection(stale_connection)
+
+    def discard(self, connection, reason):
+        """
+        Closes a connection that was handed out by the pool, freeing its place
+        """
+        with self.condition:
+            self.opened_at.pop(id(connection), None)
+            self.condition.notify()
+        pool_discarded_counter.labels(alias=self.alias, reason=reason).inc()
+        close_connection(connection)
+
+    def close(self):
+        """
+        Closes idle connections; those in use are closed when returned
+        """
+        with self.condition:
+            self.closed = True
+            idle_connections = [connection for connection, _ in self.idle]
+            self.idle.clear()
+            for connection in idle_connections:
+                self.opened_at.pop(id(connection), None)
+            self.condition.notify_all()
+        for connection in idle_connections:
+            pool_discarded_counter.labels(alias=self.alias, reason='pool-closed').inc()
+            close_connection(connection)
+
+    def open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opening -= 1
+            self.opened_at[id(connection)] = time.monotonic()
+        pool_opened_counter.labels(alias=self.alias).inc()
+        return connection
+
+    def has_expired(self, connection):
+        opened_at = self.opened_at.get(id(connection))
+        return self.max_age is not None and opened_at is not None and time.monotonic() - opened_at > self.max_age
+
+    def is_usable(self, connection, returned_at):
+        idle_time = time.monotonic() - returned_at
+        if self.has_expired(connection):
+            self.discard(connection, 'expired')
+            return False
+        if self.max_idle is not None and idle_time > self.max_idle:
+            self.discard(connection, 'idle')
+            return False
+        if self.check and idle_time >= self.check_after and not self.check(connection):
+            logger.warning('Discarding unusable pooled connection to database "%s"', self.alias)
+            self.discard(connection, 'unhealthy')
+            return False
+        return True
+
+    def check_process(self):
+        if self.pid == os.getpid():
+            return
+        # connections inherited from a parent process must not be used or closed by the child
+        with self.condition:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.idle.clear()
+                self.opened_at.clear()
+                self.opening = 0
+
+
+def close_connection(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.debug('Error closing pooled database connection', exc_info=True)
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, key, create):
+    """
+    Returns the pool for a database alias and its connection parameters, calling `create()` if there is none yet
+    """
+    with pools_lock:
+        pool = pools.get((alias, key))
+        if pool is None:
+            pool = pools[(alias, key)] = create()
+            register_pool_metrics(alias)
+    return pool
+
+
+def close_pools(matching=None):
+    """
+    Closes pools whose key satisfies `matching(key)` or all pools
+    """
+    with pools_lock:
+        closing = [
+            (alias_and_key, pool)
+            for alias_and_key, pool in pools.items()
+            if matching is None or matching(alias_and_key[1])
+        ]
+        for alias_and_key, _ in closing:
+            del pools[alias_and_key]
+    for _, pool in closing:
+        pool.close()
+
+
+def get_pools(alias):
+    return [pool for (pool_alias, _), pool in list(pools.items()) if pool_alias == alias]
+
+
+def register_pool_metrics(alias):
+    # gauges are read when metrics are collected so that they are exact for the collecting process
+    pool_connections_gauge.labels(alias=alias, state='idle').set_function(
+        lambda: sum(len(pool.idle) for pool in get_pools(alias))
+    )
+    pool_connections_gauge.labels(alias=alias, state='in_use').set_function(
+        lambda: sum(pool.in_use for pool in get_pools(alias))
+    )
+    pool_max_size_gauge.labels(alias=alias).set_function(
+        lambda: max((pool.max_size for pool in get_pools(alias)), default=0)
+    )
@@ -0,0 +1,170 @@
+"""
+Routes reads of heavy reporting views and commands to a read-only replica of the database.
+
+Code opts in using `use_replica()` or `ReplicaReadMixin` and all other queries use the primary database.
+Only models of this project's apps are routed: the database cache, sessions, content types, the audit log etc.
+always use the primary database and writing to them does not count as a write.
+Reads stay on the primary database if the replica is lagging, inside transactions, after writes
+within the same context and for a while after a user's own writes so that users always see their changes.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+
+logger = logging.getLogger('mtp')
+
+replica_alias = 'replica'
+user_pin_cache_key_prefix = 'replica-pinned-user-'
+# apps of this project whose tables are infrastructure rather than data
+unrouted_app_labels = {'core', 'user_event_log'}
+
+reading_from_replica = contextvars.ContextVar('reading_from_replica', default=False)
+wrote_to_primary = contextvars.ContextVar('wrote_to_primary', default=False)
+
+# replication lag is checked at most once per interval in each process
+lag_check_interval = 5
+last_lag_check = (-float('inf'), None)
+
+
+def replica_configured():
+    return replica_alias in settings.DATABASES
+
+
+def get_replica_lag():
+    """
+    Returns the number of seconds by which the replica lags the primary database
+    or infinity if it cannot be determined
+    """
+    global last_lag_check
+
+    checked_at, lag = last_lag_check
+    now = time.monotonic()
+    if now - checked_at < lag_check_interval:
+        return lag
+    try:
+        with connections[replica_alias].cursor() as cursor:
+            cursor.execute('SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')
+            lag = cursor.fetchone()[0]
+        # the replica is not in recovery mode so is effectively the primary
+        lag = float(lag) if lag is not None else 0.0
+    except DatabaseError:
+        logger.exception('Cannot determine database replica lag')
+        lag = float('inf')
+    last_lag_check = (now, lag)
+    return lag
+
+
+@functools.lru_cache(maxsize=None)
+def is_routed(model):
+    app_config = model._meta.app_config
+    return bool(
+        app_config
+        and app_config.label not in unrouted_app_labels
+        and app_config.path.startswith(os.path.join(settings.BASE_DIR, 'apps', ''))
+    )
+
+
+def is_user_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(f'{user_pin_cache_key_prefix}{user.pk}'))
+
+
+def pin_user(user):
+    cache.set(
+        f'{user_pin_cache_key_prefix}{user.pk}', True,
+        timeout=settings.DATABASE_REPLICA_READ_YOUR_WRITES_PERIOD,
+    )
+
+
+@contextlib.contextmanager
+def use_replica(user=None):
+    """
+    Sends reads made within this context to the replica if it is available
+    and the user has not written to the primary database recently;
+    can also be used as a decorator
+    """
+    enabled = (
+        replica_configured()
+        and not is_user_pinned(user)
+        and get_replica_lag() <= settings.DATABASE_REPLICA_MAX_LAG
+    )
+    reading_token = reading_from_replica.set(enabled)
+    wrote_token = wrote_to_primary.set(False)
+    try:
+        yield enabled
+    finally:
+        wrote = wrote_to_primary.get()
+        reading_from_replica.reset(reading_token)
+        wrote_to_primary.reset(wrote_token)
+        if wrote:
+            # let an enclosing context know that writes were made
+            wrote_to_primary.set(True)
+
+
+@contextlib.contextmanager
+def track_writes():
+    """
+    Yields a function returning whether any writes were made within this context
+    """
+    token = wrote_to_primary.set(False)
+    try:
+        yield wrote_to_primary.get
+    finally:
+        wrote_to_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            is_routed(model)
+            and reading_from_replica.get()
+            and not wrote_to_primary.get()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return replica_alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_routed(model):
+            wrote_to_primary.set(True)
+        # instances read from the replica must still be saved to the primary database
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Sends reads made by a view to the replica; API views only start doing so after
+    authenticating the user so that users who have just written see their changes.
+    Requests that may write, such as POST actions of viewsets, always use the primary database
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with contextlib.ExitStack() as self.replica_reads:
+            if not isinstance(self, APIView) and self.reads_from_replica(request):
+                self.replica_reads.enter_context(use_replica(user=request.user))
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.reads_from_replica(request):
+            self.replica_reads.enter_context(use_replica(user=request.user))
+
+    def reads_from_replica(self, request):
+        return request.method in SAFE_METHODS
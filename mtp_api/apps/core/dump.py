@@ -1,5 +1,7 @@
 import functools
+import hashlib
 
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.module_loading import autodiscover_modules
 from model_utils.models import TimeStampedModel
@@ -12,6 +14,15 @@ class Serialiser:
     """
     _registry = {}
     record_type = NotImplemented
+    # whether records can be selected by modification time or must all be exported whenever any change
+    incremental = True
+    # types of columns for typed (e.g. parquet) exports; columns not listed are strings
+    column_types = {
+        'Created at': 'datetime',
+        'Modified at': 'datetime',
+        'Exported at': 'datetime',
+        'Internal ID': 'integer',
+    }
 
     def __init_subclass__(cls):
         if cls.record_type in cls._registry:
@@ -38,6 +49,28 @@ class Serialiser:
             filters['modified__lt'] = before
         return self.get_queryset().filter(**filters).order_by('pk').iterator(chunk_size=1000)
 
+    def get_records_after(self, last_modified, last_id, before):
+        """
+        Returns records modified after a watermark position (and before a cut-off time)
+        ordered such that the last record returned becomes the next watermark position
+        """
+        queryset = self.get_queryset().filter(modified__lt=before)
+        if last_modified:
+            queryset = queryset.filter(
+                Q(modified__gt=last_modified) | Q(modified=last_modified, pk__gt=last_id or 0)
+            )
+        return queryset.order_by('modified', 'pk')
+
+    def get_fingerprint(self):
+        """
+        Returns a digest which changes whenever records returned by non-incremental serialisers change
+        """
+        digest = hashlib.sha256()
+        records = self.get_queryset().order_by('pk').values_list('pk', 'modified').iterator(chunk_size=1000)
+        for pk, modified in records:
+            digest.update(f'{pk}:{modified.isoformat()};'.encode())
+        return digest.hexdigest()
+
     def get_headers(self):
         return [
             'Created at', 'Modified at',
@@ -52,3 +85,60 @@ class Serialiser:
             'Exported at': self.exported_at_local_time,
             'Internal ID': record.id,
         }
+
+    def get_column_types(self):
+        """
+        Returns a type for each header: one of 'datetime', 'integer', 'string' or 'list' (of strings)
+        """
+        return {
+            header: self.column_types.get(header, 'string')
+            for header in self.get_headers()
+        }
+
+
+def write_parquet(path, column_types, rows, row_group_size=10000):
+    """
+    Writes dictionaries of serialised data into a parquet file one row group at a time
+    so that the whole dataset is never held in memory
+    """
+    import pyarrow
+    import pyarrow.parquet
+
+    arrow_types = {
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+        'integer': pyarrow.int64(),
+        'string': pyarrow.string(),
+        'list': pyarrow.list_(pyarrow.string()),
+    }
+    value_converters = {
+        'datetime': lambda value: value,
+        'integer': int,
+        'string': str,
+        'list': lambda value: list(map(str, value)),
+    }
+    schema = pyarrow.schema([
+        (column, arrow_types[column_type])
+        for column, column_type in column_types.items()
+    ])
+    converters = {
+        column: value_converters[column_type]
+        for column, column_type in column_types.items()
+    }
+
+    def write_row_group():
+        writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    with pyarrow.parquet.ParquetWriter(path, schema, compression='snappy') as writer:
+        columns = {column: [] for column in column_types}
+        row_count = 0
+        for row in rows:
+            for column, values in columns.items():
+                value = row.get(column)
+                values.append(None if value is None else converters[column](value))
+            row_count += 1
+            if row_count % row_group_size == 0:
+                write_row_group()
+        if row_count % row_group_size or not row_count:
+            write_row_group()
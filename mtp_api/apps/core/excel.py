@@ -1,11 +1,20 @@
+from __future__ import annotations
+
+import csv
+import io
+import typing
+
 from django.core.files import File
-import openpyxl
-import xlrd
+
+if typing.TYPE_CHECKING:
+    # spreadsheet libraries are only imported when a workbook is opened
+    import openpyxl
+    import xlrd
 
 
 class ExcelWorkbook:
     """
-    Provides a common, but very basic, read-only interface for reading XLS and XLSX files,
+    Provides a common, but very basic, read-only interface for reading XLS, XLSX and CSV files,
     based on file extension (not file contents)
     """
     subclasses = {}
@@ -45,6 +54,8 @@ class XLSWorkbook(ExcelWorkbook):
         self._workbook: xlrd.book.Book
 
     def __enter__(self):
+        import xlrd
+
         try:
             self._workbook = xlrd.open_workbook(
                 filename=self.file.name,
@@ -71,6 +82,8 @@ class XLSXWorkbook(ExcelWorkbook):
         self._workbook: openpyxl.workbook.Workbook
 
     def __enter__(self):
+        import openpyxl
+
         try:
             self._workbook = openpyxl.load_workbook(self.file, read_only=True)
         except ValueError as e:
@@ -85,6 +98,30 @@ class XLSXWorkbook(ExcelWorkbook):
         return XLSXWorksheet(worksheet)
 
 
+class CSVWorkbook(ExcelWorkbook):
+    """
+    A CSV file treated as a workbook with one sheet whose rows can only be iterated over
+    """
+    extension = 'csv'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._text: io.TextIOWrapper
+
+    def __enter__(self):
+        self._text = io.TextIOWrapper(self.file, encoding='utf-8-sig', newline='')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # leave the uploaded file open for its owner to close
+        self._text.detach()
+
+    def get_sheet(self, index: int) -> 'CSVWorksheet':
+        if index != 0:
+            raise IndexError('CSV files only have one sheet')
+        return CSVWorksheet(self._text)
+
+
 class ExcelWorksheet:
     """
     Returned by ExcelWorkbook.get_sheet(index),
@@ -98,6 +135,12 @@ class ExcelWorksheet:
     def cell_value(self, row: int, column: int):
         raise NotImplementedError
 
+    def iter_rows(self) -> typing.Iterator[tuple]:
+        """
+        Yields the values in each row in turn; unlike cell_value(), this does not need the whole sheet in memory
+        """
+        raise NotImplementedError
+
 
 class XLSWorksheet(ExcelWorksheet):
     def __init__(self, worksheet: xlrd.sheet.Sheet):
@@ -110,6 +153,10 @@ class XLSWorksheet(ExcelWorksheet):
     def cell_value(self, row: int, column: int):
         return self._worksheet.cell_value(row, column)
 
+    def iter_rows(self) -> typing.Iterator[tuple]:
+        for row in range(self._worksheet.nrows):
+            yield tuple(self._worksheet.row_values(row))
+
 
 class XLSXWorksheet(ExcelWorksheet):
     def __init__(self, worksheet: openpyxl.workbook.workbook.ReadOnlyWorksheet):
@@ -121,3 +168,19 @@ class XLSXWorksheet(ExcelWorksheet):
 
     def cell_value(self, row: int, column: int):
         return self._worksheet.cell(row + 1, column + 1).value
+
+    def iter_rows(self) -> typing.Iterator[tuple]:
+        # read-only worksheets parse rows as they are iterated over
+        yield from self._worksheet.iter_rows(values_only=True)
+
+
+class CSVWorksheet(ExcelWorksheet):
+    def __init__(self, text: typing.TextIO):
+        self._text = text
+
+    def iter_rows(self) -> typing.Iterator[tuple]:
+        try:
+            for row in csv.reader(self._text):
+                yield tuple(row)
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise TypeError('Cannot load CSV file') from e
@@ -0,0 +1,80 @@
+import json
+import textwrap
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+
+from core.tests.benchmarks import BenchmarkRunner, EndpointBenchmark
+
+
+class Command(BaseCommand):
+    """
+    Measures latency and SQL query counts of frequently used API endpoints,
+    failing if any exceed their budgets. Changes made by requests are rolled back
+    and, as they run in a transaction, reads are not routed to replica databases.
+    """
+    help = textwrap.dedent(__doc__).strip()
+
+    # approximate production volumes used with --load-data
+    production_scale = {
+        'number_of_prisoners': 80000,
+        'number_of_senders': 150000,
+        'number_of_payments': 500000,
+        'number_of_transactions': 50000,
+        'number_of_disbursements': 50000,
+        'number_of_checks': 20000,
+        'days_of_history': 1300,
+    }
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--load-data', action='store_true',
+                            help='Replace all data with a production-scale dataset before benchmarking')
+        parser.add_argument('--endpoint', nargs='*', choices=sorted(EndpointBenchmark.get_benchmarks()),
+                            help='Only benchmark these endpoints')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Number of measured requests to each endpoint')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Number of unmeasured requests to each endpoint')
+        parser.add_argument('--budgets',
+                            help='JSON file overriding budgets, e.g. {"events": {"max_queries": 10, "p95_ms": 200}}')
+        parser.add_argument('--no-latency-budgets', action='store_true',
+                            help='Only enforce query count budgets')
+        parser.add_argument('--report', help='Save JSON report to this path')
+
+    def handle(self, *args, **options):
+        if options['load_data']:
+            if settings.ENVIRONMENT == 'prod':
+                raise CommandError('Cannot load test data in production')
+            self.stdout.write('Loading production-scale dataset')
+            call_command('load_test_data', credits='bulk', verbosity=options['verbosity'], **self.production_scale)
+
+        budgets = None
+        if options['budgets']:
+            with open(options['budgets']) as f:
+                budgets = json.load(f)
+
+        runner = BenchmarkRunner(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            budgets=budgets,
+            check_latency=not options['no_latency_budgets'],
+        )
+        report = runner.run(names=options['endpoint'])
+
+        for result in report['results']:
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{result["name"]:<20} p50 {latency["p50"]:>8.1f}ms  p95 {latency["p95"]:>8.1f}ms  '
+                f'queries {result["queries"]["max"]:>4}  size {result["response_bytes"]:>8}B'
+            )
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Saved report to {options["report"]}')
+
+        if report['failures']:
+            for failure in report['failures']:
+                self.stderr.write(failure)
+            raise CommandError(f'{len(report["failures"])} benchmark checks failed')
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
@@ -1,40 +1,130 @@
 import datetime
+import itertools
 import os
 import tempfile
 import textwrap
 
+from django.conf import settings
 from django.core.management import BaseCommand, call_command
 from django.utils import timezone
 
+from core.db_router import reading_from_replica, use_replica
 from core.dump import Serialiser
+from core.management.commands.dump_for_ap import Command as DumpCommand
+from core.models import DumpWatermark
 
 
 class Command(BaseCommand):
     """
     Dump credits, disbursements, FIU-monitored prisoners, FIU-monitored debit cards and auto accept rules
-    which were updated "yesterday" and upload them to an S3 bucket in Analytical Platform.
+    which were updated since the last successful export and upload them to an S3 bucket in Analytical Platform.
+    The position of the last exported record of each type is saved after every uploaded batch
+    so that a failed run resumes where it stopped; types with no changes are skipped.
+    Records are read from the database replica if it is available.
     This command is expected to be scheduled to run once per day (using core.ScheduledCommand model).
     """
     help = textwrap.dedent(__doc__).strip()
 
+    destination = 'analytical_platform'
+    # records modified very recently may belong to transactions that are not yet committed
+    settling_time = datetime.timedelta(minutes=5)
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl',
+                            help='File format to use for dump')
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help='Maximum number of records in each uploaded file')
+
+    def execute(self, *args, **options):
+        with use_replica():
+            return super().execute(*args, **options)
+
+    def get_settling_time(self):
+        if reading_from_replica.get():
+            # the replica lagged by no more than this when the export started so older records have reached it
+            return self.settling_time + datetime.timedelta(seconds=settings.DATABASE_REPLICA_MAX_LAG)
+        return self.settling_time
+
     def handle(self, *args, **options):
-        today = timezone.localtime().date()
-        yesterday = today - datetime.timedelta(days=1)
-        self.stdout.write(f'Dumping and uploading records into Analytical Platform: [{yesterday}, {today})')
+        if not all([settings.ANALYTICAL_PLATFORM_BUCKET,
+                    settings.ANALYTICAL_PLATFORM_BUCKET_PATH]):
+            self.stderr.write(self.style.WARNING('Cannot upload dump to Analytical Platform'))
+            return
 
-        today = today.strftime('%Y-%m-%d')
-        yesterday = yesterday.strftime('%Y-%m-%d')
-        date_range = {
-            'after': yesterday,
-            'before': today,
-        }
+        now = timezone.localtime()
+        self.before = now - self.get_settling_time()
+        # when a record type was never exported, start with records modified "yesterday"
+        self.initial_after = timezone.make_aware(
+            datetime.datetime.combine(now.date() - datetime.timedelta(days=1), datetime.time.min)
+        )
+        self.object_prefix = now.strftime('%Y-%m-%d')
+        self.object_suffix = now.strftime('%H%M%S')
+        self.dump_format = options['format']
+        self.batch_size = options['batch_size']
+        self.stdout.write(f'Dumping and uploading records into Analytical Platform modified before {self.before}')
 
         with tempfile.TemporaryDirectory() as temp_path:
-            for record_type in Serialiser.get_serialisers():
+            self.temp_path = temp_path
+            for record_type, serialiser_cls in Serialiser.get_serialisers().items():
                 if record_type == 'noms_ops_users':
                     # explicitly ignore user export
                     self.stderr.write('Ignoring export of `noms_ops_users` records', style_func=self.style.WARNING)
                     continue
-                file_path = os.path.join(temp_path, record_type)
-                call_command('dump_for_ap', record_type, file_path, **date_range)
-                call_command('upload_dump_for_ap', file_path, f'{today}_{record_type}')
+                serialiser: Serialiser = serialiser_cls()
+                watermark, _ = DumpWatermark.objects.get_or_create(
+                    destination=self.destination,
+                    record_type=record_type,
+                )
+                if serialiser.incremental:
+                    self.dump_and_upload_modified(serialiser, watermark)
+                else:
+                    self.dump_and_upload_all_if_changed(serialiser, watermark)
+
+    def dump_and_upload_modified(self, serialiser: Serialiser, watermark: DumpWatermark):
+        record_type = serialiser.record_type
+        if not watermark.last_modified:
+            watermark.last_modified = self.initial_after
+            watermark.last_id = 0
+        batch_number = 0
+        while True:
+            records = serialiser.get_records_after(
+                watermark.last_modified, watermark.last_id, self.before,
+            )[:self.batch_size].iterator(chunk_size=1000)
+            first_record = next(records, None)
+            if first_record is None:
+                break
+            batch_number += 1
+            records = self.advance_watermark(itertools.chain([first_record], records), watermark)
+            self.dump_and_upload(serialiser, records, f'{record_type}_{self.object_suffix}_{batch_number}')
+            watermark.save()
+        if not batch_number:
+            self.stdout.write(f'No {record_type} records modified since last export')
+
+    @classmethod
+    def advance_watermark(cls, records, watermark: DumpWatermark):
+        # records are streamed into files so the watermark follows them and is saved once the batch is uploaded
+        for record in records:
+            yield record
+            watermark.advance(record)
+
+    def dump_and_upload_all_if_changed(self, serialiser: Serialiser, watermark: DumpWatermark):
+        record_type = serialiser.record_type
+        fingerprint = serialiser.get_fingerprint()
+        if fingerprint == watermark.fingerprint:
+            self.stdout.write(f'No {record_type} records changed since last export')
+            return
+        records = serialiser.get_modified_records(None, None)
+        self.dump_and_upload(serialiser, records, record_type)
+        watermark.fingerprint = fingerprint
+        watermark.save()
+
+    def dump_and_upload(self, serialiser: Serialiser, records, name):
+        file_path = os.path.join(self.temp_path, name)
+        object_name = f'{self.object_prefix}_{name}'
+        if self.dump_format == 'parquet':
+            DumpCommand.serialise_as_parquet(serialiser, records, file_path)
+            object_name += '.parquet'
+        else:
+            DumpCommand.serialise_as_jsonl(serialiser, records, file_path)
+        call_command('upload_dump_for_ap', file_path, object_name)
@@ -6,7 +6,8 @@ from django.core.management import BaseCommand, CommandError
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 
-from core.dump import Serialiser
+from core.db_router import use_replica
+from core.dump import Serialiser, write_parquet
 
 
 class BaseDumpCommand(BaseCommand):
@@ -21,6 +22,10 @@ class BaseDumpCommand(BaseCommand):
         parser.add_argument('type', choices=list(Serialiser.get_serialisers()), help='Type of object to dump')
         parser.add_argument('path', help='Path to dump data to')
 
+    def execute(self, *args, **options):
+        with use_replica():
+            return super().execute(*args, **options)
+
     @classmethod
     def get_modified_range(cls, **options):
         after = date_argument(options['after'])
@@ -45,6 +50,11 @@ class Command(BaseDumpCommand):
     """
     help = textwrap.dedent(__doc__).strip()
 
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl',
+                            help='File format to use for dump')
+
     def handle(self, *args, **options):
         after, before = self.get_modified_range(**options)
         record_type = options['type']
@@ -53,7 +63,19 @@ class Command(BaseDumpCommand):
 
         self.stdout.write(f'Dumping {record_type} records for Analytical Platform export')
 
-        with open(options['path'], 'wt') as jsonl_file:
+        if options['format'] == 'parquet':
+            self.serialise_as_parquet(serialiser, records, options['path'])
+        else:
+            self.serialise_as_jsonl(serialiser, records, options['path'])
+
+    @classmethod
+    def serialise_as_jsonl(cls, serialiser, records, path):
+        with open(path, 'wt') as jsonl_file:
             for record in records:
                 jsonl_file.write(json.dumps(serialiser.serialise(record), default=str, ensure_ascii=False))
                 jsonl_file.write('\n')
+
+    @classmethod
+    def serialise_as_parquet(cls, serialiser, records, path):
+        rows = (serialiser.serialise(record) for record in records)
+        write_parquet(path, serialiser.get_column_types(), rows)
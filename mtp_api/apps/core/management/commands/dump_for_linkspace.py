@@ -2,7 +2,7 @@ import csv
 import json
 import textwrap
 
-from core.dump import Serialiser
+from core.dump import Serialiser, write_parquet
 from core.management.commands.dump_for_ap import BaseDumpCommand
 
 
@@ -14,7 +14,8 @@ class Command(BaseDumpCommand):
 
     def add_arguments(self, parser):
         super().add_arguments(parser)
-        parser.add_argument('--format', choices=['csv', 'json'], default='csv', help='File format to use for dump')
+        parser.add_argument('--format', choices=['csv', 'json', 'parquet'], default='csv',
+                            help='File format to use for dump')
 
     def handle(self, *args, **options):
         after, before = self.get_modified_range(**options)
@@ -22,6 +23,8 @@ class Command(BaseDumpCommand):
         records = serialiser.get_modified_records(after, before)
         if options['format'] == 'json':
             self.serialise_as_json(serialiser, records, options['path'])
+        elif options['format'] == 'parquet':
+            self.serialise_as_parquet(serialiser, records, options['path'])
         else:
             self.serialise_as_csv(serialiser, records, options['path'])
 
@@ -46,6 +49,15 @@ class Command(BaseDumpCommand):
                 records_written = True
             json_file.write('\n]\n')
 
+    @classmethod
+    def serialise_as_parquet(cls, serialiser, records, path):
+        column_types = {
+            cls.short_name_for(serialiser.record_type, column_name): column_type
+            for column_name, column_type in serialiser.get_column_types().items()
+        }
+        rows = (cls.get_data_for_linkspace(serialiser, record) for record in records)
+        write_parquet(path, column_types, rows)
+
     @classmethod
     def get_headers_for_linkspace(cls, serialiser):
         headers = serialiser.get_headers()
@@ -8,6 +8,7 @@ from django.core.management import BaseCommand, call_command
 from mtp_common.test_utils import silence_logger
 
 from account.models import Balance
+from core.tests.bulk_data import BulkDataGenerator
 from core.tests.utils import (
     create_super_admin,
     give_superusers_full_access,
@@ -17,6 +18,7 @@ from core.tests.utils import (
 from credit.models import Credit
 from disbursement.models import Disbursement
 from disbursement.tests.utils import generate_disbursements
+from mtp_auth.constants import SYSTEM_USERNAME
 from payment.models import Batch, Payment
 from payment.tests.utils import generate_payments
 from performance.tests.utils import generate_digital_takeup
@@ -66,8 +68,9 @@ class Command(BaseCommand):
         parser.add_argument('--clerks-per-prison', type=int, default=2,
                             help='The number of clerks to make for the Cashbook')
         parser.add_argument('--credits', default='random',
-                            choices=['none', 'random', 'nomis', 'production-scale'],
-                            help='Create new credits using this method')
+                            choices=['none', 'random', 'nomis', 'production-scale', 'bulk'],
+                            help='Create new credits using this method; '
+                                 '"bulk" quickly generates large datasets for benchmarking')
         parser.add_argument('--number-of-transactions', default=20, type=int,
                             help='Number of new transactions to create')
         parser.add_argument('--number-of-payments', default=200, type=int,
@@ -80,6 +83,8 @@ class Command(BaseCommand):
                             help='Generate digital take-up')
         parser.add_argument('--days-of-history', default=7, type=int,
                             help='Number of days of historical credits')
+        parser.add_argument('--seed', default=0, type=int,
+                            help='Random seed used to reproduce "bulk" datasets')
 
     def handle(self, *args, **options):  # noqa: C901
         if settings.ENVIRONMENT == 'prod':
@@ -101,6 +106,7 @@ class Command(BaseCommand):
         number_of_checks = options['number_of_checks']
         days_of_history = options['days_of_history']
         extra_generate_checks_args = {}
+        bulk_data_generator = None
 
         print_message = self.stdout.write if verbosity else lambda m: m
 
@@ -194,7 +200,8 @@ class Command(BaseCommand):
             prisons.append('nomis-api-dev')
             prisoners.append('sample')
         else:
-            user_set = get_user_model().objects.exclude(username__in=protect_usernames or [])
+            # the system user is created by a migration
+            user_set = get_user_model().objects.exclude(username__in=[*(protect_usernames or []), SYSTEM_USERNAME])
             if not no_protect_superusers:
                 user_set = user_set.exclude(is_superuser=True)
             print_message('Deleting %d users' % user_set.count())
@@ -235,8 +242,17 @@ class Command(BaseCommand):
             prisoner_locations = load_prisoner_locations_from_file('dev_nomis_api_prisoner_locations.csv')
         if 'dev-prison-api' in prisoners:
             prisoner_locations = load_prisoner_locations_from_dev_prison_api(number_of_prisoners=number_of_prisoners)
+        if credits == 'bulk':
+            bulk_data_generator = BulkDataGenerator(
+                seed=options['seed'],
+                days_of_history=days_of_history,
+                stdout=self.stdout if verbosity else None,
+            )
         if 'sample' in prisoners:
-            prisoner_locations = load_random_prisoner_locations(number_of_prisoners=number_of_prisoners)
+            if bulk_data_generator:
+                bulk_data_generator.generate_prisoner_locations(number_of_prisoners)
+            else:
+                prisoner_locations = load_random_prisoner_locations(number_of_prisoners=number_of_prisoners)
         if not prisoner_locations:
             prisoner_locations = PrisonerLocation.objects.all()
 
@@ -294,20 +310,31 @@ class Command(BaseCommand):
                 'number_of_senders_to_use': int((number_of_checks * 5) / sender_profiles_count),
                 'number_of_prisoners_to_use': int((number_of_checks * 5) / prisoner_profiles_count)
             })
+        elif credits == 'bulk':
+            print_message('Generating production-like credits, disbursements and checks in bulk')
+            bulk_data_generator.generate(
+                number_of_payments=number_of_payments,
+                number_of_transactions=number_of_transactions,
+                number_of_disbursements=number_of_disbursements,
+                number_of_senders=number_of_senders,
+                number_of_checks=number_of_checks,
+            )
+            # bulk data is already linked to profiles with totals calculated so update_security_profiles is not run
 
-        print_message('Generating disbursements')
-        generate_disbursements(
-            disbursement_batch=number_of_disbursements,
-            days_of_history=days_of_history
-        )
-        print_message('Generating checks')
-        generate_checks(
-            number_of_checks=number_of_checks,
-            **extra_generate_checks_args
-        )
-        print_message('Associating credits with profiles')
-        with silence_logger(level=logging.WARNING):
-            call_command('update_security_profiles')
+        if credits != 'bulk':
+            print_message('Generating disbursements')
+            generate_disbursements(
+                disbursement_batch=number_of_disbursements,
+                days_of_history=days_of_history
+            )
+            print_message('Generating checks')
+            generate_checks(
+                number_of_checks=number_of_checks,
+                **extra_generate_checks_args
+            )
+            print_message('Associating credits with profiles')
+            with silence_logger(level=logging.WARNING):
+                call_command('update_security_profiles')
 
         digital_takeup = options['digital_takeup']
         if digital_takeup:
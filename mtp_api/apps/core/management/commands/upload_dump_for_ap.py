@@ -1,6 +1,5 @@
 import textwrap
 
-import boto3
 from django.conf import settings
 from django.core.management import BaseCommand
 
@@ -30,6 +29,9 @@ class Command(BaseCommand):
 def upload_file_to_analytical_platform(file_path, target_name):
     if settings.ANALYTICAL_PLATFORM_BUCKET_PATH:
         target_name = f'{settings.ANALYTICAL_PLATFORM_BUCKET_PATH}/{target_name}'
+
+    import boto3
+
     s3_client = boto3.client('s3')
     s3_client.upload_file(
         Filename=file_path, Bucket=settings.ANALYTICAL_PLATFORM_BUCKET, Key=target_name,
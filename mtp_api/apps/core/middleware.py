@@ -0,0 +1,220 @@
+import contextlib
+import hashlib
+import logging
+import re
+import time
+
+import brotli
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from prometheus_client import Histogram
+
+from core.db_router import pin_user, replica_configured, track_writes
+
+logger = logging.getLogger('mtp')
+
+query_count_histogram = Histogram(
+    'mtp_api_db_queries_per_request',
+    'Number of SQL queries executed while responding to a request',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+query_duration_histogram = Histogram(
+    'mtp_api_db_duration_per_request_seconds',
+    'Total time spent executing SQL queries while responding to a request',
+    ['view'],
+)
+# statement fingerprints are unbounded so they are logged rather than used as metric labels
+slowest_query_duration_histogram = Histogram(
+    'mtp_api_db_slowest_query_seconds',
+    'Time spent executing the slowest SQL query while responding to a request',
+    ['view'],
+)
+
+whitespace_re = re.compile(r'\s+')
+placeholder_list_re = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalise_sql(sql):
+    """
+    Reduces a statement to its shape so that queries differing only in parameters are grouped
+    """
+    sql = whitespace_re.sub(' ', sql).strip()
+    sql = literal_re.sub('%s', sql)
+    return placeholder_list_re.sub('(...)', sql)
+
+
+def fingerprint_sql(normalised_sql):
+    return hashlib.sha1(normalised_sql.encode()).hexdigest()[:12]
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper which counts and times every statement
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = -1.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+class QueryMetricsMiddleware:
+    """
+    Records the number of SQL queries and time spent on them for each view,
+    exporting them alongside other prometheus metrics. Optionally logs views
+    which execute more queries than QUERY_METRICS_LOG_THRESHOLD and, with their
+    fingerprints, queries slower than QUERY_METRICS_SLOW_QUERY_THRESHOLD_MS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        self.record(request, recorder)
+        return response
+
+    def record(self, request, recorder):
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match else 'unknown'
+
+        query_count_histogram.labels(view=view).observe(recorder.count)
+        query_duration_histogram.labels(view=view).observe(recorder.duration)
+        if not recorder.slowest_sql:
+            return
+        slowest_query_duration_histogram.labels(view=view).observe(recorder.slowest_duration)
+
+        threshold = settings.QUERY_METRICS_LOG_THRESHOLD
+        slow_query_threshold = settings.QUERY_METRICS_SLOW_QUERY_THRESHOLD_MS / 1000
+        if threshold and recorder.count > threshold:
+            normalised_sql = normalise_sql(recorder.slowest_sql)
+            logger.warning(
+                'View %(view)s executed %(count)d queries taking %(duration).3fs; slowest [%(fingerprint)s]: %(sql)s',
+                {
+                    'view': view,
+                    'count': recorder.count,
+                    'duration': recorder.duration,
+                    'fingerprint': fingerprint_sql(normalised_sql),
+                    'sql': normalised_sql,
+                },
+            )
+        elif slow_query_threshold and recorder.slowest_duration > slow_query_threshold:
+            normalised_sql = normalise_sql(recorder.slowest_sql)
+            logger.warning(
+                'View %(view)s executed a query taking %(duration).3fs [%(fingerprint)s]: %(sql)s',
+                {
+                    'view': view,
+                    'duration': recorder.slowest_duration,
+                    'fingerprint': fingerprint_sql(normalised_sql),
+                    'sql': normalised_sql,
+                },
+            )
+
+
+def get_accepted_encoding(accept_encoding, supported_encodings):
+    """
+    Returns the first of supported_encodings which the Accept-Encoding header allows, if any
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        encoding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[encoding.strip().lower()] = quality
+    for encoding in supported_encodings:
+        if qualities.get(encoding, qualities.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON responses larger than RESPONSE_COMPRESSION_MIN_SIZE bytes using brotli or gzip,
+    depending on what the client accepts. Other content, such as admin pages containing CSRF tokens,
+    is left to the web server to avoid BREACH-style attacks.
+    """
+    supported_encodings = ('br', 'gzip')
+    compressible_content_types = ('application/json',)
+    # higher brotli qualities are too slow for dynamic responses
+    brotli_quality = 5
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        min_size = settings.RESPONSE_COMPRESSION_MIN_SIZE
+        if (
+            not min_size
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(self.compressible_content_types)
+            or len(response.content) < min_size
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = get_accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.supported_encodings)
+        if not encoding:
+            return response
+        if encoding == 'br':
+            compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+        else:
+            compressed_content = compress_string(response.content)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response['Content-Length'] = str(len(compressed_content))
+        response['Content-Encoding'] = encoding
+        # the compressed representation is not byte-for-byte identical so strong etags are weakened
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Remembers users who write to the primary database so that, for a while, their reads
+    are not sent to a replica which may not have received their changes yet
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_writes() as wrote_to_primary:
+            response = self.get_response(request)
+            wrote = wrote_to_primary()
+        user = getattr(request, 'user', None)
+        if wrote and user and user.is_authenticated and replica_configured():
+            pin_user(user)
+        return response
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0005_delete_token'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='DumpWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('destination', models.CharField(max_length=50)),
+                ('record_type', models.CharField(max_length=50)),
+                ('last_modified', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('fingerprint', models.CharField(blank=True, max_length=64)),
+            ],
+            options={
+                'unique_together': {('destination', 'record_type')},
+            },
+        ),
+    ]
@@ -116,3 +116,25 @@ class FileDownload(TimeStampedModel):
 
     class Meta:
         unique_together = ('label', 'date')
+
+
+class DumpWatermark(TimeStampedModel):
+    """
+    Position of the last record successfully exported by incremental data dumps for each destination and record type
+    """
+    destination = models.CharField(max_length=50)
+    record_type = models.CharField(max_length=50)
+    last_modified = models.DateTimeField(null=True, blank=True)
+    last_id = models.BigIntegerField(null=True, blank=True)
+    # used for record types that cannot be selected by modification time
+    fingerprint = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        unique_together = ('destination', 'record_type')
+
+    def __str__(self):
+        return f'{self.destination} {self.record_type}'
+
+    def advance(self, record):
+        self.last_modified = record.modified
+        self.last_id = record.pk
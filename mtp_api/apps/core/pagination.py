@@ -0,0 +1,117 @@
+"""
+Pagination for very large lists where counting every matching row costs more than loading a page:
+rows are counted up to PAGINATION_COUNT_ESTIMATE_THRESHOLD and beyond that the PostgreSQL query planner's
+estimate is used instead. Counts are only estimated for clients that ask with `estimate_count=true`
+because others, such as those retrieving all pages, rely on exact counts; they are told when counts are
+estimated so that they can show "about N".
+"""
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset, threshold=None):
+    """
+    Returns the number of rows in the queryset and whether that number is an estimate;
+    rows are only estimated if there are more than `threshold`
+    """
+    if threshold is None:
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+    if not isinstance(queryset, QuerySet):
+        return len(queryset), False
+    connection = connections[queryset.db]
+    if threshold <= 0 or connection.vendor != 'postgresql':
+        return queryset.count(), False
+
+    queryset = queryset.order_by()
+    capped_count = queryset[:threshold + 1].count()
+    if capped_count <= threshold:
+        return capped_count, False
+
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    # there are known to be more rows than the threshold even if the planner underestimates
+    return max(int(plan[0]['Plan']['Plan Rows']), threshold + 1), True
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    Limit-offset pagination which estimates counts when `estimate_count=true` is requested
+    and adds `"count_estimated": true` to responses whose count is estimated
+    """
+    estimate_count_query_param = 'estimate_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_estimated = False
+        self.count_estimate_requested = self.get_count_estimate_requested(request)
+        results = super().paginate_queryset(queryset, request, view=view)
+        self.page_is_full = results is not None and len(results) == self.limit
+        return results
+
+    def get_count_estimate_requested(self, request):
+        return request.query_params.get(self.estimate_count_query_param, '').lower() == 'true'
+
+    def get_count(self, queryset):
+        if not self.count_estimate_requested:
+            return super().get_count(queryset)
+        count, self.count_estimated = estimate_count(queryset)
+        return count
+
+    def get_next_link(self):
+        if not self.count_estimated:
+            return super().get_next_link()
+        # an estimated count may be too low so there is a next page whenever this one is full
+        if self.limit is None or not self.page_is_full:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count_estimated:
+            response.data['count_estimated'] = True
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        paginated_schema = super().get_paginated_response_schema(schema)
+        paginated_schema['properties']['count_estimated'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return paginated_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.estimate_count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Whether large counts can be estimated',
+            'schema': {
+                'type': 'boolean',
+            },
+        })
+        return parameters
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for django admin changelists of very large tables; set `show_full_result_count = False`
+    on the model admin too, otherwise the whole table is counted as well
+    """
+
+    @cached_property
+    def count(self):
+        count, self.count_estimated = estimate_count(self.object_list)
+        return count
@@ -0,0 +1,137 @@
+"""
+Caches reference data, shared between processes through the default cache, in namespaces which are
+invalidated as a whole when any of the models they depend on change: each namespace has a version
+which is part of every key within it so incrementing it discards all the namespace's entries at once.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+
+cache_key_prefix = 'reference-'
+snapshots = []
+
+
+def get_version_cache_key(namespace):
+    return f'{cache_key_prefix}{namespace}-version'
+
+
+def get_version(namespace):
+    version_key = get_version_cache_key(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        # a version that was evicted must not be reused so a new one is based on the time
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_cache_key(namespace, key):
+    key = hashlib.sha1(str(key).encode()).hexdigest()
+    return f'{cache_key_prefix}{namespace}-{get_version(namespace)}-{key}'
+
+
+def get_value(namespace, key, default=None):
+    return cache.get(get_cache_key(namespace, key), default)
+
+
+def set_value(namespace, key, value, timeout=None):
+    if timeout is None:
+        timeout = settings.REFERENCE_DATA_CACHE_TTL
+    cache.set(get_cache_key(namespace, key), value, timeout=timeout)
+
+
+def invalidate(namespace):
+    def increment_version():
+        try:
+            cache.incr(get_version_cache_key(namespace))
+        except ValueError:
+            get_version(namespace)
+
+    def clear_snapshots():
+        for snapshot in snapshots:
+            if snapshot.namespace == namespace:
+                snapshot.clear()
+
+    increment_version()
+    clear_snapshots()
+    # another process may have cached previous values before this transaction is committed
+    transaction.on_commit(increment_version)
+    transaction.on_commit(clear_snapshots)
+
+
+def invalidate_on_change(namespace, *model_classes):
+    """
+    Connects receivers that invalidate the namespace when instances of the models or their many-to-many
+    relationships are saved or deleted; bulk updates and deletions do not send signals so callers of those
+    must invalidate the namespace themselves
+    """
+
+    def model_changed(**kwargs):
+        invalidate(namespace)
+
+    for model_class in model_classes:
+        dispatch_uid = f'{cache_key_prefix}{namespace}-{model_class._meta.label}'
+        models.signals.post_save.connect(model_changed, sender=model_class, weak=False, dispatch_uid=dispatch_uid)
+        models.signals.post_delete.connect(model_changed, sender=model_class, weak=False, dispatch_uid=dispatch_uid)
+        for field in model_class._meta.many_to_many:
+            models.signals.m2m_changed.connect(
+                model_changed, sender=field.remote_field.through, weak=False,
+                dispatch_uid=f'{dispatch_uid}-{field.name}',
+            )
+
+
+class Snapshot:
+    """
+    Keeps reference data in each process's memory so that it can be read without querying the database
+    or the shared cache: the snapshot is reloaded when it expires and when its namespace is invalidated,
+    immediately within this process and within REFERENCE_DATA_SNAPSHOT_CHECK_INTERVAL seconds in others.
+    `load` returns the data and the time when it should be reloaded, or None to use REFERENCE_DATA_CACHE_TTL.
+    """
+
+    def __init__(self, namespace, load):
+        self.namespace = namespace
+        self.load = load
+        self.lock = threading.Lock()
+        self.clear()
+        snapshots.append(self)
+
+    def clear(self):
+        self.value = None
+        self.version = None
+        self.expires = 0
+        self.checked = 0
+
+    def get(self):
+        now = time.time()
+        with self.lock:
+            if self.version is not None and now < self.expires:
+                if now < self.checked + settings.REFERENCE_DATA_SNAPSHOT_CHECK_INTERVAL:
+                    return self.value
+                self.checked = now
+                version = get_version(self.namespace)
+                if version == self.version:
+                    return self.value
+            else:
+                version = get_version(self.namespace)
+
+            value, expires = self.load()
+            self.value = value
+            self.version = version
+            self.checked = now
+            self.expires = now + settings.REFERENCE_DATA_CACHE_TTL
+            if expires is not None:
+                self.expires = min(self.expires, expires)
+            return value
+
+    @property
+    def time_to_expiry(self):
+        return max(0, int(self.expires - time.time()))
+
+
+def clear_snapshots():
+    for snapshot in snapshots:
+        snapshot.clear()
@@ -0,0 +1,396 @@
+"""
+Benchmarks of the most frequently used API endpoints.
+
+Each benchmark makes a series of requests as a user of the client application that normally calls the endpoint,
+recording response times and the number of SQL queries executed. Every endpoint has a budget for both and
+the results are collected into a report which can be saved as JSON to track trends between releases.
+
+Queries are counted on every configured database. However, requests run inside a transaction that is rolled back
+afterwards and the database router sends all reads made within a transaction to the primary database,
+so routing of reads to a replica is not measured.
+"""
+import collections
+import contextlib
+import datetime
+import math
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from credit.models import Credit
+from disbursement.models import Disbursement
+from mtp_auth.tests.utils import AuthTestCaseMixin
+from payment.models import Payment
+from prison.models import PrisonerLocation
+from security.models import Check, PrisonerProfile, SenderProfile
+from transaction.constants import TransactionCategory, TransactionSource
+
+User = get_user_model()
+
+Budget = collections.namedtuple('Budget', 'max_queries p95_ms')
+
+
+class EndpointBenchmark:
+    """
+    Describes requests to one endpoint; subclasses are registered by name
+    """
+    name = NotImplemented
+    user_group = NotImplemented
+    method = 'get'
+    request_headers = {}
+    budget = Budget(max_queries=30, p95_ms=500)
+
+    @classmethod
+    def get_benchmarks(cls):
+        return {
+            benchmark.name: benchmark
+            for benchmark in cls.__subclasses__()
+        }
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.random = runner.random
+
+    def prepare(self):
+        """
+        Called before every measured request; any queries made are not counted
+        """
+
+    def get_path(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        return None
+
+
+class CashbookCreditList(EndpointBenchmark):
+    name = 'credits-cashbook'
+    user_group = 'PrisonClerk'
+    budget = Budget(max_queries=20, p95_ms=500)
+
+    def get_path(self):
+        return reverse('credit-list')
+
+    def get_data(self):
+        return {'status': 'credit_pending', 'ordering': 'received_at', 'limit': 100}
+
+
+class SecurityCreditList(EndpointBenchmark):
+    name = 'credits-security'
+    user_group = 'FIU'
+    budget = Budget(max_queries=20, p95_ms=800)
+
+    def get_path(self):
+        return reverse('credit-list')
+
+    def get_data(self):
+        return {'ordering': '-received_at', 'limit': 20}
+
+
+class LargeCreditPage(EndpointBenchmark):
+    name = 'credits-large-page'
+    user_group = 'FIU'
+    # measures rendering and compression of long responses
+    request_headers = {'HTTP_ACCEPT_ENCODING': 'br, gzip'}
+    budget = Budget(max_queries=20, p95_ms=1500)
+
+    def get_path(self):
+        return reverse('credit-list')
+
+    def get_data(self):
+        return {'ordering': '-received_at', 'limit': 500}
+
+
+class SenderProfileList(EndpointBenchmark):
+    name = 'sender-profiles'
+    user_group = 'FIU'
+    budget = Budget(max_queries=25, p95_ms=800)
+
+    def get_path(self):
+        return reverse('senderprofile-list')
+
+    def get_data(self):
+        return {'ordering': '-credit_count', 'limit': 20}
+
+
+class PrisonerProfileList(EndpointBenchmark):
+    name = 'prisoner-profiles'
+    user_group = 'FIU'
+    budget = Budget(max_queries=25, p95_ms=800)
+
+    def get_path(self):
+        return reverse('prisonerprofile-list')
+
+    def get_data(self):
+        return {'ordering': '-credit_count', 'limit': 20}
+
+
+class SecurityCheckList(EndpointBenchmark):
+    name = 'security-checks'
+    user_group = 'FIU'
+    budget = Budget(max_queries=25, p95_ms=800)
+
+    def get_path(self):
+        return reverse('security-check-list')
+
+    def get_data(self):
+        return {'status': 'pending', 'limit': 20}
+
+
+class EventList(EndpointBenchmark):
+    name = 'events'
+    user_group = 'FIU'
+    budget = Budget(max_queries=20, p95_ms=500)
+
+    def get_path(self):
+        return reverse('event-list')
+
+    def get_data(self):
+        return {'limit': 25}
+
+
+class PrisonerValidity(EndpointBenchmark):
+    name = 'prisoner-validity'
+    user_group = 'SendMoney'
+    budget = Budget(max_queries=10, p95_ms=200)
+
+    def get_path(self):
+        return reverse('prisoner_validity-list')
+
+    def get_data(self):
+        prisoner_location = self.runner.random_prisoner_location()
+        return {
+            'prisoner_number': prisoner_location.prisoner_number,
+            'prisoner_dob': prisoner_location.prisoner_dob.isoformat(),
+        }
+
+
+class PaymentCreate(EndpointBenchmark):
+    name = 'payments-create'
+    user_group = 'SendMoney'
+    method = 'post'
+    budget = Budget(max_queries=30, p95_ms=500)
+
+    def get_path(self):
+        return reverse('payment-list')
+
+    def get_data(self):
+        return self.runner.new_payment_data()
+
+
+class PaymentUpdate(EndpointBenchmark):
+    name = 'payments-update'
+    user_group = 'SendMoney'
+    method = 'patch'
+    budget = Budget(max_queries=80, p95_ms=1000)
+
+    def prepare(self):
+        response = self.runner.request('post', 'SendMoney', reverse('payment-list'), self.runner.new_payment_data())
+        self.payment_uuid = response.json()['uuid']
+
+    def get_path(self):
+        return reverse('payment-detail', args=[self.payment_uuid])
+
+    def get_data(self):
+        # card details are provided once a payment is made and trigger security checks
+        return {
+            'email': f'sender{self.random.randint(0, 999)}@outside.local',
+            'cardholder_name': 'Mr Benchmark',
+            'card_number_first_digits': '123456',
+            'card_number_last_digits': f'{self.random.randint(0, 9999):04}',
+            'card_expiry_date': '10/30',
+            'card_brand': 'Visa',
+            'worldpay_id': str(self.random.randint(10 ** 15, 10 ** 16 - 1)),
+            'billing_address': {
+                'line1': '62 Petty France',
+                'line2': '',
+                'city': 'London',
+                'country': 'UK',
+                'postcode': 'SW1H 9EU',
+            },
+        }
+
+
+class TransactionUpload(EndpointBenchmark):
+    name = 'transactions-upload'
+    user_group = 'BankAdmin'
+    method = 'post'
+    budget = Budget(max_queries=600, p95_ms=3000)
+    transactions_per_upload = 20
+
+    def get_path(self):
+        return reverse('transaction-list')
+
+    def get_data(self):
+        received_at = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - datetime.timedelta(days=1)
+        data = []
+        for _ in range(self.transactions_per_upload):
+            prisoner_location = self.runner.random_prisoner_location()
+            data.append({
+                'prisoner_number': prisoner_location.prisoner_number,
+                'prisoner_dob': prisoner_location.prisoner_dob.isoformat(),
+                'amount': self.random.randrange(500, 10000, 100),
+                'sender_sort_code': f'{self.random.randint(0, 999999):06}',
+                'sender_account_number': f'{self.random.randint(0, 99999999):08}',
+                'sender_name': 'Benchmark Sender',
+                'reference': f'{prisoner_location.prisoner_number} {prisoner_location.prisoner_dob:%d/%m/%Y}',
+                'received_at': received_at.isoformat(),
+                'category': TransactionCategory.credit.value,
+                'source': TransactionSource.bank_transfer.value,
+            })
+        return data
+
+
+class BenchmarkRunner(AuthTestCaseMixin):
+    """
+    Runs endpoint benchmarks against the current database; all changes are rolled back afterwards
+    and reads are not routed to replicas
+    """
+
+    def __init__(self, iterations=20, warmup=2, budgets=None, check_latency=True, seed=0):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.budgets = budgets or {}
+        self.check_latency = check_latency
+        self.random = random.Random(seed)
+        self.client = APIClient()
+        self.authorisation = {}
+        self.prisoner_locations = []
+
+    def get_budget(self, benchmark):
+        budget = self.budgets.get(benchmark.name)
+        if budget:
+            return benchmark.budget._replace(**budget)
+        return benchmark.budget
+
+    def get_authorisation(self, user_group):
+        if user_group not in self.authorisation:
+            user = User.objects.filter(groups__name=user_group, is_active=True).order_by('pk').first()
+            if not user:
+                raise ValueError(f'No active user in group {user_group}')
+            self.authorisation[user_group] = self.get_http_authorization_for_user(user)
+        return self.authorisation[user_group]
+
+    def random_prisoner_location(self):
+        if not self.prisoner_locations:
+            self.prisoner_locations = list(
+                PrisonerLocation.objects.filter(active=True).order_by('pk')[:500]
+            )
+            if not self.prisoner_locations:
+                raise ValueError('No prisoner locations to benchmark with')
+        return self.random.choice(self.prisoner_locations)
+
+    def new_payment_data(self):
+        prisoner_location = self.random_prisoner_location()
+        amount = self.random.randrange(500, 10000, 100)
+        return {
+            'prisoner_number': prisoner_location.prisoner_number,
+            'prisoner_dob': prisoner_location.prisoner_dob.isoformat(),
+            'recipient_name': 'Benchmark Recipient',
+            'amount': amount,
+            'service_charge': int(amount * 0.025),
+            'email': 'sender@outside.local',
+            'ip_address': '151.101.16.144',
+        }
+
+    def request(self, method, user_group, path, data=None, headers=None):
+        headers = dict(headers or {}, HTTP_AUTHORIZATION=self.get_authorisation(user_group))
+        if method == 'get':
+            return self.client.get(path, data, **headers)
+        return getattr(self.client, method)(path, data, format='json', **headers)
+
+    def run(self, names=None):
+        benchmarks = EndpointBenchmark.get_benchmarks()
+        if names:
+            benchmarks = {name: benchmarks[name] for name in names}
+        started_at = timezone.now()
+        with transaction.atomic():
+            results = [
+                self.run_benchmark(benchmark_cls(self))
+                for benchmark_cls in benchmarks.values()
+            ]
+            transaction.set_rollback(True)
+        return {
+            'started_at': started_at.isoformat(),
+            'commit': settings.APP_GIT_COMMIT or 'unknown',
+            'iterations': self.iterations,
+            'dataset': self.get_dataset_size(),
+            'results': results,
+            'failures': [
+                failure
+                for result in results
+                for failure in result['failures']
+            ],
+        }
+
+    def run_benchmark(self, benchmark):
+        durations = []
+        query_counts = []
+        response_sizes = []
+        statuses = set()
+        for iteration in range(self.warmup + self.iterations):
+            benchmark.prepare()
+            path, data = benchmark.get_path(), benchmark.get_data()
+            with contextlib.ExitStack() as stack:
+                queries = [
+                    stack.enter_context(CaptureQueriesContext(database_connection))
+                    for database_connection in connections.all()
+                ]
+                start = time.perf_counter()
+                response = self.request(benchmark.method, benchmark.user_group, path, data, benchmark.request_headers)
+                duration = (time.perf_counter() - start) * 1000
+            statuses.add(response.status_code)
+            if iteration >= self.warmup:
+                durations.append(duration)
+                query_counts.append(sum(map(len, queries)))
+                response_sizes.append(len(response.content))
+
+        budget = self.get_budget(benchmark)
+        latency = {
+            f'p{p}': round(percentile(durations, p), 2)
+            for p in (50, 90, 95, 99)
+        }
+        latency['max'] = round(max(durations), 2)
+        failures = []
+        if any(status >= 400 for status in statuses):
+            failures.append(f'{benchmark.name}: unexpected response status {sorted(statuses)}')
+        if max(query_counts) > budget.max_queries:
+            failures.append(f'{benchmark.name}: {max(query_counts)} queries exceeds budget of {budget.max_queries}')
+        if self.check_latency and latency['p95'] > budget.p95_ms:
+            failures.append(f'{benchmark.name}: p95 latency {latency["p95"]}ms exceeds budget of {budget.p95_ms}ms')
+        return {
+            'name': benchmark.name,
+            'method': benchmark.method.upper(),
+            'path': path,
+            'statuses': sorted(statuses),
+            'latency_ms': latency,
+            'queries': {'min': min(query_counts), 'max': max(query_counts)},
+            'response_bytes': max(response_sizes),
+            'content_encoding': response.get('Content-Encoding', 'identity'),
+            'budget': budget._asdict(),
+            'failures': failures,
+        }
+
+    def get_dataset_size(self):
+        return {
+            'prisoner_locations': PrisonerLocation.objects.count(),
+            'credits': Credit.objects_all.count(),
+            'payments': Payment.objects.count(),
+            'disbursements': Disbursement.objects.count(),
+            'checks': Check.objects.count(),
+            'sender_profiles': SenderProfile.objects.count(),
+            'prisoner_profiles': PrisonerProfile.objects.count(),
+        }
+
+
+def percentile(values, p):
+    # nearest-rank method
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
@@ -0,0 +1,666 @@
+"""
+Fast generation of large, production-like datasets for benchmarking.
+
+Unlike the generators in each app's tests/utils.py, rows are synthesised in memory and saved in batches
+with `bulk_create` so that no model signals fire and profiles are linked directly rather than
+through `Credit.attach_profiles`; profile totals are recalculated at the end so the `update_security_profiles`
+command need not be run. All random choices come from a single seeded generator
+so that the same seed and sizes produce the same dataset.
+"""
+import datetime
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from credit.constants import CreditResolution, LogAction as CreditLogAction
+from credit.models import Credit, Log as CreditLog
+from disbursement.constants import DisbursementMethod, DisbursementResolution, LogAction as DisbursementLogAction
+from disbursement.models import Disbursement, Log as DisbursementLog
+from payment.constants import PaymentStatus
+from payment.models import BillingAddress, Payment
+from prison.models import Prison, PrisonerLocation
+from security.constants import CheckStatus
+from security.models import (
+    BankAccount, BankTransferRecipientDetails, BankTransferSenderDetails, CardholderName, Check,
+    DebitCardSenderDetails, PrisonerProfile, RecipientProfile, SenderEmail, SenderProfile,
+)
+from transaction.constants import TransactionCategory, TransactionSource
+from transaction.models import Transaction
+
+User = get_user_model()
+
+
+class BulkDataGenerator:
+    """
+    Generates credits (with their payments or transactions), disbursements, security checks,
+    logs and sender/prisoner/recipient profiles for existing prisons and prisoner locations
+    """
+    # approximate share of card payments in each state
+    payment_statuses = (
+        (PaymentStatus.taken.value, 0.84),
+        (PaymentStatus.rejected.value, 0.03),
+        (PaymentStatus.expired.value, 0.08),
+        (PaymentStatus.pending.value, 0.05),
+    )
+    # share of debit card senders and prisoner profiles monitored by FIU
+    monitored_ratio = 0.005
+    # share of bank transfer disbursements sent to someone the prisoner has paid before
+    repeat_recipient_ratio = 0.7
+
+    def __init__(self, seed=0, days_of_history=1300, batch_size=5000, stdout=None):
+        self.random = random.Random(seed)
+        self.fake = Faker(locale='en_GB')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.start = self.now - datetime.timedelta(days=days_of_history)
+        self.stdout = stdout
+
+        self.clerks_by_prison = {
+            prison.nomis_id: list(
+                User.objects.filter(
+                    prisonusermapping__prisons=prison,
+                    is_staff=False,
+                    groups__name='PrisonClerk',
+                ).order_by('pk').values_list('pk', flat=True)
+            )
+            for prison in Prison.objects.order_by('nomis_id')
+        }
+        fiu_group = Group.objects.filter(name='FIU').first()
+        self.fiu_user_ids = list(fiu_group.user_set.order_by('pk').values_list('pk', flat=True)) if fiu_group else []
+        self.prisoners = []
+        self.debit_card_senders = []
+        self.bank_transfer_senders = []
+        self.debit_card_keys = set()
+        self.bank_account_keys = set()
+        self.recipient_accounts = {}
+        self.recipient_profile_ids = {}
+
+    def write(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - offset)
+
+    def skewed_index(self, length, skew=3):
+        # a few senders and prisoners account for most credits, as in production
+        return int(length * self.random.random() ** skew)
+
+    def random_datetime(self):
+        return self.start + datetime.timedelta(
+            seconds=self.random.uniform(0, (self.now - self.start).total_seconds())
+        )
+
+    def random_amount(self):
+        if self.random.random() < 0.8:
+            amount = self.random.randrange(500, 5000, 500)
+        else:
+            amount = self.random.randrange(500, 30000, 500)
+        if self.random.random() < 0.1:
+            amount += self.random.randint(0, 1000)
+        return amount
+
+    def random_digits(self, length):
+        return ''.join(self.random.choices('0123456789', k=length))
+
+    def random_uuid(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def random_clerk(self, prison_id):
+        clerks = self.clerks_by_prison.get(prison_id)
+        return self.random.choice(clerks) if clerks else None
+
+    def generate(self, number_of_payments, number_of_transactions, number_of_disbursements,
+                 number_of_senders, number_of_checks):
+        self.generate_prisoner_profiles()
+        self.generate_sender_profiles(number_of_senders)
+        self.generate_payments(number_of_payments, number_of_checks)
+        self.generate_transactions(number_of_transactions)
+        self.generate_disbursements(number_of_disbursements)
+        self.write('Recalculating profile totals')
+        SenderProfile.objects.all().recalculate_totals()
+        PrisonerProfile.objects.all().recalculate_totals()
+        RecipientProfile.objects.all().recalculate_totals()
+
+    def generate_prisoner_locations(self, number_of_prisoners):
+        self.write(f'Generating {number_of_prisoners} prisoner locations')
+        prison_ids = list(self.clerks_by_prison)
+        created_by = User.objects.order_by('pk').first()
+        prisoner_numbers = set(PrisonerLocation.objects.values_list('prisoner_number', flat=True).iterator())
+        for size in self.batches(number_of_prisoners):
+            prisoner_locations = []
+            for _ in range(size):
+                while True:
+                    prisoner_number = '%s%s%s' % (
+                        'A' if self.random.random() < 0.98 else self.random.choice('BCDEFGHIJKLMNOPQRSTUVWXYZ'),
+                        self.random_digits(4),
+                        ''.join(self.random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=2)),
+                    )
+                    if prisoner_number not in prisoner_numbers:
+                        prisoner_numbers.add(prisoner_number)
+                        break
+                if self.random.random() > 0.8:
+                    first_name = self.fake.first_name_female()
+                else:
+                    first_name = self.fake.first_name_male()
+                age = datetime.timedelta(days=self.random.randint(20 * 365, 85 * 365))
+                prisoner_locations.append(PrisonerLocation(
+                    created_by=created_by,
+                    prisoner_name=f'{first_name} {self.fake.last_name()}'.upper(),
+                    prisoner_number=prisoner_number,
+                    prisoner_dob=(self.now - age).date(),
+                    prison_id=self.random.choice(prison_ids),
+                    active=True,
+                ))
+            PrisonerLocation.objects.bulk_create(prisoner_locations)
+
+    @transaction.atomic()
+    def generate_prisoner_profiles(self):
+        prisoner_locations = list(
+            PrisonerLocation.objects.filter(active=True).order_by('prisoner_number', 'prisoner_dob')
+        )
+        self.write(f'Generating prisoner profiles for {len(prisoner_locations)} prisoner locations')
+        PrisonerProfile.objects.bulk_create(
+            [
+                PrisonerProfile(
+                    prisoner_name=prisoner_location.prisoner_name,
+                    prisoner_number=prisoner_location.prisoner_number,
+                    prisoner_dob=prisoner_location.prisoner_dob,
+                    current_prison_id=prisoner_location.prison_id,
+                )
+                for prisoner_location in prisoner_locations
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        profile_ids = {
+            (prisoner_number, prisoner_dob): profile_id
+            for prisoner_number, prisoner_dob, profile_id in PrisonerProfile.objects.values_list(
+                'prisoner_number', 'prisoner_dob', 'pk',
+            ).iterator()
+        }
+        self.prisoners = [
+            {
+                'profile_id': profile_ids[(prisoner_location.prisoner_number, prisoner_location.prisoner_dob)],
+                'prisoner_number': prisoner_location.prisoner_number,
+                'prisoner_name': prisoner_location.prisoner_name,
+                'prisoner_dob': prisoner_location.prisoner_dob,
+                'prison_id': prisoner_location.prison_id,
+            }
+            for prisoner_location in prisoner_locations
+        ]
+        self.add_monitoring(PrisonerProfile, [prisoner['profile_id'] for prisoner in self.prisoners])
+
+    @transaction.atomic()
+    def generate_sender_profiles(self, number_of_senders):
+        number_of_bank_transfer_senders = number_of_senders // 20
+        number_of_debit_card_senders = number_of_senders - number_of_bank_transfer_senders
+        self.write(f'Generating {number_of_senders} sender profiles')
+        # debit card details must be unique
+        self.debit_card_keys.update(DebitCardSenderDetails.objects.values_list(
+            'card_number_last_digits', 'card_expiry_date', 'postcode',
+        ).iterator())
+
+        for size in self.batches(number_of_debit_card_senders):
+            sender_profiles = SenderProfile.objects.bulk_create([SenderProfile() for _ in range(size)])
+            senders = [self.random_debit_card_sender(sender_profile.pk) for sender_profile in sender_profiles]
+            details = DebitCardSenderDetails.objects.bulk_create([
+                DebitCardSenderDetails(
+                    sender_id=sender['profile_id'],
+                    card_number_last_digits=sender['card_number_last_digits'],
+                    card_expiry_date=sender['card_expiry_date'],
+                    postcode=sender['postcode'],
+                )
+                for sender in senders
+            ])
+            for sender, sender_details in zip(senders, details):
+                sender['details_id'] = sender_details.pk
+            CardholderName.objects.bulk_create(
+                CardholderName(debit_card_sender_details_id=sender['details_id'], name=sender['cardholder_name'])
+                for sender in senders
+            )
+            SenderEmail.objects.bulk_create(
+                SenderEmail(debit_card_sender_details_id=sender['details_id'], email=sender['email'])
+                for sender in senders
+            )
+            self.add_monitoring(DebitCardSenderDetails, [sender['details_id'] for sender in senders])
+            self.debit_card_senders.extend(senders)
+
+        for size in self.batches(number_of_bank_transfer_senders):
+            sender_profiles = SenderProfile.objects.bulk_create([SenderProfile() for _ in range(size)])
+            bank_accounts = BankAccount.objects.bulk_create([
+                BankAccount(sort_code=self.random_digits(6), account_number=self.random_digits(8))
+                for _ in sender_profiles
+            ])
+            senders = [
+                {
+                    'profile_id': sender_profile.pk,
+                    'sender_name': f'{self.fake.first_name()} {self.fake.last_name()}'.upper(),
+                    'sort_code': bank_account.sort_code,
+                    'account_number': bank_account.account_number,
+                    'bank_account_id': bank_account.pk,
+                }
+                for sender_profile, bank_account in zip(sender_profiles, bank_accounts)
+            ]
+            BankTransferSenderDetails.objects.bulk_create(
+                BankTransferSenderDetails(
+                    sender_id=sender['profile_id'],
+                    sender_name=sender['sender_name'],
+                    sender_bank_account_id=sender['bank_account_id'],
+                )
+                for sender in senders
+            )
+            self.bank_transfer_senders.extend(senders)
+
+    def random_debit_card_sender(self, profile_id):
+        name = f'{self.fake.first_name()} {self.fake.last_name()}'
+        while True:
+            card_number_last_digits = self.random_digits(4)
+            card_expiry_date = '%02d/%02d' % (self.random.randint(1, 12), self.random.randint(20, 30))
+            postcode = self.fake.postcode()
+            key = (card_number_last_digits, card_expiry_date, postcode)
+            if key not in self.debit_card_keys:
+                self.debit_card_keys.add(key)
+                break
+        return {
+            'profile_id': profile_id,
+            'cardholder_name': name,
+            'email': '%s.%s@mail.local' % (name.replace(' ', '.').lower(), self.random_digits(3)),
+            'card_number_first_digits': self.random_digits(6),
+            'card_number_last_digits': card_number_last_digits,
+            'card_expiry_date': card_expiry_date,
+            'line1': self.fake.street_address(),
+            'city': self.fake.city(),
+            'postcode': postcode,
+            'ip_address': self.fake.ipv4(),
+        }
+
+    def add_monitoring(self, model, ids):
+        if not self.fiu_user_ids:
+            return
+        through = model.monitoring_users.through
+        object_field = f'{model._meta.model_name}_id'
+        through.objects.bulk_create(
+            [
+                through(**{object_field: object_id, 'user_id': self.random.choice(self.fiu_user_ids)})
+                for object_id in ids
+                if self.random.random() < self.monitored_ratio
+            ],
+            ignore_conflicts=True,
+        )
+
+    def pick_sender_and_prisoner(self, senders):
+        sender_index = self.skewed_index(len(senders))
+        sender = senders[sender_index]
+        # most senders only ever send money to one prisoner
+        prisoner_index = (sender_index * 7919 + self.skewed_index(4, skew=6)) % len(self.prisoners)
+        return sender, self.prisoners[prisoner_index]
+
+    def credit_resolution(self, received_at):
+        if received_at < self.now - datetime.timedelta(days=1):
+            return CreditResolution.credited.value
+        return CreditResolution.pending.value
+
+    def credit_for(self, prisoner, sender, created, received_at, resolution):
+        credited = resolution == CreditResolution.credited.value
+        return Credit(
+            amount=self.random_amount(),
+            received_at=received_at,
+            prisoner_number=prisoner['prisoner_number'],
+            prisoner_name=prisoner['prisoner_name'],
+            prisoner_dob=prisoner['prisoner_dob'],
+            prison_id=prisoner['prison_id'],
+            resolution=resolution,
+            reconciled=credited,
+            # profile totals are recalculated once all credits are saved
+            is_counted_in_sender_profile_total=credited,
+            is_counted_in_prisoner_profile_total=credited,
+            owner_id=self.random_clerk(prisoner['prison_id']) if credited else None,
+            nomis_transaction_id=f'{self.random.randint(1000000, 9999999)}-1' if credited else None,
+            sender_profile_id=sender['profile_id'],
+            prisoner_profile_id=prisoner['profile_id'],
+            created=created,
+            modified=received_at or created,
+        )
+
+    def generate_payments(self, number_of_payments, number_of_checks):
+        if not number_of_payments or not self.debit_card_senders or not self.prisoners:
+            return
+        self.write(f'Generating {number_of_payments} payments')
+        check_ratio = min(1, number_of_checks / number_of_payments)
+        statuses, weights = zip(*self.payment_statuses)
+        for size in self.batches(number_of_payments):
+            rows = []
+            for _ in range(size):
+                sender, prisoner = self.pick_sender_and_prisoner(self.debit_card_senders)
+                status = self.random.choices(statuses, weights)[0]
+                started_at = self.random_datetime()
+                if status == PaymentStatus.taken.value:
+                    received_at = started_at + datetime.timedelta(seconds=self.random.randint(30, 600))
+                    resolution = self.credit_resolution(received_at)
+                elif status == PaymentStatus.pending.value:
+                    received_at = None
+                    resolution = CreditResolution.initial.value
+                else:
+                    received_at = None
+                    resolution = CreditResolution.failed.value
+                credit = self.credit_for(prisoner, sender, started_at, received_at, resolution)
+                rows.append((sender, prisoner, status, credit))
+            with transaction.atomic():
+                self.save_payments(rows, check_ratio)
+
+    def save_payments(self, rows, check_ratio):
+        credits = Credit.objects_all.bulk_create([credit for *_, credit in rows])
+        billing_addresses = BillingAddress.objects.bulk_create([
+            BillingAddress(
+                line1=sender['line1'], city=sender['city'], postcode=sender['postcode'], country='UK',
+                debit_card_sender_details_id=sender['details_id'],
+            )
+            for sender, *_ in rows
+        ])
+        payments = []
+        checks = []
+        for (sender, prisoner, status, _), credit, billing_address in zip(rows, credits, billing_addresses):
+            card_details = {} if status == PaymentStatus.pending.value else {
+                'cardholder_name': sender['cardholder_name'],
+                'card_number_first_digits': sender['card_number_first_digits'],
+                'card_number_last_digits': sender['card_number_last_digits'],
+                'card_expiry_date': sender['card_expiry_date'],
+                'card_brand': 'Visa',
+                'processor_id': str(self.random_uuid()),
+                'worldpay_id': self.random_digits(16),
+            }
+            payments.append(Payment(
+                uuid=self.random_uuid(),
+                status=status,
+                amount=credit.amount,
+                service_charge=int(credit.amount * 0.025),
+                recipient_name=prisoner['prisoner_name'],
+                email=sender['email'],
+                ip_address=sender['ip_address'],
+                credit_id=credit.pk,
+                billing_address_id=billing_address.pk,
+                created=credit.created,
+                modified=credit.modified,
+                **card_details,
+            ))
+            if status != PaymentStatus.expired.value and self.random.random() < check_ratio:
+                checks.append(self.check_for(credit, status))
+        Payment.objects.bulk_create(payments)
+        Check.objects.bulk_create(checks)
+        self.save_credit_logs_and_links(credits)
+
+    def check_for(self, credit, payment_status):
+        if payment_status == PaymentStatus.pending.value:
+            status = CheckStatus.pending.value
+        elif payment_status == PaymentStatus.rejected.value:
+            status = CheckStatus.rejected.value
+        else:
+            status = CheckStatus.accepted.value
+        actioned = status != CheckStatus.pending.value and bool(self.fiu_user_ids)
+        actioned_at = credit.created + datetime.timedelta(minutes=self.random.randint(5, 600))
+        return Check(
+            credit_id=credit.pk,
+            status=status,
+            description=['Credit matched FIU monitoring rules'],
+            rules=[self.random.choice(['FIUMONP', 'FIUMONS', 'CSFREQ', 'CSNUM', 'CPNUM'])],
+            rejection_reasons=(
+                {'fiu_investigation_id': self.random_digits(6)}
+                if status == CheckStatus.rejected.value else {}
+            ),
+            actioned_at=actioned_at if actioned else None,
+            actioned_by_id=self.random.choice(self.fiu_user_ids) if actioned else None,
+            created=credit.created,
+            modified=actioned_at if actioned else credit.created,
+        )
+
+    def save_credit_logs_and_links(self, credits):
+        logs = []
+        for credit in credits:
+            if credit.resolution == CreditResolution.credited.value:
+                credited_at = credit.received_at + datetime.timedelta(hours=self.random.randint(1, 48))
+                logs.append(CreditLog(
+                    credit_id=credit.pk, user_id=credit.owner_id, action=CreditLogAction.credited.value,
+                    created=credited_at, modified=credited_at,
+                ))
+        CreditLog.objects.bulk_create(logs)
+
+        completed_credits = [
+            credit for credit in credits
+            if credit.resolution not in (CreditResolution.initial.value, CreditResolution.failed.value)
+        ]
+        sender_prisoner_links = PrisonerProfile.senders.through
+        sender_prisoner_links.objects.bulk_create(
+            [
+                sender_prisoner_links(prisonerprofile_id=prisoner_profile_id, senderprofile_id=sender_profile_id)
+                for prisoner_profile_id, sender_profile_id in set(
+                    (credit.prisoner_profile_id, credit.sender_profile_id) for credit in completed_credits
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        sender_prison_links = SenderProfile.prisons.through
+        sender_prison_links.objects.bulk_create(
+            [
+                sender_prison_links(senderprofile_id=sender_profile_id, prison_id=prison_id)
+                for sender_profile_id, prison_id in set(
+                    (credit.sender_profile_id, credit.prison_id) for credit in completed_credits
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        prisoner_prison_links = PrisonerProfile.prisons.through
+        prisoner_prison_links.objects.bulk_create(
+            [
+                prisoner_prison_links(prisonerprofile_id=prisoner_profile_id, prison_id=prison_id)
+                for prisoner_profile_id, prison_id in set(
+                    (credit.prisoner_profile_id, credit.prison_id) for credit in completed_credits
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+    def generate_transactions(self, number_of_transactions):
+        if not number_of_transactions or not self.bank_transfer_senders or not self.prisoners:
+            return
+        self.write(f'Generating {number_of_transactions} bank transfers')
+        for size in self.batches(number_of_transactions):
+            rows = []
+            for _ in range(size):
+                sender, prisoner = self.pick_sender_and_prisoner(self.bank_transfer_senders)
+                received_at = self.random_datetime().replace(hour=12, minute=0, second=0, microsecond=0)
+                credit = self.credit_for(
+                    prisoner, sender, received_at, received_at, self.credit_resolution(received_at),
+                )
+                rows.append((sender, prisoner, credit))
+            with transaction.atomic():
+                credits = Credit.objects_all.bulk_create([credit for *_, credit in rows])
+                Transaction.objects.bulk_create(
+                    Transaction(
+                        amount=credit.amount,
+                        category=TransactionCategory.credit.value,
+                        source=TransactionSource.bank_transfer.value,
+                        sender_sort_code=sender['sort_code'],
+                        sender_account_number=sender['account_number'],
+                        sender_name=sender['sender_name'],
+                        reference=f'{prisoner["prisoner_number"]} {prisoner["prisoner_dob"]:%d/%m/%Y}',
+                        received_at=credit.received_at,
+                        ref_code=self.random_digits(6),
+                        credit_id=credit.pk,
+                        created=credit.created,
+                        modified=credit.modified,
+                    )
+                    for (sender, prisoner, _), credit in zip(rows, credits)
+                )
+                self.save_credit_logs_and_links(credits)
+
+    def generate_disbursements(self, number_of_disbursements):
+        if not number_of_disbursements or not self.prisoners:
+            return
+        self.write(f'Generating {number_of_disbursements} disbursements')
+        # recipient bank accounts must be unique
+        self.bank_account_keys.update(BankAccount.objects.filter(roll_number='').values_list(
+            'sort_code', 'account_number',
+        ).iterator())
+        for size in self.batches(number_of_disbursements):
+            disbursements = [self.random_disbursement() for _ in range(size)]
+            with transaction.atomic():
+                self.save_recipient_profiles(disbursements)
+                disbursements = Disbursement.objects.bulk_create(disbursements)
+                self.save_disbursement_logs(disbursements)
+                self.save_disbursement_links(disbursements)
+
+    def random_disbursement(self):
+        prisoner = self.prisoners[self.skewed_index(len(self.prisoners))]
+        created = self.random_datetime()
+        method = self.random.choice(DisbursementMethod.values)
+        is_bank_transfer = method == DisbursementMethod.bank_transfer.value
+        sort_code, account_number = self.random_recipient_account(prisoner) if is_bank_transfer else (None, None)
+        if created < self.now - datetime.timedelta(days=3):
+            resolution = self.random.choices(
+                (DisbursementResolution.sent.value, DisbursementResolution.rejected.value), (0.95, 0.05)
+            )[0]
+        else:
+            resolution = self.random.choice(DisbursementResolution.values)
+        return Disbursement(
+            amount=self.random_amount(),
+            prisoner_number=prisoner['prisoner_number'],
+            prisoner_name=prisoner['prisoner_name'],
+            prison_id=prisoner['prison_id'],
+            resolution=resolution,
+            method=method,
+            recipient_first_name=self.fake.first_name(),
+            recipient_last_name=self.fake.last_name(),
+            recipient_email=self.fake.email() if self.random.random() < 0.5 else None,
+            address_line1=self.fake.street_address(),
+            city=self.fake.city(),
+            postcode=self.fake.postcode(),
+            country='UK',
+            sort_code=sort_code,
+            account_number=account_number,
+            nomis_transaction_id=(
+                f'{self.random.randint(1000000, 9999999)}-1'
+                if resolution == DisbursementResolution.sent.value else None
+            ),
+            # like `update_security_profiles`, only sent disbursements are linked to profiles
+            prisoner_profile_id=prisoner['profile_id'] if resolution == DisbursementResolution.sent.value else None,
+            created=created,
+            modified=created + datetime.timedelta(days=1),
+        )
+
+    def random_recipient_account(self, prisoner):
+        # prisoners mostly send money to the same few people
+        accounts = self.recipient_accounts.setdefault(prisoner['profile_id'], [])
+        if accounts and self.random.random() < self.repeat_recipient_ratio:
+            return self.random.choice(accounts)
+        while True:
+            key = (self.random_digits(6), self.random_digits(8))
+            if key not in self.bank_account_keys:
+                self.bank_account_keys.add(key)
+                break
+        accounts.append(key)
+        return key
+
+    def save_recipient_profiles(self, disbursements):
+        sent_disbursements = [
+            disbursement for disbursement in disbursements
+            if disbursement.resolution == DisbursementResolution.sent.value
+        ]
+        has_cheques = any(not disbursement.sort_code for disbursement in sent_disbursements)
+        if has_cheques and 'cheque' not in self.recipient_profile_ids:
+            self.recipient_profile_ids['cheque'] = RecipientProfile.objects.get_or_create_cheque_recipient().pk
+
+        new_keys = list(dict.fromkeys(
+            (disbursement.sort_code, disbursement.account_number)
+            for disbursement in sent_disbursements
+            if disbursement.sort_code
+            and (disbursement.sort_code, disbursement.account_number) not in self.recipient_profile_ids
+        ))
+        if new_keys:
+            recipient_profiles = RecipientProfile.objects.bulk_create([RecipientProfile() for _ in new_keys])
+            bank_accounts = BankAccount.objects.bulk_create([
+                BankAccount(sort_code=sort_code, account_number=account_number)
+                for sort_code, account_number in new_keys
+            ])
+            BankTransferRecipientDetails.objects.bulk_create(
+                BankTransferRecipientDetails(
+                    recipient_id=recipient_profile.pk, recipient_bank_account_id=bank_account.pk,
+                )
+                for recipient_profile, bank_account in zip(recipient_profiles, bank_accounts)
+            )
+            for key, recipient_profile in zip(new_keys, recipient_profiles):
+                self.recipient_profile_ids[key] = recipient_profile.pk
+
+        for disbursement in sent_disbursements:
+            if disbursement.sort_code:
+                key = (disbursement.sort_code, disbursement.account_number)
+            else:
+                key = 'cheque'
+            disbursement.recipient_profile_id = self.recipient_profile_ids[key]
+
+    def save_disbursement_logs(self, disbursements):
+        actions_by_resolution = {
+            DisbursementResolution.pending.value: [],
+            DisbursementResolution.rejected.value: [DisbursementLogAction.rejected.value],
+            DisbursementResolution.preconfirmed.value: [],
+            DisbursementResolution.confirmed.value: [DisbursementLogAction.confirmed.value],
+            DisbursementResolution.sent.value: [
+                DisbursementLogAction.confirmed.value, DisbursementLogAction.sent.value,
+            ],
+        }
+        logs = []
+        for disbursement in disbursements:
+            clerk = self.random_clerk(disbursement.prison_id)
+            actions = [DisbursementLogAction.created.value] + actions_by_resolution[disbursement.resolution]
+            for step, action in enumerate(actions):
+                logged_at = disbursement.created + datetime.timedelta(hours=step * 12)
+                logs.append(DisbursementLog(
+                    disbursement_id=disbursement.pk, user_id=clerk, action=action,
+                    created=logged_at, modified=logged_at,
+                ))
+        DisbursementLog.objects.bulk_create(logs)
+
+    def save_disbursement_links(self, disbursements):
+        linked_disbursements = [disbursement for disbursement in disbursements if disbursement.recipient_profile_id]
+        prisoner_recipient_links = PrisonerProfile.recipients.through
+        prisoner_recipient_links.objects.bulk_create(
+            [
+                prisoner_recipient_links(
+                    prisonerprofile_id=prisoner_profile_id, recipientprofile_id=recipient_profile_id,
+                )
+                for prisoner_profile_id, recipient_profile_id in set(
+                    (disbursement.prisoner_profile_id, disbursement.recipient_profile_id)
+                    for disbursement in linked_disbursements
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        recipient_prison_links = RecipientProfile.prisons.through
+        recipient_prison_links.objects.bulk_create(
+            [
+                recipient_prison_links(recipientprofile_id=recipient_profile_id, prison_id=prison_id)
+                for recipient_profile_id, prison_id in set(
+                    (disbursement.recipient_profile_id, disbursement.prison_id)
+                    for disbursement in linked_disbursements
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        prisoner_prison_links = PrisonerProfile.prisons.through
+        prisoner_prison_links.objects.bulk_create(
+            [
+                prisoner_prison_links(prisonerprofile_id=prisoner_profile_id, prison_id=prison_id)
+                for prisoner_profile_id, prison_id in set(
+                    (disbursement.prisoner_profile_id, disbursement.prison_id)
+                    for disbursement in linked_disbursements
+                )
+            ],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,67 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.tests.benchmarks import BenchmarkRunner, EndpointBenchmark, percentile
+from core.tests.bulk_data import BulkDataGenerator
+from core.tests.utils import make_test_users
+
+
+class EndpointBenchmarkTestCase(TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+
+    def setUp(self):
+        super().setUp()
+        make_test_users()
+        generator = BulkDataGenerator(days_of_history=30)
+        generator.generate_prisoner_locations(50)
+        generator.generate(
+            number_of_payments=200,
+            number_of_transactions=50,
+            number_of_disbursements=50,
+            number_of_senders=40,
+            number_of_checks=40,
+        )
+
+    def test_endpoints_within_query_budgets(self):
+        # latency depends on the machine running tests so only query counts are enforced here
+        report = BenchmarkRunner(iterations=3, warmup=1, check_latency=False).run()
+
+        self.assertListEqual(report['failures'], [])
+        self.assertSetEqual(
+            set(result['name'] for result in report['results']),
+            set(EndpointBenchmark.get_benchmarks())
+        )
+        self.assertEqual(report['dataset']['payments'], 200)
+
+    def test_command_saves_report_and_fails_when_budget_exceeded(self):
+        with tempfile.TemporaryDirectory() as temp_path:
+            budgets_path = os.path.join(temp_path, 'budgets.json')
+            report_path = os.path.join(temp_path, 'report.json')
+            with open(budgets_path, 'w') as f:
+                json.dump({'events': {'max_queries': 0}}, f)
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_endpoints',
+                    endpoint=['events', 'prisoner-validity'], iterations=2, warmup=0,
+                    budgets=budgets_path, report=report_path, no_latency_budgets=True,
+                    stdout=io.StringIO(), stderr=io.StringIO(),
+                )
+
+            with open(report_path) as f:
+                report = json.load(f)
+        self.assertEqual(len(report['results']), 2)
+        self.assertEqual(len(report['failures']), 1)
+        self.assertIn('events', report['failures'][0])
+        self.assertEqual(report['results'][0]['budget'], {'max_queries': 0, 'p95_ms': 500})
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([3.0], 99), 3.0)
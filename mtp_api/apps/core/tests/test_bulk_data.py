@@ -0,0 +1,110 @@
+import io
+
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase
+
+from core.tests.bulk_data import BulkDataGenerator
+from core.tests.utils import make_test_users
+from credit.constants import CreditResolution
+from credit.models import Credit
+from disbursement.constants import DisbursementResolution
+from disbursement.models import Disbursement
+from payment.models import Payment
+from prison.models import PrisonerLocation
+from security.models import BankAccount, Check, PrisonerProfile, RecipientProfile, SenderProfile
+from transaction.models import Transaction
+
+
+class BulkDataGeneratorTestCase(TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+
+    def setUp(self):
+        super().setUp()
+        make_test_users()
+
+    def generate(self, seed=0):
+        generator = BulkDataGenerator(seed=seed, days_of_history=30, batch_size=20)
+        generator.generate_prisoner_locations(30)
+        generator.generate(
+            number_of_payments=60,
+            number_of_transactions=20,
+            number_of_disbursements=25,
+            number_of_senders=10,
+            number_of_checks=15,
+        )
+
+    def test_generates_requested_volumes(self):
+        self.generate()
+
+        self.assertEqual(PrisonerLocation.objects.count(), 30)
+        self.assertEqual(Payment.objects.count(), 60)
+        self.assertEqual(Transaction.objects.count(), 20)
+        self.assertEqual(Disbursement.objects.count(), 25)
+        self.assertEqual(Credit.objects_all.count(), 80)
+        self.assertLessEqual(Check.objects.count(), 15)
+        self.assertEqual(SenderProfile.objects.count(), 10)
+        self.assertTrue(PrisonerProfile.objects.exists())
+
+        linked_credit = Credit.objects.filter(sender_profile__isnull=False).first()
+        self.assertIsNotNone(linked_credit)
+        sender_profile = linked_credit.sender_profile
+        sender_profile.refresh_from_db()
+        self.assertGreater(sender_profile.credit_count, 0)
+
+    def test_profiles_need_no_further_updates(self):
+        self.generate()
+
+        self.assertFalse(Credit.objects.filter(
+            resolution=CreditResolution.credited,
+        ).filter(
+            Q(is_counted_in_sender_profile_total=False) | Q(is_counted_in_prisoner_profile_total=False)
+        ).exists())
+        sent_disbursements = Disbursement.objects.filter(resolution=DisbursementResolution.sent)
+        self.assertTrue(sent_disbursements.exists())
+        self.assertFalse(sent_disbursements.filter(
+            Q(recipient_profile__isnull=True) | Q(prisoner_profile__isnull=True)
+        ).exists())
+        self.assertEqual(
+            sum(RecipientProfile.objects.values_list('disbursement_count', flat=True)),
+            sent_disbursements.count(),
+        )
+
+        def profile_totals():
+            return (
+                list(PrisonerProfile.objects.order_by('pk').values_list(
+                    'pk', 'credit_count', 'credit_total', 'disbursement_count', 'disbursement_total',
+                )),
+                list(SenderProfile.objects.order_by('pk').values_list('pk', 'credit_count', 'credit_total')),
+                list(RecipientProfile.objects.order_by('pk').values_list(
+                    'pk', 'disbursement_count', 'disbursement_total',
+                )),
+            )
+
+        totals = profile_totals()
+        call_command('update_security_profiles', stdout=io.StringIO())
+        self.assertEqual(profile_totals(), totals)
+
+    def test_same_seed_produces_same_data(self):
+        def snapshot():
+            return (
+                list(Credit.objects_all.order_by('received_at', 'amount').values_list('amount', 'prisoner_number')),
+                list(Disbursement.objects.order_by('created', 'amount').values_list('amount', 'method')),
+            )
+
+        self.generate(seed=1)
+        first_snapshot = snapshot()
+
+        Check.objects.all().delete()
+        Payment.objects.all().delete()
+        Transaction.objects.all().delete()
+        Credit.objects_all.all().delete()
+        Disbursement.objects.all().delete()
+        SenderProfile.objects.all().delete()
+        PrisonerProfile.objects.all().delete()
+        RecipientProfile.objects.all().delete()
+        BankAccount.objects.all().delete()
+        PrisonerLocation.objects.all().delete()
+
+        self.generate(seed=1)
+        self.assertEqual(snapshot(), first_snapshot)
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import brotli
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import CompressionMiddleware, get_accepted_encoding
+from core.tests.utils import make_test_users
+from mtp_auth.tests.utils import AuthTestCaseMixin
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    data = {'results': [{'id': i, 'prisoner_name': 'JAMES HALLS', 'amount': 1000} for i in range(100)]}
+
+    def get_response(self, accept_encoding='', response=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        middleware = CompressionMiddleware(lambda _: response or JsonResponse(self.data))
+        return middleware(request)
+
+    def test_brotli_preferred(self):
+        response = self.get_response('gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(brotli.decompress(response.content)), self.data)
+
+    def test_gzip(self):
+        for accept_encoding in ('gzip', 'gzip, deflate', 'br;q=0, gzip;q=0.5'):
+            response = self.get_response(accept_encoding)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(json.loads(gzip.decompress(response.content)), self.data)
+
+    def test_not_compressed_unless_accepted(self):
+        for accept_encoding in ('', 'identity', 'deflate', 'gzip;q=0'):
+            response = self.get_response(accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(json.loads(response.content), self.data)
+
+    def test_small_responses_not_compressed(self):
+        response = self.get_response('br', response=JsonResponse({'id': 1}))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_html_not_compressed(self):
+        response = self.get_response('br', response=HttpResponse('<p>csrf</p>' * 1000))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_strong_etag_weakened(self):
+        response = JsonResponse(self.data)
+        response['ETag'] = '"abc"'
+        response = self.get_response('gzip', response=response)
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=0)
+    def test_compression_disabled(self):
+        response = self.get_response('br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accepted_encoding(self):
+        supported_encodings = ('br', 'gzip')
+        self.assertEqual(get_accepted_encoding('*', supported_encodings), 'br')
+        self.assertEqual(get_accepted_encoding('GZIP;q=1.0, br;q=0.0', supported_encodings), 'gzip')
+        self.assertEqual(get_accepted_encoding('*;q=0.5, br;q=0', supported_encodings), 'gzip')
+        self.assertIsNone(get_accepted_encoding('gzip;q=x', supported_encodings))
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=100)
+class CompressedApiResponseTestCase(AuthTestCaseMixin, TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+
+    def setUp(self):
+        super().setUp()
+        self.prison_clerk = make_test_users()['prison_clerks'][0]
+
+    def test_api_response_compressed(self):
+        response = self.client.get(
+            reverse('prison-list'),
+            HTTP_AUTHORIZATION=self.get_http_authorization_for_user(self.prison_clerk),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('results', json.loads(gzip.decompress(response.content)))
@@ -0,0 +1,152 @@
+import threading
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from prometheus_client import REGISTRY
+
+from core.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            new_connection = FakeConnection()
+            self.opened.append(new_connection)
+            return new_connection
+
+        return ConnectionPool(
+            'test',
+            connect=connect,
+            check=lambda conn: conn.healthy,
+            reset=lambda conn: not conn.closed,
+            **kwargs,
+        )
+
+    def test_connections_reused(self):
+        pool = self.make_pool(max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_size_limited(self):
+        pool = self.make_pool(max_size=2, timeout=0.05)
+        pool.getconn()
+        conn = pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        # waiting threads receive returned connections
+        timer = threading.Timer(0.01, pool.putconn, args=[conn])
+        timer.start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        self.assertEqual(len(self.opened), 2)
+
+    def test_unhealthy_connections_replaced(self):
+        pool = self.make_pool(max_size=1, check_after=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.healthy = False
+        new_conn = pool.getconn()
+        self.assertIsNot(new_conn, conn)
+        self.assertTrue(conn.closed)
+
+    def test_health_checked_only_after_idling(self):
+        pool = self.make_pool(max_size=1, check_after=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.healthy = False
+        self.assertIs(pool.getconn(), conn)
+
+    def test_broken_connections_not_returned(self):
+        pool = self.make_pool(max_size=1)
+        conn = pool.getconn()
+        conn.close()
+        pool.putconn(conn)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.getconn(), conn)
+
+    def test_old_and_idle_connections_closed(self):
+        pool = self.make_pool(max_size=2, max_age=100, max_idle=10)
+        with mock.patch('core.db_pool.time.monotonic', return_value=1000):
+            conn1 = pool.getconn()
+            conn2 = pool.getconn()
+            pool.putconn(conn1)
+        with mock.patch('core.db_pool.time.monotonic', return_value=1020):
+            pool.putconn(conn2)
+        self.assertTrue(conn1.closed)
+        self.assertFalse(conn2.closed)
+        self.assertEqual(pool.size, 1)
+
+        with mock.patch('core.db_pool.time.monotonic', return_value=1101):
+            conn3 = pool.getconn()
+        self.assertTrue(conn2.closed)
+        self.assertIsNot(conn3, conn2)
+
+    def test_close(self):
+        pool = self.make_pool(max_size=2)
+        conn1 = pool.getconn()
+        conn2 = pool.getconn()
+        pool.putconn(conn1)
+        pool.close()
+        self.assertTrue(conn1.closed)
+        self.assertFalse(conn2.closed)
+        pool.putconn(conn2)
+        self.assertTrue(conn2.closed)
+        self.assertEqual(pool.size, 0)
+
+
+class PoolMetricsTestCase(TestCase):
+    def test_pool_metrics_exported(self):
+        if not connection.settings_dict.get('POOL', {}).get('MAX_SIZE'):
+            self.skipTest('Database connection pooling is disabled')
+        connection.ensure_connection()
+        self.assertEqual(
+            REGISTRY.get_sample_value('mtp_api_db_pool_max_size', {'alias': connection.alias}),
+            connection.settings_dict['POOL']['MAX_SIZE'],
+        )
+        self.assertGreaterEqual(
+            REGISTRY.get_sample_value('mtp_api_db_pool_connections', {'alias': connection.alias, 'state': 'in_use'}),
+            1,
+        )
+
+
+class PostgreSQLResetTestCase(TestCase):
+    def test_session_state_discarded(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Only the PostgreSQL backend pools connections')
+        from core.db_backends.postgresql.base import connect, reset
+
+        pooled_connection = connect(connection.get_connection_params(), None)
+        self.addCleanup(pooled_connection.close)
+        # as used by django, so that session state is not simply rolled back
+        pooled_connection.autocommit = True
+        with pooled_connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            (default_statement_timeout,) = cursor.fetchone()
+            cursor.execute("SET statement_timeout = '1234ms'")
+            cursor.execute('CREATE TEMPORARY TABLE leaked_state (id integer)')
+
+        self.assertTrue(reset(pooled_connection))
+        self.assertTrue(pooled_connection.autocommit)
+
+        with pooled_connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone(), (default_statement_timeout,))
+            cursor.execute("SELECT to_regclass('pg_temp.leaked_state')")
+            self.assertEqual(cursor.fetchone(), (None,))
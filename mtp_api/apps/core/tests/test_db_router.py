@@ -0,0 +1,147 @@
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.db_router import ReplicaReadMixin, is_user_pinned, replica_alias, use_replica
+from core.middleware import ReplicaPinningMiddleware
+from prison.models import Prison
+from user_event_log.models import UserEvent
+
+User = get_user_model()
+
+
+@override_settings(
+    DATABASES=dict(settings.DATABASES, **{replica_alias: settings.DATABASES['default']}),
+    DATABASE_REPLICA_MAX_LAG=30,
+)
+@mock.patch('core.db_router.get_replica_lag', return_value=2.0)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_reads_only_sent_to_replica_when_requested(self, _):
+        self.assertEqual(router.db_for_read(Prison), 'default')
+        with use_replica() as replica_used:
+            self.assertTrue(replica_used)
+            self.assertEqual(router.db_for_read(Prison), replica_alias)
+        self.assertEqual(router.db_for_read(Prison), 'default')
+
+    def test_writes_use_primary(self, _):
+        with use_replica():
+            self.assertEqual(router.db_for_write(Prison), 'default')
+            # later reads may depend on the write
+            self.assertEqual(router.db_for_read(Prison), 'default')
+
+        with use_replica():
+            self.assertEqual(router.db_for_read(Prison), replica_alias)
+
+    def test_decorator(self, _):
+        @use_replica()
+        def read():
+            return router.db_for_read(Prison)
+
+        self.assertEqual(read(), replica_alias)
+        self.assertEqual(router.db_for_read(Prison), 'default')
+
+    def test_lagging_replica_not_used(self, mocked_get_replica_lag):
+        for lag in (31.0, float('inf')):
+            mocked_get_replica_lag.return_value = lag
+            with use_replica() as replica_used:
+                self.assertFalse(replica_used)
+                self.assertEqual(router.db_for_read(Prison), 'default')
+
+    def test_only_project_models_routed(self, _):
+        cache_model = DatabaseCache('mtp_cache', {}).cache_model_class
+        with use_replica():
+            for model in (cache_model, Session, User, UserEvent):
+                self.assertEqual(router.db_for_read(model), 'default')
+            self.assertEqual(router.db_for_read(Prison), replica_alias)
+
+    def test_infrastructure_writes_not_tracked(self, _):
+        cache_model = DatabaseCache('mtp_cache', {}).cache_model_class
+        with use_replica():
+            for model in (cache_model, Session, UserEvent):
+                self.assertEqual(router.db_for_write(model), 'default')
+            self.assertEqual(router.db_for_read(Prison), replica_alias)
+
+        request = RequestFactory().get('/')
+        request.user = User(pk=1000, username='reader')
+
+        def view(request):
+            router.db_for_write(cache_model)
+            router.db_for_write(UserEvent)
+            return HttpResponse()
+
+        ReplicaPinningMiddleware(view)(request)
+        self.assertFalse(is_user_pinned(request.user))
+
+    def test_replica_not_migrated(self, _):
+        self.assertFalse(router.allow_migrate(replica_alias, 'prison', 'prison'))
+        self.assertTrue(router.allow_migrate('default', 'prison', 'prison'))
+
+    def test_views_only_read_from_replica_for_safe_methods(self, _):
+        class View(ReplicaReadMixin, APIView):
+            authentication_classes = ()
+            permission_classes = ()
+
+            def get(self, request):
+                return Response(router.db_for_read(Prison))
+
+            def post(self, request):
+                return Response(router.db_for_read(Prison))
+
+        view = View.as_view()
+        self.assertEqual(view(APIRequestFactory().get('/')).data, replica_alias)
+        self.assertEqual(view(APIRequestFactory().post('/')).data, 'default')
+
+    def test_users_pinned_to_primary_after_writes(self, _):
+        user = User(pk=1000, username='pinned')
+        other_user = User(pk=1001, username='not-pinned')
+
+        def view(request):
+            router.db_for_write(Prison)
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.user = user
+        ReplicaPinningMiddleware(view)(request)
+        self.assertTrue(is_user_pinned(user))
+        self.assertFalse(is_user_pinned(other_user))
+
+        with use_replica(user=user) as replica_used:
+            self.assertFalse(replica_used)
+            self.assertEqual(router.db_for_read(Prison), 'default')
+        with use_replica(user=other_user) as replica_used:
+            self.assertTrue(replica_used)
+
+    def test_users_not_pinned_without_writes(self, _):
+        user = User(pk=1000, username='reader')
+        request = RequestFactory().get('/')
+        request.user = user
+        ReplicaPinningMiddleware(lambda _: HttpResponse())(request)
+        self.assertFalse(is_user_pinned(user))
+
+
+@unittest.skipUnless(replica_alias in settings.DATABASES, 'Set DB_REPLICA_HOST to test with a replica database')
+class ReplicaDatabaseTestCase(TransactionTestCase):
+    databases = {'default', replica_alias}
+
+    def test_reads_from_replica(self):
+        Prison.objects.create(nomis_id='RPL', general_ledger_code='099', name='HMP Replica')
+        with use_replica() as replica_used:
+            self.assertTrue(replica_used)
+            prisons = Prison.objects.filter(nomis_id='RPL')
+            self.assertEqual(prisons.db, replica_alias)
+            self.assertEqual(prisons.get().name, 'HMP Replica')
@@ -1,54 +1,131 @@
 import datetime
+import json
 from unittest import mock
 
 from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
+from core.db_router import reading_from_replica
 from core.dump import Serialiser
-from core.management.commands.dump_for_ap import Command as DumpCommand
+from core.management.commands.dump_and_upload_for_ap import Command as DumpAndUploadCommand
 from core.management.commands.upload_dump_for_ap import Command as UploadCommand
+from core.models import DumpWatermark
+from core.tests.utils import make_test_users
+from disbursement.models import Disbursement
+from disbursement.tests.utils import generate_disbursements
+from prison.tests.utils import load_random_prisoner_locations
 
 
-@override_settings(ANALYTICAL_PLATFORM_BUCKET='my-bucket')
+@override_settings(ANALYTICAL_PLATFORM_BUCKET='my-bucket', ANALYTICAL_PLATFORM_BUCKET_PATH='my-path')
 class TestDumpAndUploadForAp(TestCase):
-    @mock.patch.object(UploadCommand, 'handle')
-    @mock.patch.object(DumpCommand, 'handle')
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+
+    def setUp(self):
+        super().setUp()
+        self.uploads = []
+        patcher = mock.patch.object(UploadCommand, 'handle', side_effect=self.mocked_upload)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def mocked_upload(self, **options):
+        with open(options['file_path']) as f:
+            self.uploads.append((options['object_name'], [json.loads(line) for line in f]))
+
+    def uploaded_ids(self, record_type):
+        return sorted(
+            record['Internal ID']
+            for object_name, records in self.uploads
+            if object_name[11:].startswith(f'{record_type}_') or object_name[11:] == record_type
+            for record in records
+        )
+
+    def make_disbursements(self):
+        make_test_users()
+        load_random_prisoner_locations()
+        generate_disbursements(disbursement_batch=20, days_of_history=2)
+        # mark all records as modified "yesterday"
+        Disbursement.objects.update(modified=timezone.now() - datetime.timedelta(days=1))
+
+    @override_settings(ANALYTICAL_PLATFORM_BUCKET='')
+    def test_nothing_exported_without_bucket(self):
+        call_command('dump_and_upload_for_ap')
+        self.assertListEqual(self.uploads, [])
+        self.assertFalse(DumpWatermark.objects.exists())
+
     @mock.patch('core.management.commands.dump_and_upload_for_ap.timezone')
-    def test_dump_for_ap_command_calls_appropriate_commands(
-        self,
-        mocked_timezone,
-        mocked_dump_for_ap,
-        mocked_upload_dump_for_ap,
-    ):
+    def test_objects_named_with_date_and_record_type(self, mocked_timezone):
         mocked_timezone.localtime.return_value = datetime.datetime(
             2021, 3, 1, 13, 15,
             tzinfo=timezone.get_default_timezone()
         )
-        mocked_dump_for_ap.return_value = None
-        mocked_upload_dump_for_ap.return_value = None
+        mocked_timezone.make_aware = timezone.make_aware
+        self.make_disbursements()
+        Disbursement.objects.update(modified=datetime.datetime(
+            2021, 2, 28, 12,
+            tzinfo=timezone.get_default_timezone()
+        ))
 
         call_command('dump_and_upload_for_ap')
 
-        expected_record_types = set(Serialiser.get_serialisers())
+        expected_record_types = set(
+            record_type
+            for record_type, serialiser_cls in Serialiser.get_serialisers().items()
+            if not serialiser_cls.incremental
+        )
         expected_record_types.remove('noms_ops_users')
+        expected_record_types.add('disbursements_131500_1')
+        self.assertTrue(all(object_name.startswith('2021-03-01_') for object_name, _ in self.uploads))
+        self.assertSetEqual(set(object_name[11:] for object_name, _ in self.uploads), expected_record_types)
+
+    def test_exports_only_changes_since_last_run(self):
+        self.make_disbursements()
+
+        call_command('dump_and_upload_for_ap')
+        expected_ids = sorted(Disbursement.objects.values_list('pk', flat=True))
+        self.assertListEqual(self.uploaded_ids('disbursements'), expected_ids)
+        watermark = DumpWatermark.objects.get(record_type='disbursements')
+        self.assertIn(watermark.last_id, expected_ids)
+
+        # nothing changed so nothing is exported
+        self.uploads.clear()
+        call_command('dump_and_upload_for_ap')
+        self.assertListEqual(self.uploads, [])
+
+        # only changed records are exported
+        changed_ids = expected_ids[:3]
+        Disbursement.objects.filter(pk__in=changed_ids).update(
+            modified=timezone.now() - datetime.timedelta(hours=1)
+        )
+        call_command('dump_and_upload_for_ap')
+        self.assertListEqual(self.uploaded_ids('disbursements'), changed_ids)
+
+    def test_resumes_after_failure(self):
+        self.make_disbursements()
+        expected_ids = sorted(Disbursement.objects.values_list('pk', flat=True))
+
+        def fail_on_second_batch(**options):
+            if options['object_name'].endswith('_2'):
+                raise OSError('Upload failed')
+            self.mocked_upload(**options)
+
+        with mock.patch.object(UploadCommand, 'handle', side_effect=fail_on_second_batch), \
+                self.assertRaises(OSError):
+            call_command('dump_and_upload_for_ap', batch_size=5)
+        self.assertListEqual(self.uploaded_ids('disbursements'), expected_ids[:5])
+        self.assertEqual(DumpWatermark.objects.get(record_type='disbursements').last_id, expected_ids[4])
+
+        call_command('dump_and_upload_for_ap', batch_size=5)
+        self.assertListEqual(self.uploaded_ids('disbursements'), expected_ids)
+
+    @override_settings(DATABASE_REPLICA_MAX_LAG=30)
+    def test_replica_lag_allowed_for_when_reading_from_replica(self):
+        command = DumpAndUploadCommand()
+        self.assertEqual(command.get_settling_time(), command.settling_time)
 
-        record_types = set()
-        for call in mocked_dump_for_ap.call_args_list:
-            handle_kwargs = call[1]
-            # ensure correct date range used
-            self.assertEqual(handle_kwargs['after'], '2021-02-28')
-            self.assertEqual(handle_kwargs['before'], '2021-03-01')
-            record_types.add(handle_kwargs['type'])
-        # ensure all record types are exported
-        self.assertSetEqual(record_types, expected_record_types)
-
-        record_types = set()
-        for call in mocked_upload_dump_for_ap.call_args_list:
-            handle_kwargs = call[1]
-            object_name = handle_kwargs['object_name']
-            # ensure S3 objects are named correctly
-            self.assertTrue(object_name.startswith('2021-03-01_'))
-            record_types.add(object_name[11:])
-        # ensure all S3 objects are named correctly and all record types are covered
-        self.assertSetEqual(record_types, expected_record_types)
+        token = reading_from_replica.set(True)
+        try:
+            settling_time = command.get_settling_time()
+        finally:
+            reading_from_replica.reset(token)
+        self.assertEqual(settling_time, command.settling_time + datetime.timedelta(seconds=30))
@@ -5,6 +5,8 @@ from unittest import mock
 
 from django.core.management import CommandError, call_command
 from django.test import TestCase
+import pyarrow
+import pyarrow.parquet
 
 from core.tests.utils import make_test_users
 from disbursement.models import Disbursement
@@ -104,3 +106,32 @@ class DumpForAPTestCase(TestCase):
 
         self.assertIn('"Payment method": "Bank transfer"', jsonlines)
         self.assertIn('"Payment method": "Debit card"', jsonlines)
+
+    def test_credits_dump_for_ap_as_parquet(self):
+        self.basic_setup()
+        generate_payments(payment_batch=20, days_of_history=2)
+
+        with tempfile.NamedTemporaryFile() as export_file:
+            call_command('dump_for_ap', 'credits', export_file.name, format='parquet')
+            table = pyarrow.parquet.read_table(export_file.name)
+
+        self.assertEqual(table.schema.field('Internal ID').type, pyarrow.int64())
+        self.assertEqual(table.schema.field('Created at').type, pyarrow.timestamp('us', tz='UTC'))
+        self.assertEqual(table.schema.field('Amount').type, pyarrow.string())
+        credit_ids = table.column('Internal ID').to_pylist()
+        completed_payments = Payment.objects.exclude(
+            status__in=(
+                PaymentStatus.pending,
+                PaymentStatus.expired,
+            )
+        )
+        expected_credit_ids = sorted(completed_payments.values_list('credit_id', flat=True))
+        self.assertListEqual(credit_ids, expected_credit_ids)
+
+    def test_empty_results_as_parquet(self):
+        with tempfile.NamedTemporaryFile() as export_file:
+            call_command('dump_for_ap', 'disbursements', export_file.name, format='parquet')
+            table = pyarrow.parquet.read_table(export_file.name)
+
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn('Date sent', table.column_names)
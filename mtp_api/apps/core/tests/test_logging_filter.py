@@ -2,6 +2,7 @@ from unittest import mock
 
 from django_filters import FilterSet
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from rest_framework import mixins, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.test import APIRequestFactory
@@ -47,6 +48,7 @@ class UserTestView(
         return mock.Mock()
 
 
+@override_settings(USER_EVENT_LOG_FLUSH_SIZE=0)
 class LogNomsOpsSearchDjangoFilterBackendTestCase(AuthTestCaseMixin, APITestCase):
     # NB: LogNomsOpsSearchDjangoFilterBackend is not in use
 
@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.pagination import EstimatedCountPagination, EstimatedCountPaginator, estimate_count
+from prison.models import Prison
+
+
+class EstimatedCountTestCase(TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json']
+
+    def paginate(self, **params):
+        request = Request(APIRequestFactory().get('/prisons/', params))
+        pagination = EstimatedCountPagination()
+        results = pagination.paginate_queryset(Prison.objects.all(), request)
+        return pagination.get_paginated_response([prison.pk for prison in results]).data
+
+    def test_small_results_counted(self):
+        prison_count = Prison.objects.count()
+        self.assertEqual(estimate_count(Prison.objects.all(), threshold=prison_count), (prison_count, False))
+
+        data = self.paginate(limit=1)
+        self.assertEqual(data['count'], prison_count)
+        self.assertNotIn('count_estimated', data)
+        self.assertIsNotNone(data['next'])
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1)
+    def test_large_results_estimated(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Counts are only estimated by PostgreSQL')
+
+        count, estimated = estimate_count(Prison.objects.all())
+        self.assertTrue(estimated)
+        self.assertGreater(count, 1)
+
+        data = self.paginate(limit=1, estimate_count='true')
+        self.assertTrue(data['count_estimated'])
+        self.assertIsNotNone(data['next'])
+
+        data = self.paginate(limit=1, offset=Prison.objects.count(), estimate_count='true')
+        self.assertEqual(data['results'], [])
+        self.assertIsNone(data['next'])
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1)
+    def test_counts_exact_unless_estimate_requested(self):
+        data = self.paginate(limit=1)
+        self.assertEqual(data['count'], Prison.objects.count())
+        self.assertNotIn('count_estimated', data)
+
+        data = self.paginate(limit=1, offset=Prison.objects.count() - 1)
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=0)
+    def test_estimates_can_be_disabled(self):
+        data = self.paginate(limit=1, estimate_count='true')
+        self.assertEqual(data['count'], Prison.objects.count())
+        self.assertNotIn('count_estimated', data)
+
+    def test_admin_paginator(self):
+        paginator = EstimatedCountPaginator(Prison.objects.order_by('pk'), 1)
+        self.assertEqual(paginator.count, Prison.objects.count())
+        self.assertFalse(paginator.count_estimated)
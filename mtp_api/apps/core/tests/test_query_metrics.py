@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from core.middleware import QueryRecorder, fingerprint_sql, normalise_sql
+from core.tests.utils import make_test_users
+from mtp_auth.tests.utils import AuthTestCaseMixin
+from prison.tests.utils import load_random_prisoner_locations
+
+record_query = QueryRecorder.__call__
+
+
+def slow_execute(recorder, *args):
+    # pretends that queries take a second
+    try:
+        return record_query(recorder, *args)
+    finally:
+        recorder.slowest_duration = max(recorder.slowest_duration, 1.0)
+
+
+class NormaliseSqlTestCase(SimpleTestCase):
+    def test_statements_differing_in_parameters_share_fingerprint(self):
+        sql1 = 'SELECT "a"."id" FROM "a"\n  WHERE "a"."id" IN (%s, %s, %s) LIMIT 21'
+        sql2 = "SELECT \"a\".\"id\" FROM \"a\" WHERE \"a\".\"id\" IN (%s, %s) LIMIT 100"
+        self.assertEqual(normalise_sql(sql1), 'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) LIMIT %s')
+        self.assertEqual(normalise_sql(sql1), normalise_sql(sql2))
+        self.assertEqual(fingerprint_sql(normalise_sql(sql1)), fingerprint_sql(normalise_sql(sql2)))
+
+    def test_string_literals_removed(self):
+        self.assertEqual(
+            normalise_sql("SELECT 1 FROM \"t\" WHERE \"t\".\"name\" = 'O''Brien' AND \"t2\".\"x\" = %s"),
+            'SELECT %s FROM "t" WHERE "t"."name" = %s AND "t2"."x" = %s',
+        )
+
+
+class QueryMetricsMiddlewareTestCase(AuthTestCaseMixin, TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+    view_name = 'prisoner_validity-list'
+
+    def setUp(self):
+        super().setUp()
+        self.send_money_user = make_test_users()['send_money_users'][0]
+        self.prisoner_location = load_random_prisoner_locations(number_of_prisoners=1)[0]
+
+    def get_sample(self, name):
+        return REGISTRY.get_sample_value(name, {'view': self.view_name}) or 0
+
+    def make_request(self):
+        response = self.client.get(
+            reverse(self.view_name),
+            {
+                'prisoner_number': self.prisoner_location.prisoner_number,
+                'prisoner_dob': self.prisoner_location.prisoner_dob.isoformat(),
+            },
+            HTTP_AUTHORIZATION=self.get_http_authorization_for_user(self.send_money_user),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries_recorded_per_view(self):
+        requests_before = self.get_sample('mtp_api_db_queries_per_request_count')
+        queries_before = self.get_sample('mtp_api_db_queries_per_request_sum')
+
+        self.make_request()
+
+        self.assertEqual(self.get_sample('mtp_api_db_queries_per_request_count'), requests_before + 1)
+        self.assertGreater(self.get_sample('mtp_api_db_queries_per_request_sum'), queries_before)
+        self.assertGreater(self.get_sample('mtp_api_db_duration_per_request_seconds_count'), 0)
+        self.assertGreater(self.get_sample('mtp_api_db_slowest_query_seconds_count'), 0)
+
+    def test_slowest_query_not_labelled_by_fingerprint(self):
+        self.make_request()
+        labels = {
+            tuple(sorted(sample.labels))
+            for metric in REGISTRY.collect() if metric.name == 'mtp_api_db_slowest_query_seconds'
+            for sample in metric.samples
+        }
+        self.assertTrue(labels)
+        self.assertTrue(all(label_names in {('view',), ('le', 'view')} for label_names in labels))
+
+    @override_settings(QUERY_METRICS_LOG_THRESHOLD=1)
+    def test_views_exceeding_threshold_logged(self):
+        with self.assertLogs('mtp', level='WARNING') as logs:
+            self.make_request()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(self.view_name, logs.output[0])
+
+    @override_settings(QUERY_METRICS_LOG_THRESHOLD=0, QUERY_METRICS_SLOW_QUERY_THRESHOLD_MS=1)
+    def test_slow_queries_logged_with_fingerprint(self):
+        with mock.patch.object(QueryRecorder, '__call__', autospec=True, side_effect=slow_execute):
+            with self.assertLogs('mtp', level='WARNING') as logs:
+                self.make_request()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(self.view_name, logs.output[0])
+        self.assertRegex(logs.output[0], r'\[[0-9a-f]{12}\]')
+
+    @override_settings(QUERY_METRICS_LOG_THRESHOLD=1000)
+    def test_views_within_threshold_not_logged(self):
+        with self.assertNoLogs('mtp', level='WARNING'):
+            self.make_request()
@@ -0,0 +1,116 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from core import reference_cache
+from prison.models import Population, Prison
+
+
+class ReferenceCacheTestCase(APITestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json']
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def get_prison_names(self):
+        response = self.client.get(reverse('prison-list'), {'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        return {prison['name'] for prison in response.data['results']}
+
+    def test_namespace_invalidated(self):
+        reference_cache.set_value('test', 'key', 'value')
+        self.assertEqual(reference_cache.get_value('test', 'key'), 'value')
+        reference_cache.invalidate('test')
+        self.assertIsNone(reference_cache.get_value('test', 'key'))
+
+    def test_evicted_versions_not_reused(self):
+        reference_cache.set_value('test', 'key', 'value')
+        cache.delete(reference_cache.get_version_cache_key('test'))
+        self.assertIsNone(reference_cache.get_value('test', 'key'))
+
+    def test_prison_list_cached(self):
+        prison_names = self.get_prison_names()
+        self.assertSetEqual(prison_names, set(Prison.objects.values_list('name', flat=True)))
+        with self.assertNumQueries(0):
+            self.assertSetEqual(self.get_prison_names(), prison_names)
+
+    def test_prison_list_invalidated_when_prisons_change(self):
+        self.get_prison_names()
+        prison = baker.make(Prison, name='HMP New')
+        self.assertIn('HMP New', self.get_prison_names())
+
+        prison.name = 'HMP Renamed'
+        prison.save()
+        self.assertIn('HMP Renamed', self.get_prison_names())
+
+        prison.delete()
+        self.assertNotIn('HMP Renamed', self.get_prison_names())
+
+    def test_prison_list_invalidated_when_populations_change(self):
+        prison = Prison.objects.first()
+        response = self.client.get(reverse('prison-list'), {'limit': 100})
+        populations = {
+            population['name']
+            for result in response.data['results'] if result['nomis_id'] == prison.nomis_id
+            for population in result['populations']
+        }
+        population = Population.objects.exclude(name__in=populations).first()
+        prison.populations.add(population)
+
+        response = self.client.get(reverse('prison-list'), {'limit': 100})
+        result = next(result for result in response.data['results'] if result['nomis_id'] == prison.nomis_id)
+        self.assertIn(population.name, {population['name'] for population in result['populations']})
+
+    def test_snapshot_reloaded_when_invalidated(self):
+        load = mock.Mock(side_effect=[('first', None), ('second', None)])
+        snapshot = reference_cache.Snapshot('test', load)
+        self.assertEqual(snapshot.get(), 'first')
+        self.assertEqual(snapshot.get(), 'first')
+        reference_cache.invalidate('test')
+        self.assertEqual(snapshot.get(), 'second')
+        self.assertEqual(load.call_count, 2)
+
+    def test_snapshot_reloaded_when_changed_by_other_processes(self):
+        load = mock.Mock(side_effect=[('first', None), ('second', None)])
+        snapshot = reference_cache.Snapshot('test', load)
+        self.assertEqual(snapshot.get(), 'first')
+        cache.incr(reference_cache.get_version_cache_key('test'))
+        self.assertEqual(snapshot.get(), 'first')
+        with override_settings(REFERENCE_DATA_SNAPSHOT_CHECK_INTERVAL=0):
+            self.assertEqual(snapshot.get(), 'second')
+
+    def test_snapshot_reloaded_when_expired(self):
+        load = mock.Mock(side_effect=[('first', time.time() - 1), ('second', None)])
+        snapshot = reference_cache.Snapshot('test', load)
+        self.assertEqual(snapshot.get(), 'first')
+        self.assertEqual(snapshot.get(), 'second')
+
+    def test_conditional_requests(self):
+        response = self.client.get(reverse('prison-list'))
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('prison-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(reverse('prison-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        baker.make(Prison, name='HMP New')
+        response = self.client.get(reverse('prison-list'), {'limit': 100}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('HMP New', {prison['name'] for prison in response.data['results']})
+
+    def test_uncached_responses_not_conditional(self):
+        response = self.client.get(reverse('prison-list'), {'exclude_empty_prisons': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,101 @@
+import datetime
+import decimal
+import io
+import json
+import uuid
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    def assertRendersLikeJSONRenderer(self, data, accepted_media_type=None):  # noqa: N802
+        self.assertEqual(
+            ORJSONRenderer().render(data, accepted_media_type=accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type=accepted_media_type),
+        )
+
+    def test_types_unsupported_by_orjson(self):
+        london = timezone.get_current_timezone()
+        self.assertRendersLikeJSONRenderer({
+            'decimal': decimal.Decimal('12.50'),
+            'utc_datetime': datetime.datetime(2021, 3, 4, 12, 30, 5, 123456, tzinfo=datetime.timezone.utc),
+            'local_datetime': timezone.make_aware(datetime.datetime(2021, 7, 4, 12, 30), london),
+            'naive_datetime': datetime.datetime(2021, 3, 4, 12, 30),
+            'date': datetime.date(2021, 3, 4),
+            'time': datetime.time(9, 15, 30, 250000),
+            'timedelta': datetime.timedelta(minutes=5),
+            'lazy_string': _('Credited'),
+            'uuid': uuid.UUID('b2b1f1d6-7a1e-4f4c-9d5c-0f0e8e3a6b11'),
+            'set': {1},
+        })
+
+    def test_serializer_data(self):
+        data = ReturnList([
+            ReturnDict({'id': 1, 'amount': 1000, 'prisoner_name': 'JAMES HALLS'}, serializer=None),
+            ReturnDict({'id': 2, 'amount': 250, 'prisoner_name': 'ÉLODIE CLARK', 'nested': {'a': [1, 2.5]}},
+                       serializer=None),
+        ], serializer=None)
+        self.assertRendersLikeJSONRenderer({'count': 2, 'next': None, 'results': data})
+
+    def test_non_string_keys(self):
+        self.assertRendersLikeJSONRenderer({1: 'a', 2: 'b'})
+
+    def test_separators_escaped(self):
+        self.assertRendersLikeJSONRenderer({'text': 'line\u2028paragraph\u2029'})
+        self.assertNotIn(b'\xe2\x80\xa8', ORJSONRenderer().render({'text': '\u2028'}))
+
+    def test_indented_output(self):
+        self.assertRendersLikeJSONRenderer({'a': [1, 2]}, accepted_media_type='application/json; indent=4')
+
+    def test_no_data(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_large_integers(self):
+        self.assertRendersLikeJSONRenderer({'a': 2 ** 64, 'b': -2 ** 63 - 1, 'c': [2 ** 100]})
+
+    def test_unsupported_types_raise_like_json_renderer(self):
+        with self.assertRaises(TypeError):
+            JSONRenderer().render({'a': object()})
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({'a': object()})
+
+    def test_float_exponents_written_compactly(self):
+        data = {'large': 1e20, 'small': 1.5e-07, 'tiny': 1e-05, 'plain': 12.5}
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(rendered, b'{"large":1e20,"small":1.5e-7,"tiny":0.00001,"plain":12.5}')
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+
+    def test_non_finite_floats_rendered_as_null(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'a': value})
+            self.assertEqual(ORJSONRenderer().render({'a': value}), b'{"a":null}')
+
+
+class ORJSONParserTestCase(SimpleTestCase):
+    def parse(self, content, encoding='utf-8'):
+        return ORJSONParser().parse(io.BytesIO(content), parser_context={'encoding': encoding})
+
+    def test_parses_like_json_parser(self):
+        content = '{"amount": 1250, "name": "Élodie", "received_at": "2021-03-04T12:30:00Z", "list": [1.5, null]}'
+        self.assertEqual(
+            self.parse(content.encode()),
+            JSONParser().parse(io.BytesIO(content.encode()), parser_context={'encoding': 'utf-8'}),
+        )
+
+    def test_other_encodings(self):
+        self.assertEqual(self.parse('{"name": "Élodie"}'.encode('latin-1'), encoding='latin-1'), {'name': 'Élodie'})
+
+    def test_invalid_json(self):
+        for content in (b'', b'{"a": 1', b'{"a": NaN}', b'\xff'):
+            with self.assertRaises(ParseError, msg=f'{content} should not parse'):
+                self.parse(content)
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class StartupImportsTestCase(SimpleTestCase):
+    # libraries only needed by management commands or rarely used admin views
+    heavy_modules = ['numpy', 'scipy', 'reportlab', 'openpyxl', 'xlrd', 'boto3', 'pyarrow']
+
+    def test_wsgi_application_does_not_import_heavy_modules(self):
+        # a fresh interpreter is needed because the test runner itself may have imported these modules
+        script = textwrap.dedent(f"""
+            import json, sys
+            import mtp_api.wsgi
+            from django.urls import get_resolver
+            get_resolver().url_patterns
+            heavy_modules = {self.heavy_modules!r}
+            print(json.dumps(sorted(
+                name for name in sys.modules
+                if name.split('.')[0] in heavy_modules
+            )))
+        """)
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=os.path.dirname(settings.BASE_DIR),
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'mtp_api.settings')),
+            capture_output=True, text=True, check=True,
+        )
+        loaded_modules = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertListEqual(loaded_modules, [], msg='Heavy modules were imported when the WSGI application loaded')
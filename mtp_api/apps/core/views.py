@@ -1,6 +1,7 @@
 from io import StringIO
 import json
 import logging
+import time
 from urllib.parse import unquote as url_unquote
 
 from django.conf import settings
@@ -12,8 +13,10 @@ from django.core.management import call_command
 from django.forms import MediaDefiningClass
 from django.http.response import Http404
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.dateparse import parse_date
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
 from django.utils.module_loading import autodiscover_modules
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import FormView, TemplateView
@@ -23,6 +26,8 @@ from rest_framework import generics, mixins, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from core import reference_cache
+from core.db_router import ReplicaReadMixin
 from core.forms import RecreateTestDataForm
 from core.models import FileDownload
 from core.permissions import ActionsBasedPermissions
@@ -60,7 +65,7 @@ class AdminViewMixin:
         return super().get_context_data(**context)
 
 
-class BaseAdminReportView(AdminViewMixin, FormView, metaclass=MediaDefiningClass):
+class BaseAdminReportView(ReplicaReadMixin, AdminViewMixin, FormView, metaclass=MediaDefiningClass):
     """
     Base class for report views that use GET-based forms to filter results
     """
@@ -94,7 +99,7 @@ class BaseAdminReportView(AdminViewMixin, FormView, metaclass=MediaDefiningClass
         return context_data
 
 
-class DashboardView(AdminViewMixin, TemplateView, metaclass=MediaDefiningClass):
+class DashboardView(ReplicaReadMixin, AdminViewMixin, TemplateView, metaclass=MediaDefiningClass):
     """
     Django admin view which presents an overview report for MTP
     """
@@ -326,3 +331,63 @@ class MissingFileDownloadView(generics.GenericAPIView):
                         missing.append(parsed_date)
                 return Response(data={'missing_dates': missing}, status=200)
         return Response(data={'missing_dates': []}, status=200)
+
+
+def reference_data_response(request, data, etag, last_modified=None, max_age=None):
+    """
+    Responds with data, or 304 Not Modified if the client's copy is current, with validators
+    and cache headers allowing clients to keep reference data for up to `max_age` seconds
+    """
+    if max_age is None:
+        max_age = settings.REFERENCE_DATA_HTTP_MAX_AGE
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified) or Response(data)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ReferenceDataCacheMixin:
+    """
+    Caches the responses of list views whose data only depends on the models of `reference_data_namespace`
+    and answers conditional requests for them; each cached response has its own ETag and Last-Modified time
+    so clients revalidate cheaply and only download the data again once it has changed
+    """
+    reference_data_namespace = NotImplemented
+
+    def get_reference_data_cache_key(self, request):
+        return request.user.is_authenticated, request.get_full_path()
+
+    def get_reference_data_cache_timeout(self):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_reference_data_cache_key(request)
+        if cache_key is None:
+            return super().list(request, *args, **kwargs)
+        now = int(time.time())
+        cached = reference_cache.get_value(self.reference_data_namespace, cache_key)
+        if cached is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            timeout = self.get_reference_data_cache_timeout() or settings.REFERENCE_DATA_CACHE_TTL
+            cached = {
+                'data': response.data,
+                'etag': reference_cache.get_cache_key(self.reference_data_namespace, (cache_key, time.time_ns())),
+                'last_modified': now,
+                'expires': now + timeout,
+            }
+            reference_cache.set_value(self.reference_data_namespace, cache_key, cached, timeout=timeout)
+        return reference_data_response(
+            request, cached['data'],
+            etag=cached['etag'],
+            last_modified=cached['last_modified'],
+            max_age=max(0, min(settings.REFERENCE_DATA_HTTP_MAX_AGE, cached['expires'] - now)),
+        )
@@ -8,6 +8,7 @@ from django.utils.translation import gettext_lazy as _
 from mtp_common.utils import format_currency
 
 from core.admin import UtcDateRangeFilter, RelatedAnyFieldListFilter, SearchFilter, add_short_description
+from core.pagination import EstimatedCountPaginator
 from credit.constants import CreditStatus, CreditSource, LogAction
 from credit.models import Credit, Log, Comment, ProcessingBatch, PrivateEstateBatch
 from payment.models import Payment
@@ -103,6 +104,8 @@ class CreditAdmin(admin.ModelAdmin):
     )
     ordering = ('-received_at',)
     date_hierarchy = 'received_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = (TransactionAdminInline, PaymentAdminInline, CommentAdminInline, LogAdminInline)
     readonly_fields = (
         'resolution',
@@ -16,6 +16,13 @@ class CreditSerialiser(Serialiser):
     Credits where money has not _yet_ been taken are not included.
     """
     record_type = 'credits'
+    column_types = {
+        **Serialiser.column_types,
+        'Date started': 'datetime',
+        'Date received': 'datetime',
+        'Date credited': 'datetime',
+        'Security check codes': 'list',
+    }
 
     def __init__(self, serialise_amount_as_int=False, only_with_triggered_rules=False):
         super().__init__()
@@ -24,6 +31,8 @@ class CreditSerialiser(Serialiser):
         else:
             self.format_amount = format_currency
         self.only_with_triggered_rules = only_with_triggered_rules
+        if serialise_amount_as_int:
+            self.column_types = {**self.column_types, 'Amount': 'integer'}
 
     def get_queryset(self):
         queryset = Credit.objects_all \
@@ -1,6 +1,7 @@
 import collections
 import datetime
 import pathlib
+import time
 
 from django.core.management import BaseCommand, CommandError
 from django.utils.dateparse import parse_date
@@ -9,11 +10,12 @@ from mtp_common.nomis import can_access_nomis, get_location as nomis_get_locatio
 import requests
 
 from credit.constants import LogAction as CreditLogAction
-from credit.models import Log as CreditLog
+from credit.models import Credit, Log as CreditLog
 from credit.notices.prisoner_credits import PrisonerCreditNoticeBundle
 from disbursement.constants import LogAction as DisbursementLogAction
-from disbursement.models import Log as DisbursementLog
+from disbursement.models import Disbursement, Log as DisbursementLog
 from prison.models import Prison
+from prison.utils import HousingResolver
 
 
 class Command(BaseCommand):
@@ -39,58 +41,84 @@ class Command(BaseCommand):
         except Prison.DoesNotExist:
             raise CommandError('Prison does not exist', {'prison_nomis_id', prison})
         date = parsed_date_or_yesterday(date)
-        date_range = (make_aware(datetime.datetime.combine(date, datetime.time.min)),
-                      make_aware(datetime.datetime.combine(date, datetime.time.max)))
 
-        credit_logs = CreditLog.objects.filter(
-            action=CreditLogAction.credited,
-            created__range=date_range,
-            credit__prison=prison.pk,
-        )
-        credit_count = credit_logs.count()
-        disbursement_logs = DisbursementLog.objects.filter(
-            action=DisbursementLogAction.sent,
-            created__range=date_range,
-            disbursement__prison=prison.pk,
-        )
-        disbursement_count = disbursement_logs.count()
-        if credit_count + disbursement_count == 0:
+        prisoners = get_prisoners_with_updates(prison, date)
+        if not prisoners:
             if verbosity:
                 self.stdout.write('Nothing credited or disbursed at %s on %s' % (prison, date))
             return
         if verbosity > 1:
             self.stdout.write('%d credits received, %d disbursements sent at %s on %s' % (
-                credit_count, disbursement_count, prison, date,
-            ))
-
-        prisoner_updates = collections.defaultdict(lambda: {'credits': [], 'disbursements': []})
-        for log in credit_logs:
-            credit = log.credit
-            prisoner_updates[credit.prisoner_number]['credits'].append(credit)
-        for log in disbursement_logs:
-            disbursement = log.disbursement
-            prisoner_updates[disbursement.prisoner_number]['disbursements'].append(disbursement)
-
-        prisoners = []
-        for prisoner_number in sorted(prisoner_updates.keys()):
-            credits_list = prisoner_updates[prisoner_number]['credits']
-            credits_list = sorted(credits_list, key=lambda credit: credit.received_at)
-            disbursements_list = prisoner_updates[prisoner_number]['disbursements']
-            disbursements_list = sorted(disbursements_list, key=lambda disbursement: disbursement.modified)
-            prisoner_name = (credits_list or disbursements_list)[0].prisoner_name
-            location = get_housing(prisoner_number)
-            prisoners.append((
-                prisoner_name,
-                prisoner_number,
-                location,
-                credits_list,
-                disbursements_list,
+                sum(len(prisoner[3]) for prisoner in prisoners),
+                sum(len(prisoner[4]) for prisoner in prisoners),
+                prison, date,
             ))
 
         if verbosity:
             self.stdout.write('Generating notices bundle for %s at %s' % (prison.name, path))
-        bundle = PrisonerCreditNoticeBundle(prison.name, prisoners, date)
-        bundle.render(str(path))
+        render_bundle(str(path), prison.name, prisoners, date)
+
+
+def get_prisoners_with_updates(prison, date):
+    """
+    Collects credits received and disbursements sent on a given date for each prisoner in a prison
+    :return: list of (prisoner_name, prisoner_number, location, credits, disbursements)
+        suitable for PrisonerCreditNoticeBundle
+    """
+    date_range = (make_aware(datetime.datetime.combine(date, datetime.time.min)),
+                  make_aware(datetime.datetime.combine(date, datetime.time.max)))
+
+    # one query each for credits and disbursements, regardless of how many there are
+    credits = Credit.objects_all.filter(
+        prison=prison.pk,
+        pk__in=CreditLog.objects.filter(
+            action=CreditLogAction.credited,
+            created__range=date_range,
+        ).values('credit_id'),
+    ).select_related('transaction', 'payment').order_by('prisoner_number', 'received_at', 'pk')
+    disbursements = Disbursement.objects.filter(
+        prison=prison.pk,
+        pk__in=DisbursementLog.objects.filter(
+            action=DisbursementLogAction.sent,
+            created__range=date_range,
+        ).values('disbursement_id'),
+    ).order_by('prisoner_number', 'modified', 'pk')
+
+    prisoner_updates = collections.defaultdict(lambda: {'credits': [], 'disbursements': []})
+    for credit in credits:
+        prisoner_updates[credit.prisoner_number]['credits'].append(credit)
+    for disbursement in disbursements:
+        prisoner_updates[disbursement.prisoner_number]['disbursements'].append(disbursement)
+
+    if can_access_nomis():
+        housing = HousingResolver(get_housing).resolve(prisoner_updates.keys())
+    else:
+        housing = {}
+    prisoners = []
+    for prisoner_number in sorted(prisoner_updates.keys()):
+        credits_list = prisoner_updates[prisoner_number]['credits']
+        disbursements_list = prisoner_updates[prisoner_number]['disbursements']
+        prisoner_name = (credits_list or disbursements_list)[0].prisoner_name
+        location = housing.get(prisoner_number)
+        prisoners.append((
+            prisoner_name,
+            prisoner_number,
+            location,
+            credits_list,
+            disbursements_list,
+        ))
+    return prisoners
+
+
+def render_bundle(path, prison_name, prisoners, date):
+    """
+    Saves a PDF bundle of notices returning the time taken in seconds;
+    can be called in a separate process because no database access is needed
+    """
+    start = time.perf_counter()
+    bundle = PrisonerCreditNoticeBundle(prison_name, prisoners, date)
+    bundle.render(path)
+    return time.perf_counter() - start
 
 
 def parsed_date_or_yesterday(date) -> datetime.date:
@@ -1,13 +1,19 @@
+import concurrent.futures
 import logging
+import multiprocessing
 import pathlib
 import shutil
 import tempfile
 
-from django.core.management import BaseCommand, call_command
+import django
+from django.conf import settings
+from django.core.management import BaseCommand
 from mtp_common.tasks import send_email
 from notifications_python_client.utils import DOCUMENT_UPLOAD_SIZE_LIMIT as NOTIFY_UPLOAD_LIMIT
 
-from credit.management.commands.create_prisoner_credit_notices import parsed_date_or_yesterday
+from credit.management.commands.create_prisoner_credit_notices import (
+    get_prisoners_with_updates, parsed_date_or_yesterday, render_bundle,
+)
 from prison.models import PrisonerCreditNoticeEmail
 
 logger = logging.getLogger('mtp')
@@ -27,14 +33,17 @@ class Command(BaseCommand):
         super().add_arguments(parser)
         parser.add_argument('--prison', help='NOMIS id of prison, defaults to all prisons.')
         parser.add_argument('--date', help='Credited date, defaults to yesterday.')
+        parser.add_argument('--workers', type=int, default=settings.PRISONER_CREDIT_NOTICE_WORKERS,
+                            help='Number of processes rendering bundles in parallel.')
 
-    def handle(self, prison=None, date=None, **options):
+    def handle(self, prison=None, date=None, workers=None, **options):
         self.verbosity = options.get('verbosity', self.verbosity)
 
         if not prison:
             credit_notice_emails = PrisonerCreditNoticeEmail.objects.all()
         else:
             credit_notice_emails = PrisonerCreditNoticeEmail.objects.filter(prison=prison)
+        credit_notice_emails = credit_notice_emails.select_related('prison')
         if not credit_notice_emails.exists():
             if prison:
                 self.stderr.write(f'No email address found for {prison}')
@@ -42,26 +51,56 @@ class Command(BaseCommand):
                 self.stderr.write('No known email addresses')
             return
 
+        date = parsed_date_or_yesterday(date)
         bundle_dir = pathlib.Path(tempfile.mkdtemp())
         try:
-            for credit_notice_email in credit_notice_emails:
-                path = bundle_dir / f'prison-credits-{credit_notice_email.prison.nomis_id}.pdf'
-                self.handle_prison(credit_notice_email, path, date, **options)
+            if workers > 1:
+                # bundles are rendered in fresh processes so that no database connections are shared
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+            else:
+                executor = SynchronousExecutor()
+            with executor:
+                futures = {}
+                for credit_notice_email in credit_notice_emails:
+                    path = bundle_dir / f'prison-credits-{credit_notice_email.prison.nomis_id}.pdf'
+                    future = self.submit_prison(executor, credit_notice_email, path, date)
+                    if future:
+                        futures[future] = (credit_notice_email, path)
+                for future in concurrent.futures.as_completed(futures):
+                    credit_notice_email, path = futures[future]
+                    self.handle_rendered_bundle(future, credit_notice_email, path, date)
         finally:
             if bundle_dir.exists():
                 shutil.rmtree(str(bundle_dir))
 
-    def handle_prison(self, credit_notice_email, path, date, **options):
-        call_command(
-            'create_prisoner_credit_notices',
-            path, credit_notice_email.prison.nomis_id,
-            date=date, **options
-        )
-        date_reference = parsed_date_or_yesterday(date).strftime('%Y-%m-%d')
-        if not path.exists():
+    def submit_prison(self, executor, credit_notice_email, path, date):
+        prison = credit_notice_email.prison
+        try:
+            prisoners = get_prisoners_with_updates(prison, date)
+        except Exception:
+            logger.exception(f'Cannot collect prisoner credit notices for {prison.nomis_id}')
+            return None
+        if not prisoners:
             if self.verbosity:
                 self.stdout.write(f'Nothing to send to {credit_notice_email}')
+            return None
+        if self.verbosity:
+            self.stdout.write(f'Generating notices bundle for {prison.name} with {len(prisoners)} prisoners')
+        return executor.submit(render_bundle, str(path), prison.name, prisoners, date)
+
+    def handle_rendered_bundle(self, future, credit_notice_email, path, date):
+        nomis_id = credit_notice_email.prison.nomis_id
+        try:
+            duration = future.result()
+        except Exception:
+            logger.exception(f'Cannot generate prisoner credit notices for {nomis_id}')
             return
+        logger.info(f'Generated prisoner credit notices for {nomis_id} in {duration:.1f}s')
+
         if path.stat().st_size >= NOTIFY_UPLOAD_LIMIT:
             error_message = (
                 f'Cannot send prisoner notice email to {credit_notice_email} because the attachment is too big'
@@ -72,12 +111,29 @@ class Command(BaseCommand):
 
         if self.verbosity:
             self.stdout.write(f'Sending prisoner notice email to {credit_notice_email}')
-        send_email(
-            template_name='api-prisoner-notice-email',
-            to=credit_notice_email.email,
-            personalisation={
-                'attachment': path.read_bytes(),
-            },
-            reference=f'credit-notices-{date_reference}-{credit_notice_email.prison.nomis_id}',
-            staff_email=True,
-        )
+        try:
+            send_email(
+                template_name='api-prisoner-notice-email',
+                to=credit_notice_email.email,
+                personalisation={
+                    'attachment': path.read_bytes(),
+                },
+                reference=f'credit-notices-{date:%Y-%m-%d}-{nomis_id}',
+                staff_email=True,
+            )
+        except Exception:
+            logger.exception(f'Cannot send prisoner credit notices to {nomis_id}')
+
+
+class SynchronousExecutor(concurrent.futures.Executor):
+    """
+    Runs tasks immediately in the current process
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
@@ -0,0 +1,17 @@
+from django.contrib.postgres import operations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('credit', '0041_credit_credit_cred_created_18d594_idx'),
+    ]
+
+    operations = [
+        operations.AddIndexConcurrently(
+            model_name='credit',
+            index=models.Index(fields=['modified', 'id'], name='credit_cred_modifie_b28fe9_idx'),
+        )
+    ]
@@ -111,6 +111,7 @@ class Credit(TimeStampedModel):
             models.Index(fields=['prisoner_number', 'id']),
             models.Index(fields=['-prisoner_number', 'id']),
             models.Index(fields=['owner', 'reconciled', 'resolution']),
+            models.Index(fields=['modified', 'id']),
         ]
 
     def __str__(self):
@@ -1,3 +1,4 @@
+import functools
 import pathlib
 import re
 
@@ -5,7 +6,7 @@ from django.conf import settings
 from django.utils.translation import gettext as _
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfbase.pdfmetrics import registerFont
+from reportlab.pdfbase.pdfmetrics import registerFont, stringWidth
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen.canvas import Canvas
 
@@ -20,12 +21,19 @@ registerFont(TTFont('NTA-Light', get_asset_path('gds-light.ttf')))
 registerFont(TTFont('NTA-Bold', get_asset_path('gds-bold.ttf')))
 
 
+@functools.lru_cache(maxsize=4096)
+def string_width(text, font_name, font_size):
+    # measuring text is slow and the same strings are measured on most pages
+    return stringWidth(text, font_name, font_size)
+
+
 class NoticeBundle:
     """
     Generic tool for creating PDF bundles
     """
     page_width = 210
     page_height = 297
+    template_form_name = 'PageTemplate'
 
     def __init__(self):
         self.canvas = None  # type: Canvas
@@ -55,18 +63,33 @@ class NoticeBundle:
         canvas.setCreator(self.creator)
         canvas._doc.info.producer = self.creator
         self.canvas = canvas
+        # static parts of pages are drawn once into a form which each page then refers to
+        canvas.beginForm(self.template_form_name)
+        self.render_template()
+        canvas.endForm()
         self.render_pages()
         self.canvas.save()
 
+    def render_template(self):
+        """
+        Draws the parts common to every page; shown on a page using `draw_template`
+        """
+
     def render_pages(self):
         raise NotImplementedError
 
+    def draw_template(self):
+        self.canvas.doForm(self.template_form_name)
+
     def change_font(self, font, size):
         self.text_y_adjust = size / 4
         self.canvas.setFont(font, size)
 
+    def string_width(self, text):
+        return string_width(text, self.canvas._fontname, self.canvas._fontsize)
+
     def text_width(self, text):
-        return self.canvas.stringWidth(text) / mm
+        return self.string_width(text) / mm
 
     def truncate_text_to_width(self, width, text, ellipsis='…'):
         text_width = self.text_width(text)
@@ -94,9 +117,9 @@ class NoticeBundle:
     def draw_text(self, x, y, text, align='L'):
         x *= mm
         if align == 'R':
-            x -= self.canvas.stringWidth(text)
+            x -= self.string_width(text)
         elif align == 'C':
-            x -= self.canvas.stringWidth(text) / 2
+            x -= self.string_width(text) / 2
         self.canvas.drawString(x, (self.page_height - y) * mm - self.text_y_adjust, text)
 
     def draw_image(self, path, x, y, w, h):
@@ -97,7 +97,7 @@ class PrisonerCreditNoticeBundle(NoticeBundle):
                 ]
             ))
         while updates:
-            self.render_base_template()
+            self.draw_template()
             self.render_header(name, number, location)
             self.render_prisoner_page(updates)
             self.canvas.showPage()
@@ -180,7 +180,7 @@ class PrisonerCreditNoticeBundle(NoticeBundle):
         self.change_font('NTA-Light', 12)
         self.draw_text(self.page_width - gutter, top + baseline, date_label, align='R')
 
-    def render_base_template(self):
+    def render_template(self):
         self.draw_image(get_asset_path('logo.png'), x=94.558, y=57, w=20.884, h=17.321)
         self.change_font('NTA-Light', 12)
         self.draw_text(105, 80, _('Prisoner money update'), align='C')
@@ -215,6 +215,7 @@ def create_sample():
     import argparse
     import collections
     import datetime
+    import time
 
     import django
     from django.conf import settings
@@ -299,11 +300,17 @@ def create_sample():
 
     parser = argparse.ArgumentParser(description='Creates a sample prisoner credit notices PDF')
     parser.add_argument('path', help='Path to save the PDF file')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Repeat samples to measure rendering speed of large bundles')
     args = parser.parse_args()
     bundle = PrisonerCreditNoticeBundle('HMP Brixton',
-                                        generate_samples(),
+                                        list(generate_samples()) * args.repeat,
                                         datetime.date.today() - datetime.timedelta(days=1))
+    start = time.perf_counter()
     bundle.render(args.path)
+    duration = time.perf_counter() - start
+    pages = bundle.canvas.getPageNumber() - 1
+    print(f'Rendered {pages} pages in {duration:.2f}s ({pages / duration:.0f} pages/second)')
 
 
 if __name__ == '__main__':
@@ -8,9 +8,11 @@ import unittest
 from unittest import mock
 
 from django.core.management import call_command
+from django.utils import timezone
 from faker import Faker
 
 from credit.constants import LogAction as CreditLogAction
+from credit.management.commands.create_prisoner_credit_notices import get_prisoners_with_updates, render_bundle
 from credit.models import Credit, Log as CreditLog
 from credit.notices import Canvas
 from credit.notices.prisoner_credits import PrisonerCreditNoticeBundle
@@ -34,15 +36,18 @@ disbursement_cls = collections.namedtuple('Disbursement', 'amount method recipie
 
 
 class PrisonerCreditNoticeTestCase(unittest.TestCase):
+    # page template is drawn once per bundle and reused on every page
     image_per_template = 3
-    text_per_template = 6
+    text_per_template = 3
+    text_per_page = 3
     text_per_update = 3
     text_per_message = 2
 
     def assertPageUpdates(self, show_page, draw_string, updates_per_page):  # noqa: N802
         self.assertEqual(show_page.call_count, len(updates_per_page))
         self.assertEqual(draw_string.call_count, (
-            self.text_per_template * len(updates_per_page) +
+            self.text_per_template +
+            self.text_per_page * len(updates_per_page) +
             self.text_per_update * functools.reduce(lambda updates, page: updates + len(page), updates_per_page, 0) +
             self.text_per_message * sum(itertools.chain.from_iterable(updates_per_page))
         ))
@@ -61,6 +66,24 @@ class PrisonerCreditNoticeTestCase(unittest.TestCase):
         self.assertPageUpdates(canvas_show_page, canvas_draw_string, [[1]])
         self.assertEqual(canvas_draw_image.call_count, self.image_per_template)
 
+    @mock.patch.object(Canvas, 'doForm')
+    @mock.patch.object(Canvas, 'drawImage')
+    @mock.patch.object(Canvas, 'drawString')
+    @mock.patch.object(Canvas, 'showPage')
+    @mock.patch.object(Canvas, 'save')
+    def test_page_template_drawn_once(self, canvas_save, canvas_show_page, canvas_draw_string, canvas_draw_image,
+                                      canvas_do_form):
+        canvas_save.return_value = None
+
+        prisoners = [('JAMES HALLS', 'A1409AE', sample_location, [credit_cls(1000, 'Mrs. Halls')] * 11, []),
+                     ('RICKIE RIPPIN', 'A1617FY', sample_location, [credit_cls(2500, 'JOHNSON & ASSOCIATES')], [])]
+        bundle = PrisonerCreditNoticeBundle('INB', prisoners, datetime.date(2017, 6, 16))
+        bundle.render(None)
+
+        self.assertPageUpdates(canvas_show_page, canvas_draw_string, [[9], [2], [1]])
+        self.assertEqual(canvas_draw_image.call_count, self.image_per_template)
+        self.assertEqual(canvas_do_form.call_count, 3)
+
     @mock.patch.object(Canvas, 'drawString')
     @mock.patch.object(Canvas, 'showPage')
     @mock.patch.object(Canvas, 'save')
@@ -293,9 +316,69 @@ class CreatePrisonerNoticesTestCase(NoticesCommandTestCase):
         )
 
 
+@mock.patch(
+    'credit.management.commands.create_prisoner_credit_notices.can_access_nomis',
+    mock.Mock(return_value=False),
+)
+class PrisonerUpdatesTestCase(NoticesCommandTestCase):
+    def test_query_count_independent_of_updates(self):
+        latest_log = CreditLog.objects.filter(action=CreditLogAction.credited).order_by('-created').first()
+        date = timezone.localdate(latest_log.created)
+        prison = latest_log.credit.prison
+        credited_logs = CreditLog.objects.filter(
+            action=CreditLogAction.credited,
+            created__date=date,
+            credit__prison=prison,
+        )
+        sent_logs = DisbursementLog.objects.filter(
+            action=DisbursementLogAction.sent,
+            created__date=date,
+            disbursement__prison=prison,
+        )
+
+        with self.assertNumQueries(2):
+            prisoners = get_prisoners_with_updates(prison, date)
+
+        credits_list = list(itertools.chain.from_iterable(prisoner[3] for prisoner in prisoners))
+        disbursements_list = list(itertools.chain.from_iterable(prisoner[4] for prisoner in prisoners))
+        self.assertSetEqual({credit.pk for credit in credits_list}, set(credited_logs.values_list('credit', flat=True)))
+        self.assertSetEqual(
+            {disbursement.pk for disbursement in disbursements_list},
+            set(sent_logs.values_list('disbursement', flat=True)),
+        )
+        for prisoner_name, prisoner_number, location, prisoner_credits, prisoner_disbursements in prisoners:
+            self.assertIsNone(location)
+            self.assertTrue(all(credit.prisoner_number == prisoner_number for credit in prisoner_credits))
+            self.assertListEqual(
+                prisoner_credits,
+                sorted(prisoner_credits, key=lambda credit: credit.received_at),
+            )
+        # sender names are available without further queries
+        with self.assertNumQueries(0):
+            [credit.sender_name for credit in credits_list]
+
+
 @mock.patch('credit.management.commands.send_prisoner_credit_notices.send_email')
 @mock.patch('credit.management.commands.create_prisoner_credit_notices.nomis_get_location')
 class SendPrisonerCreditNoticeTestCase(NoticesCommandTestCase):
+    def credit_in_two_prisons(self):
+        """
+        Returns the latest credited date and prisons with credits then,
+        moving a credit if needed so that there are at least two prisons
+        """
+        credited_logs = CreditLog.objects.filter(action=CreditLogAction.credited).order_by('-created')
+        latest = credited_logs.first().created.date()
+        credited_logs = CreditLog.objects.filter(
+            action=CreditLogAction.credited,
+            created__date__range=(latest, latest + datetime.timedelta(days=1))
+        ).select_related('credit')
+        prison_set = {credited_log.credit.prison_id for credited_log in credited_logs}
+        if len(prison_set) < 2:
+            other_prison = Prison.objects.exclude(pk__in=prison_set).order_by('pk').first()
+            Credit.objects.filter(pk=credited_logs[0].credit_id).update(prison=other_prison)
+            prison_set.add(other_prison.pk)
+        return latest, prison_set
+
     def test_no_emails_sent_if_prisons_have_addresses(self, nomis_get_location, mock_send_email):
         nomis_get_location.side_effect = NotImplementedError
         with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
@@ -330,3 +413,46 @@ class SendPrisonerCreditNoticeTestCase(NoticesCommandTestCase):
             },
             prison_set,
         )
+
+    def test_failure_in_one_prison_does_not_prevent_others(self, nomis_get_location, mock_send_email):
+        nomis_get_location.return_value = None
+        self.assign_email_addresses()
+        Disbursement.objects.sent().delete()
+        latest, prison_set = self.credit_in_two_prisons()
+        failing_prison = Prison.objects.get(pk=sorted(prison_set)[0])
+
+        def render_or_fail(path, prison_name, prisoners, date):
+            if prison_name == failing_prison.name:
+                raise ValueError('Rendering failed')
+            return render_bundle(path, prison_name, prisoners, date)
+
+        with mock.patch('credit.management.commands.send_prisoner_credit_notices.render_bundle',
+                        side_effect=render_or_fail), \
+                self.assertLogs('mtp', level='ERROR') as logs:
+            call_command('send_prisoner_credit_notices', date=latest.strftime('%Y-%m-%d'), workers=1, verbosity=0)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(failing_prison.nomis_id, logs.output[0])
+        self.assertSetEqual(
+            {
+                call.kwargs['reference'].rsplit('-')[-1]
+                for call in mock_send_email.call_args_list
+            },
+            prison_set - {failing_prison.nomis_id},
+        )
+
+    def test_bundles_rendered_in_worker_processes(self, nomis_get_location, mock_send_email):
+        nomis_get_location.return_value = None
+        self.assign_email_addresses()
+        Disbursement.objects.sent().delete()
+        latest, prison_set = self.credit_in_two_prisons()
+
+        call_command('send_prisoner_credit_notices', date=latest.strftime('%Y-%m-%d'), workers=2, verbosity=0)
+        self.assertSetEqual(
+            {
+                call.kwargs['reference'].rsplit('-')[-1]
+                for call in mock_send_email.call_args_list
+            },
+            prison_set,
+        )
+        for call in mock_send_email.call_args_list:
+            self.assertTrue(call.kwargs['personalisation']['attachment'].startswith(b'%PDF'))
@@ -26,7 +26,9 @@ from core.filters import (
     SplitTextInMultipleFieldsFilter,
     StatusChoiceFilter,
 )
+from core.db_router import ReplicaReadMixin
 from core.models import TruncUtcDate
+from core.pagination import EstimatedCountPagination
 from core.permissions import ActionsBasedPermissions
 from credit.constants import CreditResolution, CreditStatus, CreditSource, LogAction
 from credit.models import Credit, Comment, ProcessingBatch, PrivateEstateBatch
@@ -262,7 +264,7 @@ class CreditViewMixin:
             )
 
         return queryset.filter(
-            prison__in=PrisonUserMapping.objects.get_prison_set_for_user(self.request.user)
+            prison__in=PrisonUserMapping.objects.get_prison_ids_for_user(self.request.user)
         )
 
 
@@ -271,6 +273,7 @@ class GetCredits(CreditViewMixin, mixins.ListModelMixin, viewsets.GenericViewSet
     filterset_class = CreditListFilter
     ordering_fields = ('created', 'received_at', 'amount',
                        'prisoner_number', 'prisoner_name')
+    pagination_class = EstimatedCountPagination
     action = 'list'
 
     permission_classes = (
@@ -306,7 +309,7 @@ class GetCredits(CreditViewMixin, mixins.ListModelMixin, viewsets.GenericViewSet
             return CreditSerializer
 
 
-class CreditsGroupedByCreditedList(CreditViewMixin, generics.ListAPIView):
+class CreditsGroupedByCreditedList(ReplicaReadMixin, CreditViewMixin, generics.ListAPIView):
     serializer_class = CreditsGroupedByCreditedSerializer
     permission_classes = (
         IsAuthenticated, CashbookClientIDPermissions,
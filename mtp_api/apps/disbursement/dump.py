@@ -11,11 +11,18 @@ class DisbursementSerialiser(Serialiser):
     Serialises all disbursements, including those that were cancelled.
     """
     record_type = 'disbursements'
+    column_types = {
+        **Serialiser.column_types,
+        'Date entered': 'datetime',
+        'Date confirmed': 'datetime',
+        'Date sent': 'datetime',
+    }
 
     def __init__(self, serialise_amount_as_int=False):
         super().__init__()
         if serialise_amount_as_int:
             self.format_amount = lambda amount: amount
+            self.column_types = {**self.column_types, 'Amount': 'integer'}
         else:
             self.format_amount = format_currency
 
@@ -0,0 +1,17 @@
+from django.contrib.postgres import operations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('disbursement', '0020_auto_20201007_1448'),
+    ]
+
+    operations = [
+        operations.AddIndexConcurrently(
+            model_name='disbursement',
+            index=models.Index(fields=['modified', 'id'], name='disbursemen_modifie_87c28f_idx'),
+        )
+    ]
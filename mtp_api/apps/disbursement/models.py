@@ -68,6 +68,7 @@ class Disbursement(TimeStampedModel):
             models.Index(fields=['-amount', 'id']),
             models.Index(fields=['prisoner_number', 'id']),
             models.Index(fields=['-prisoner_number', 'id']),
+            models.Index(fields=['modified', 'id']),
         ]
 
     @staticmethod
@@ -34,8 +34,8 @@ class PrisonPermittedValidator:
     def __call__(self, value, serializer_field):
         user = serializer_field.context['request'].user
         if (
-            value not in
-            PrisonUserMapping.objects.get_prison_set_for_user(user)
+            value.pk not in
+            PrisonUserMapping.objects.get_prison_ids_for_user(user)
         ):
             raise serializers.ValidationError(
                 _('Cannot create a disbursement for this prison')
@@ -16,6 +16,7 @@ from core.filters import (
     SplitTextInMultipleFieldsFilter,
 )
 from core.models import TruncUtcDate
+from core.pagination import EstimatedCountPagination
 from core.permissions import ActionsBasedViewPermissions
 from disbursement import InvalidDisbursementStateException
 from disbursement.constants import DisbursementResolution
@@ -113,7 +114,7 @@ class DisbursementViewMixin:
             return queryset
         if self.request.auth.application.client_id == CASHBOOK_OAUTH_CLIENT_ID:
             return queryset.filter(
-                prison__in=PrisonUserMapping.objects.get_prison_set_for_user(self.request.user)
+                prison__in=PrisonUserMapping.objects.get_prison_ids_for_user(self.request.user)
             )
         return queryset
 
@@ -128,6 +129,7 @@ class GetDisbursementsView(
     filter_backends = (DjangoFilterBackend, SafeOrderingFilter)
     ordering_fields = ('created', 'amount', 'resolution', 'method', 'recipient_name',
                        'prisoner_number', 'prisoner_name')
+    pagination_class = EstimatedCountPagination
     permission_classes = (
         IsAuthenticated, ActionsBasedViewPermissions, get_client_permissions_class(
             CASHBOOK_OAUTH_CLIENT_ID, NOMS_OPS_OAUTH_CLIENT_ID,
@@ -9,3 +9,6 @@ ALL_OAUTH_CLIENT_IDS = (
     NOMS_OPS_OAUTH_CLIENT_ID,
     SEND_MONEY_CLIENT_ID,
 )
+
+# inactive user with an unusable password, created by a migration, to whom automatic changes are attributed
+SYSTEM_USERNAME = 'mtp-system'
@@ -12,6 +12,11 @@ class NomsOpsUserSerialiser(Serialiser):
     Serialises users of the Prisoner Money Intelligence website, whether active or not, ignoring super-users.
     """
     record_type = 'noms_ops_users'
+    incremental = False
+    column_types = {
+        **Serialiser.column_types,
+        'Last login': 'datetime',
+    }
 
     def get_queryset(self):
         return Group.objects.get(name='Security').user_set.filter(is_superuser=False)
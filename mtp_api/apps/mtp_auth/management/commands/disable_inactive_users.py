@@ -1,11 +1,19 @@
 from dateutil.relativedelta import relativedelta
+from django.contrib.admin.models import LogEntry, CHANGE as CHANGE_LOG_ENTRY
+from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.auth import get_user_model
 from django.core.management import BaseCommand, CommandError
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 from oauth2_provider.models import Application
 
-from mtp_auth.constants import CASHBOOK_OAUTH_CLIENT_ID, BANK_ADMIN_OAUTH_CLIENT_ID, NOMS_OPS_OAUTH_CLIENT_ID
+from mtp_auth import token_cache
+from mtp_auth.constants import (
+    CASHBOOK_OAUTH_CLIENT_ID, BANK_ADMIN_OAUTH_CLIENT_ID, NOMS_OPS_OAUTH_CLIENT_ID, SYSTEM_USERNAME,
+)
+from mtp_auth.models import ApplicationUserMapping
 
 User = get_user_model()
 
@@ -34,24 +42,44 @@ class Command(BaseCommand):
             self.stderr.write(f'Looking for users who’ve not logged in since {cutoff_date}')
 
         users = User.objects.filter(
+            Exists(ApplicationUserMapping.objects.filter(user=OuterRef('pk'), application__in=applications)),
             is_active=True,
             is_staff=False,
             is_superuser=False,
-            applicationusermapping__application__in=applications,
+        ).alias(
+            # last login or, if never logged in, when the user joined
+            last_active=Coalesce('last_login', 'date_joined'),
+            is_user_admin=Exists(User.groups.through.objects.filter(user=OuterRef('pk'), group__name='UserAdmin')),
         ).filter(
-            # last login was a long time ago
-            Q(last_login__lt=cutoff_date) |
-            # or never logged in but joined a long time ago
-            Q(last_login__isnull=True) & Q(date_joined__lt=cutoff_date)
-        ).distinct('username')
-        for user in users:
-            if user.groups.filter(name='UserAdmin').exists():
-                if (
-                    user.last_login and user.last_login >= admin_cutoff_date or
-                    user.last_login is None and user.date_joined >= admin_cutoff_date
-                ):
-                    continue
-            if verbosity > 0:
-                self.stderr.write(f'Deactivating {user.username}')
-            user.is_active = False
-            user.save()
+            # user admins are given longer to become inactive
+            Q(last_active__lt=cutoff_date, is_user_admin=False) |
+            Q(last_active__lt=admin_cutoff_date)
+        ).order_by('username')
+
+        with transaction.atomic():
+            users = list(users.select_for_update().values_list('pk', 'username'))
+            if not users:
+                return
+            user_ids = [user_id for user_id, _ in users]
+            User.objects.filter(pk__in=user_ids).update(is_active=False)
+
+            # deactivations are recorded as changes made by the system user, who cannot log in
+            system_user_id = User.objects.values_list('pk', flat=True).get(username=SYSTEM_USERNAME)
+            content_type_id = get_content_type_for_model(User).pk
+            LogEntry.objects.bulk_create(
+                LogEntry(
+                    user_id=system_user_id,
+                    content_type_id=content_type_id,
+                    object_id=str(user_id),
+                    object_repr=username,
+                    action_flag=CHANGE_LOG_ENTRY,
+                    change_message=f'Deactivated after not logging in for {self.inactive_months} months',
+                )
+                for user_id, username in users
+            )
+        # bulk updates do not send the signals that forget cached users
+        token_cache.forget_users(user_ids)
+
+        if verbosity > 0:
+            for _, username in users:
+                self.stderr.write(f'Deactivated {username}')
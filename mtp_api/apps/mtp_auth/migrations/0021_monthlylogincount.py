@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_past_logins(apps, schema_editor):
+    # past logins are attributed to the prisons their users are currently in
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO mtp_auth_monthlylogincount (application_id, prison_id, month, count)
+            SELECT
+              mtp_auth_login.application_id,
+              mtp_auth_prisonusermapping_prisons.prison_id,
+              date_trunc('month', mtp_auth_login.created AT TIME ZONE '{settings.TIME_ZONE}')::date,
+              COUNT(*)
+            FROM mtp_auth_login
+            LEFT OUTER JOIN mtp_auth_prisonusermapping ON mtp_auth_prisonusermapping.user_id = mtp_auth_login.user_id
+            LEFT OUTER JOIN mtp_auth_prisonusermapping_prisons ON
+              mtp_auth_prisonusermapping_prisons.prisonusermapping_id = mtp_auth_prisonusermapping.id
+            GROUP BY 1, 2, 3
+        """)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.OAUTH2_PROVIDER_APPLICATION_MODEL),
+        ('prison', '0023_removed_single_offender_id_from_prisonerlocation'),
+        ('mtp_auth', '0020_flag_cashbook_uas_to_confirm_credit_notice_email'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyLoginCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.OAUTH2_PROVIDER_APPLICATION_MODEL)),
+                ('prison', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='prison.prison')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlylogincount',
+            constraint=models.UniqueConstraint(fields=('application', 'prison', 'month'), name='unique_monthly_login_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlylogincount',
+            constraint=models.UniqueConstraint(condition=models.Q(prison__isnull=True), fields=('application', 'month'), name='unique_monthly_login_count_without_prison'),
+        ),
+        migrations.RunPython(count_past_logins, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.contrib.auth.hashers import make_password
+from django.db import migrations
+
+from mtp_auth.constants import SYSTEM_USERNAME
+
+
+def create_system_user(apps, schema_editor):
+    user_class = apps.get_model('auth', 'User')
+    user_class.objects.get_or_create(
+        username=SYSTEM_USERNAME,
+        defaults={
+            'first_name': 'Prisoner Money',
+            'last_name': 'System',
+            # as set by User.set_unusable_password which historical models lack
+            'password': make_password(None),
+            'is_active': False,
+        },
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('mtp_auth', '0021_monthlylogincount'),
+    ]
+    operations = [
+        # automatic changes remain attributed to the system user so it is not removed
+        migrations.RunPython(create_system_user, reverse_code=migrations.RunPython.noop),
+    ]
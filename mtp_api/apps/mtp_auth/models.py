@@ -3,18 +3,27 @@ from types import MethodType
 import uuid
 
 from django.conf import settings
-from django.contrib.auth import get_user_model, user_logged_in
-from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.utils.timezone import now
+from django.contrib.auth import get_user_model, user_logged_in, user_logged_out
+from django.contrib.auth.models import AbstractUser, Group
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.dispatch import receiver
+from django.utils.timezone import localtime, now
 from django.utils.translation import gettext_lazy as _
 from model_utils.models import TimeStampedModel
 from mtp_common.tasks import send_email
 
+from mtp_auth import token_cache
 from prison.models import Prison
 
 
 class PrisonUserMappingManager(models.Manager):
+    # prison sets are remembered on user instances for the duration of a request and, if
+    # PRISON_USER_MAPPING_CACHE_TTL is set, shared between processes using the cache;
+    # any change to mappings in this process increments the generation to discard the former
+    cache_key_prefix = 'prison-user-mapping-'
+    generation = 0
+
     def assign_prisons_from_user(self, from_user, to_user):
         prisons = self.get_prison_set_for_user(from_user)
         if len(prisons) > 0:
@@ -28,10 +37,43 @@ class PrisonUserMappingManager(models.Manager):
             mapping.delete()
 
     def get_prison_set_for_user(self, user):
-        try:
-            return self.get_queryset().get(user=user).prisons.all()
-        except PrisonUserMapping.DoesNotExist:
+        prison_ids = self.get_prison_ids_for_user(user)
+        if not prison_ids:
             return Prison.objects.none()
+        return Prison.objects.filter(pk__in=prison_ids)
+
+    def get_prison_ids_for_user(self, user):
+        """
+        Returns a tuple of NOMIS ids of prisons that the user is mapped to
+        """
+        if user.pk is None:
+            return ()
+        generation, prison_ids = getattr(user, '_prison_ids', (None, None))
+        if generation == PrisonUserMappingManager.generation:
+            return prison_ids
+
+        ttl = settings.PRISON_USER_MAPPING_CACHE_TTL
+        cache_key = f'{self.cache_key_prefix}{user.pk}'
+        prison_ids = cache.get(cache_key) if ttl > 0 else None
+        if prison_ids is None:
+            prison_ids = tuple(
+                Prison.objects.filter(prisonusermapping__user=user).order_by('pk').values_list('pk', flat=True)
+            )
+            if ttl > 0:
+                cache.set(cache_key, prison_ids, timeout=ttl)
+        user._prison_ids = (PrisonUserMappingManager.generation, prison_ids)
+        return prison_ids
+
+    def forget_prison_ids(self, user_ids):
+        PrisonUserMappingManager.generation += 1
+        if settings.PRISON_USER_MAPPING_CACHE_TTL <= 0:
+            return
+        cache_keys = [f'{self.cache_key_prefix}{user_id}' for user_id in user_ids]
+        if not cache_keys:
+            return
+        cache.delete_many(cache_keys)
+        # another request may have cached the previous prison set before this transaction is committed
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
 
 
 class PrisonUserMapping(TimeStampedModel):
@@ -43,6 +85,67 @@ class PrisonUserMapping(TimeStampedModel):
         return self.user.username
 
 
+@receiver(models.signals.post_save, sender=PrisonUserMapping)
+@receiver(models.signals.post_delete, sender=PrisonUserMapping)
+def prison_user_mapping_changed(instance, **kwargs):
+    PrisonUserMapping.objects.forget_prison_ids([instance.user_id])
+
+
+@receiver(models.signals.m2m_changed, sender=PrisonUserMapping.prisons.through)
+def prison_user_mapping_prisons_changed(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            PrisonUserMapping.objects.forget_prison_ids([instance.user_id])
+    elif action == 'pre_clear':
+        # mappings are no longer known after a prison's mappings are cleared
+        PrisonUserMapping.objects.forget_prison_ids(instance.prisonusermapping_set.values_list('user_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        PrisonUserMapping.objects.forget_prison_ids(
+            PrisonUserMapping.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        )
+
+
+@receiver(models.signals.post_save, sender='oauth2_provider.AccessToken')
+@receiver(models.signals.post_delete, sender='oauth2_provider.AccessToken')
+def access_token_changed(instance, **kwargs):
+    token_cache.forget_access_tokens([instance.token])
+
+
+@receiver(models.signals.post_save, sender='oauth2_provider.Application')
+@receiver(models.signals.post_delete, sender='oauth2_provider.Application')
+def application_changed(instance, **kwargs):
+    token_cache.forget_applications([instance.pk])
+
+
+@receiver(models.signals.post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(models.signals.post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(instance, **kwargs):
+    token_cache.forget_users([instance.pk])
+
+
+@receiver(user_logged_out)
+def user_logged_out_receiver(user, **kwargs):
+    if user:
+        token_cache.forget_users([user.pk])
+
+
+@receiver(models.signals.m2m_changed, sender=f'{settings.AUTH_USER_MODEL}_groups')
+@receiver(models.signals.m2m_changed, sender=f'{settings.AUTH_USER_MODEL}_user_permissions')
+@receiver(models.signals.m2m_changed, sender='auth.Group_permissions')
+def permissions_changed(instance, action, reverse, sender, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse and sender != Group.permissions.through:
+        token_cache.forget_users([instance.pk])
+    else:
+        token_cache.forget_all_permissions()
+
+
+@receiver(models.signals.post_delete, sender='auth.Group')
+def group_deleted(**kwargs):
+    token_cache.forget_all_permissions()
+
+
 class ApplicationUserMapping(TimeStampedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     application = models.ForeignKey('oauth2_provider.Application', on_delete=models.CASCADE)
@@ -123,46 +226,161 @@ class Login(models.Model):
 user_logged_in.connect(Login.user_logged_in)
 
 
+class MonthlyLoginCountManager(models.Manager):
+    def record_login(self, login):
+        month = localtime(login.created).date().replace(day=1)
+        prison_ids = PrisonUserMapping.objects.get_prison_ids_for_user(login.user) or (None,)
+        for prison_id in prison_ids:
+            lookup = {'application_id': login.application_id, 'prison_id': prison_id, 'month': month}
+            if self.filter(**lookup).update(count=models.F('count') + 1):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(count=1, **lookup)
+            except IntegrityError:
+                # created concurrently
+                self.filter(**lookup).update(count=models.F('count') + 1)
+
+
+class MonthlyLoginCount(models.Model):
+    """
+    Number of logins into each application by users in each prison per month, in local time,
+    maintained as logins are recorded so that login stats do not need to scan the Login table.
+    Users in several prisons count towards each and the prison is null for users in none.
+    """
+    application = models.ForeignKey('oauth2_provider.Application', on_delete=models.CASCADE)
+    prison = models.ForeignKey('prison.Prison', on_delete=models.CASCADE, null=True)
+    month = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = MonthlyLoginCountManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['application', 'prison', 'month'],
+                name='unique_monthly_login_count',
+            ),
+            models.UniqueConstraint(
+                fields=['application', 'month'], condition=models.Q(prison__isnull=True),
+                name='unique_monthly_login_count_without_prison',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.application_id} {self.prison_id} {self.month:%Y-%m}: {self.count}'
+
+
+@receiver(models.signals.post_save, sender=Login)
+def login_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        MonthlyLoginCount.objects.record_login(instance)
+
+
 class FailedLoginAttemptManager(models.Manager):
+    # with MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS, the number of failed attempts for each user and application,
+    # and the time of the last one, are kept in the shared cache so that checking for lockouts does not query
+    # the database; they are loaded from the database when missing and forgotten when attempts are saved or deleted
+    # other than by this manager. Otherwise, attempts are counted in the database.
+    cache_key_prefix = 'failed-login-attempts-'
+
+    def get_cache_keys(self, user_id, application_id):
+        cache_key = f'{self.cache_key_prefix}{user_id}-{application_id}'
+        return f'{cache_key}-count', f'{cache_key}-last'
+
+    def get_failed_attempts(self, user, client):
+        """
+        Returns the number of failed login attempts for the user and application and when the last was made
+        """
+        if not settings.MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS:
+            return self.count_failed_attempts(user, client)
+        count_key, last_key = self.get_cache_keys(user.pk, client.pk)
+        cached = cache.get_many([count_key, last_key])
+        if count_key in cached and last_key in cached:
+            return cached[count_key], cached[last_key]
+        return self.load_failed_attempts(user, client)
+
+    def count_failed_attempts(self, user, client):
+        failed_attempts = self.get_queryset().filter(user=user, application=client).aggregate(
+            count=models.Count('pk'),
+            last=models.Max('created'),
+        )
+        return failed_attempts['count'], failed_attempts['last']
+
+    def load_failed_attempts(self, user, client):
+        failed_attempt_count, last_failed_attempt_time = self.count_failed_attempts(user, client)
+        count_key, last_key = self.get_cache_keys(user.pk, client.pk)
+        # values are only added so that attempts counted by other processes in the meantime are not overwritten
+        cache.add(count_key, failed_attempt_count, timeout=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD)
+        cache.add(last_key, last_failed_attempt_time, timeout=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD)
+        return failed_attempt_count, last_failed_attempt_time
+
+    def forget_failed_attempts(self, user_id, application_id):
+        if not settings.MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS:
+            return
+        cache_keys = self.get_cache_keys(user_id, application_id)
+        cache.delete_many(cache_keys)
+        # another request may have cached the previous attempts before this transaction is committed
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
     def is_locked_out(self, user, client=None):
-        failed_attempts = self.get_queryset().filter(user=user)
         if client:
-            failed_attempts = failed_attempts.filter(application=client)
+            failed_attempt_count, last_failed_attempt_time = self.get_failed_attempts(user, client)
+            if failed_attempt_count >= settings.MTP_AUTH_LOCKOUT_COUNT:
+                if self.is_within_lockout_period(last_failed_attempt_time):
+                    return True
+                self.delete_failed_attempts(user, client)
+            return False
+
+        # lockouts in any application are only checked when managing users so are not cached
+        failed_attempts = self.get_queryset().filter(user=user)
         failed_attempt_count = failed_attempts.count()
         if not failed_attempt_count:
             return False
 
         if failed_attempt_count >= settings.MTP_AUTH_LOCKOUT_COUNT:
             last_failed_attempt = failed_attempts.first()
-            lockout_cutoff = now() - datetime.timedelta(
-                seconds=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD
-            )
-            if last_failed_attempt.created > lockout_cutoff:
+            if self.is_within_lockout_period(last_failed_attempt.created):
                 return True
             else:
                 failed_attempts.delete()
         return False
 
+    def is_within_lockout_period(self, last_failed_attempt_time):
+        lockout_cutoff = now() - datetime.timedelta(
+            seconds=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD
+        )
+        return last_failed_attempt_time > lockout_cutoff
+
     def is_lockout_imminent(self, user, client=None):
-        failed_attempts = self.get_queryset().filter(user=user)
         if client:
-            failed_attempts = failed_attempts.filter(application=client)
-        failed_attempt_count = failed_attempts.count()
+            failed_attempt_count, last_failed_attempt_time = self.get_failed_attempts(user, client)
+        else:
+            failed_attempt_count = self.get_queryset().filter(user=user).count()
         return failed_attempt_count == (settings.MTP_AUTH_LOCKOUT_COUNT - 1)
 
     def delete_failed_attempts(self, user, client):
+        failed_attempt_count, last_failed_attempt_time = self.get_failed_attempts(user, client)
+        if not failed_attempt_count:
+            return
         self.get_queryset().filter(
             user=user,
             application=client,
         ).delete()
+        if settings.MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS:
+            count_key, last_key = self.get_cache_keys(user.pk, client.pk)
+            cache.set_many({count_key: 0, last_key: None}, timeout=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD)
 
     def add_failed_attempt(self, user, client):
-        self.get_queryset().create(
-            user=user,
-            application=client,
-        )
-        failed_attempts = self.get_queryset().filter(user=user, application=client)
-        if failed_attempts.count() == settings.MTP_AUTH_LOCKOUT_COUNT:
+        if settings.MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS:
+            failed_attempt_count = self.add_cached_failed_attempt(user, client)
+        else:
+            with transaction.atomic():
+                # concurrent attempts are counted one at a time so that exactly one reaches the lockout count
+                list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+                self.get_queryset().create(user=user, application=client)
+                failed_attempt_count = self.get_queryset().filter(user=user, application=client).count()
+        if failed_attempt_count == settings.MTP_AUTH_LOCKOUT_COUNT:
             roles = Role.objects.get_roles_for_user(user)
             roles = list(filter(lambda role: role.application == client, roles))
             if roles:
@@ -183,6 +401,21 @@ class FailedLoginAttemptManager(models.Manager):
                 staff_email=True,
             )
 
+    def add_cached_failed_attempt(self, user, client):
+        # ensure that the cached count includes earlier attempts before incrementing it
+        self.get_failed_attempts(user, client)
+        failed_attempt = self.model(user=user, application=client)
+        # bulk creation does not send post_save so the cached count is incremented instead of being forgotten
+        self.bulk_create([failed_attempt])
+        count_key, last_key = self.get_cache_keys(user.pk, client.pk)
+        try:
+            failed_attempt_count = cache.incr(count_key)
+        except ValueError:
+            failed_attempt_count, last_failed_attempt_time = self.load_failed_attempts(user, client)
+        else:
+            cache.set(last_key, failed_attempt.created, timeout=settings.MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD)
+        return failed_attempt_count
+
 
 class FailedLoginAttempt(TimeStampedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -197,6 +430,12 @@ class FailedLoginAttempt(TimeStampedModel):
         return self.user.username
 
 
+@receiver(models.signals.post_save, sender=FailedLoginAttempt)
+@receiver(models.signals.post_delete, sender=FailedLoginAttempt)
+def failed_login_attempt_changed(instance, **kwargs):
+    FailedLoginAttempt.objects.forget_failed_attempts(instance.user_id, instance.application_id)
+
+
 class PasswordChangeRequest(TimeStampedModel):
     code = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
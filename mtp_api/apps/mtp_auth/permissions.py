@@ -120,8 +120,7 @@ class UserMappedToPrison(BasePermission):
 
         if view.action in ('create', 'update', 'partial_update') and self.field_name in request.data:
             prison_id = request.data[self.field_name]
-            user_prisons = PrisonUserMapping.objects.get_prison_set_for_user(request.user)
-            return user_prisons.filter(nomis_id=prison_id).exists()
+            return prison_id in PrisonUserMapping.objects.get_prison_ids_for_user(request.user)
 
         # retrieve and destroy are checked by has_object_permission
         # list action is always permitted
@@ -133,5 +132,4 @@ class UserMappedToPrison(BasePermission):
 
         # retrieve, update, partial_update, destroy
         prison_id = getattr(obj, self.field_name).nomis_id
-        user_prisons = PrisonUserMapping.objects.get_prison_set_for_user(request.user)
-        return user_prisons.filter(nomis_id=prison_id).exists()
+        return prison_id in PrisonUserMapping.objects.get_prison_ids_for_user(request.user)
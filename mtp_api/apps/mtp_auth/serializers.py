@@ -1,8 +1,12 @@
+import itertools
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.contrib.auth.password_validation import get_default_password_validators
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.transaction import atomic
+from django.utils.functional import cached_property
 from django.utils.translation import gettext, gettext_lazy as _
 from mtp_common.tasks import send_email
 from rest_framework import serializers
@@ -116,26 +120,63 @@ class UserSerializer(serializers.ModelSerializer):
 
         return fields
 
+    @property
+    def user_details_prefetched(self):
+        # lists of users are loaded with `mtp_auth.views.prefetch_user_details`
+        return self.context.get('user_details_prefetched', False)
+
+    @cached_property
+    def all_roles(self):
+        return list(Role.objects.all())
+
     def get_is_locked_out(self, obj):
+        if self.user_details_prefetched:
+            return bool(
+                obj.failed_login_attempt_count
+                and obj.failed_login_attempt_count >= settings.MTP_AUTH_LOCKOUT_COUNT
+                and FailedLoginAttempt.objects.is_within_lockout_period(obj.last_failed_login_attempt)
+            )
         return FailedLoginAttempt.objects.is_locked_out(user=obj)
 
     def get_roles(self, obj):
+        if self.user_details_prefetched:
+            group_ids = {group.pk for group in obj.groups.all()}
+            return sorted(role.name for role in self.all_roles if role.key_group_id in group_ids)
         return sorted(Role.objects.get_roles_for_user(obj).values_list('name', flat=True))
 
     def get_permissions(self, obj):
+        if self.user_details_prefetched and obj.is_active and not obj.is_superuser:
+            # matches ModelBackend.get_all_permissions
+            permissions = itertools.chain(
+                obj.user_permissions.all(),
+                (permission for group in obj.groups.all() for permission in group.permissions.all()),
+            )
+            return {
+                f'{permission.content_type.app_label}.{permission.codename}'
+                for permission in permissions
+            }
         return obj.get_all_permissions()
 
     def get_user_admin(self, obj):
+        if self.user_details_prefetched:
+            return any(group.name == 'UserAdmin' for group in obj.groups.all())
         return obj.groups.filter(name='UserAdmin').exists()
 
     def get_prisons(self, obj):
+        if self.user_details_prefetched:
+            try:
+                prisons = obj.prisonusermapping.prisons.all()
+            except PrisonUserMapping.DoesNotExist:
+                prisons = []
+        else:
+            prisons = PrisonUserMapping.objects.get_prison_set_for_user(obj)
         return (
             {
                 'nomis_id': prison.pk,
                 'name': prison.name,
                 'pre_approval_required': prison.pre_approval_required
             }
-            for prison in PrisonUserMapping.objects.get_prison_set_for_user(obj)
+            for prison in prisons
         )
 
     def validate(self, attrs):
@@ -1,12 +1,14 @@
 import datetime
 
 from dateutil.relativedelta import relativedelta
+from django.contrib.admin.models import LogEntry, CHANGE
 from django.core.management import call_command, CommandError
 from django.test import TestCase
 from django.utils.timezone import make_aware, now
 from oauth2_provider.models import Application
 
 from core.tests.utils import make_test_users, make_test_user_admins, create_super_admin
+from mtp_auth.constants import SYSTEM_USERNAME
 from mtp_auth.management.commands.disable_inactive_users import User
 
 
@@ -23,7 +25,8 @@ class DisableInactiveUsersTestCase(TestCase):
 
     def assertInactiveUsernames(self, *usernames):  # noqa: N802
         self.assertSequenceEqual(
-            User.objects.filter(is_active=False).order_by('username').values_list('username', flat=True),
+            User.objects.filter(is_active=False).exclude(username=SYSTEM_USERNAME)
+            .order_by('username').values_list('username', flat=True),
             sorted(usernames),
         )
 
@@ -45,7 +48,7 @@ class DisableInactiveUsersTestCase(TestCase):
         self.make_user_old(bank_admin)
         self.make_user_old(security_staff)
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
         self.assertInactiveUsernames(
             prison_clerk.username,
@@ -65,7 +68,7 @@ class DisableInactiveUsersTestCase(TestCase):
         self.make_user_old(bank_admin_user_admin, last_login=None)
         self.make_user_old(fiu_user, last_login=None)
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
         self.assertInactiveUsernames(
             prison_clerk.username,
@@ -74,6 +77,37 @@ class DisableInactiveUsersTestCase(TestCase):
             fiu_user.username,
         )
 
+    def test_deactivation_is_recorded_in_bulk(self):
+        prison_clerks = self.users['prison_clerks']
+        for prison_clerk in prison_clerks:
+            self.make_user_old(prison_clerk)
+
+        call_command('disable_inactive_users', verbosity=0)
+        self.assertInactiveUsernames(*(prison_clerk.username for prison_clerk in prison_clerks))
+        self.assertSetEqual(
+            set(LogEntry.objects.filter(action_flag=CHANGE).values_list('object_id', 'object_repr', 'change_message')),
+            {
+                (str(prison_clerk.pk), prison_clerk.username, 'Deactivated after not logging in for 3 months')
+                for prison_clerk in prison_clerks
+            },
+        )
+
+        # nothing more to do when run again
+        call_command('disable_inactive_users', verbosity=0)
+        self.assertEqual(LogEntry.objects.count(), len(prison_clerks))
+
+    def test_deactivation_attributed_to_system_user(self):
+        prison_clerk = self.users['prison_clerks'][0]
+        self.make_user_old(prison_clerk)
+
+        call_command('disable_inactive_users', verbosity=0)
+        system_user = User.objects.get(username=SYSTEM_USERNAME)
+        self.assertFalse(system_user.is_active)
+        self.assertFalse(system_user.has_usable_password())
+        log_entry = LogEntry.objects.get(action_flag=CHANGE)
+        self.assertEqual(log_entry.user, system_user)
+        self.assertEqual(log_entry.object_id, str(prison_clerk.pk))
+
     def test_user_admins_are_given_longer_to_become_inactive(self):
         prison_clerk_user_admin = self.user_admins['prison_clerk_uas'][0]  # user admin
         bank_admin_user_admin = self.user_admins['bank_admin_uas'][0]  # user admin
@@ -87,7 +121,7 @@ class DisableInactiveUsersTestCase(TestCase):
         self.make_user_old(bank_admin_user_admin, date_joined=date_joined, last_login=None)
         self.make_user_old(security_staff, date_joined=date_joined, last_login=last_login)
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
         self.assertInactiveUsernames(security_staff.username)
 
@@ -121,9 +155,9 @@ class DisableInactiveUsersTestCase(TestCase):
 
         self.make_user_old(User.objects.get(username='admin'))
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
 
     def test_inactive_staff_are_ignored(self):
         fiu_admin = self.user_admins['security_fiu_uas'][0]
@@ -131,24 +165,24 @@ class DisableInactiveUsersTestCase(TestCase):
         # upgrade user to allow access to django admin
         self.make_user_old(fiu_admin, is_staff=True)
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
 
     def test_inactive_users_of_other_apps_are_ignored(self):
         send_money_user = self.users['send_money_users'][0]
 
         self.make_user_old(send_money_user)
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         call_command('disable_inactive_users', verbosity=0)
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
 
     def test_error_if_missing_applications(self):
         User.objects.all().delete()
         Application.objects.all().delete()
 
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
         with self.assertRaises(CommandError):
             call_command('disable_inactive_users', verbosity=0)
-        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertInactiveUsernames()
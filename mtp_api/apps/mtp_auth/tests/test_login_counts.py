@@ -8,7 +8,7 @@ from django.utils.timezone import make_aware
 from model_bakery import baker
 from oauth2_provider.models import Application
 
-from mtp_auth.models import Login, PrisonUserMapping
+from mtp_auth.models import Login, MonthlyLoginCount, PrisonUserMapping
 from mtp_auth.views import LoginStatsView
 from prison.models import Prison
 
@@ -16,8 +16,8 @@ User = get_user_model()
 
 
 class LoginCountTestCase(TestCase):
-    def login(self, user, application, date):
-        now = make_aware(datetime.datetime(*date, 12))
+    def login(self, user, application, date, time=(12,)):
+        now = make_aware(datetime.datetime(*date, *time))
         with mock.patch('django.db.models.fields.timezone.now', return_value=now):
             Login.objects.create(
                 user=user,
@@ -61,7 +61,8 @@ class LoginCountTestCase(TestCase):
         this_month = date_format(this_month, 'Y-m')
         last_month = date_format(last_month, 'Y-m')
 
-        login_counts = view.get_login_counts(application.client_id)
+        with self.assertNumQueries(1):
+            login_counts = view.get_login_counts(application.client_id)
 
         # expect there to be double by the end of the month
         self.assertEqual(login_counts[(prison.nomis_id, this_month)], 4)
@@ -69,6 +70,11 @@ class LoginCountTestCase(TestCase):
         self.assertEqual(login_counts[(prison.nomis_id, last_month)], 3)
         self.assertEqual(login_counts[(None, last_month)], 0)
 
+        self.assertEqual(MonthlyLoginCount.objects.get(prison=prison, month=datetime.date(2018, 4, 1)).count, 2)
+        # logins are counted in the month they happen in local time, not UTC
+        self.login(user_not_in_prison, application, (2018, 4, 1), time=(0, 30))
+        self.assertEqual(MonthlyLoginCount.objects.get(prison=None, month=datetime.date(2018, 4, 1)).count, 2)
+
     def test_get_months(self):
         scenarios = [
             {
@@ -0,0 +1,131 @@
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from model_bakery import baker
+from oauth2_provider.models import Application
+
+from mtp_auth.models import FailedLoginAttempt, PrisonUserMapping
+from prison.models import Prison
+
+User = get_user_model()
+
+
+@override_settings(PRISON_USER_MAPPING_CACHE_TTL=60)
+class PrisonSetCacheTestCase(TestCase):
+    fixtures = ['test_prisons.json']
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.prison1, self.prison2 = Prison.objects.order_by('pk')[:2]
+        self.user = baker.make(User)
+        PrisonUserMapping.objects.assign_prisons_to_user(self.user, [self.prison1])
+
+    def get_prison_ids(self, user=None):
+        # a freshly loaded user as in a new request
+        return PrisonUserMapping.objects.get_prison_ids_for_user(user or User.objects.get(pk=self.user.pk))
+
+    def test_prison_set_resolved_once_per_request(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(PrisonUserMapping.objects.get_prison_ids_for_user(user), (self.prison1.pk,))
+            self.assertEqual(PrisonUserMapping.objects.get_prison_ids_for_user(user), (self.prison1.pk,))
+        self.assertSequenceEqual(PrisonUserMapping.objects.get_prison_set_for_user(user), [self.prison1])
+
+    def test_prison_set_cached_between_requests(self):
+        self.get_prison_ids()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_prison_ids(user), (self.prison1.pk,))
+
+    @override_settings(PRISON_USER_MAPPING_CACHE_TTL=0)
+    def test_prison_set_not_cached_between_requests_when_disabled(self):
+        self.get_prison_ids()
+        self.assertFalse(cache.has_key(f'{PrisonUserMapping.objects.cache_key_prefix}{self.user.pk}'))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_prison_ids(user), (self.prison1.pk,))
+            self.assertEqual(self.get_prison_ids(user), (self.prison1.pk,))
+        PrisonUserMapping.objects.assign_prisons_to_user(self.user, [self.prison2])
+        self.assertEqual(self.get_prison_ids(), (self.prison2.pk,))
+
+    def test_unmapped_user(self):
+        user = baker.make(User)
+        self.assertEqual(PrisonUserMapping.objects.get_prison_ids_for_user(user), ())
+        self.assertFalse(PrisonUserMapping.objects.get_prison_set_for_user(user).exists())
+
+    def test_cache_invalidated_when_prisons_assigned(self):
+        self.assertEqual(self.get_prison_ids(self.user), (self.prison1.pk,))
+        PrisonUserMapping.objects.assign_prisons_to_user(self.user, [self.prison1, self.prison2])
+        self.assertEqual(self.get_prison_ids(), (self.prison1.pk, self.prison2.pk))
+        self.assertEqual(self.get_prison_ids(self.user), (self.prison1.pk, self.prison2.pk))
+
+        PrisonUserMapping.objects.assign_prisons_to_user(self.user, [])
+        self.assertEqual(self.get_prison_ids(), ())
+        self.assertEqual(self.get_prison_ids(self.user), ())
+
+    def test_cache_invalidated_when_mapping_changed(self):
+        self.assertEqual(self.get_prison_ids(self.user), (self.prison1.pk,))
+        self.user.prisonusermapping.prisons.add(self.prison2)
+        self.assertEqual(self.get_prison_ids(), (self.prison1.pk, self.prison2.pk))
+        self.user.prisonusermapping.prisons.clear()
+        self.assertEqual(self.get_prison_ids(self.user), ())
+
+        self.user.prisonusermapping.prisons.add(self.prison2)
+        self.user.prisonusermapping.delete()
+        self.assertEqual(self.get_prison_ids(), ())
+
+    def test_cache_invalidated_when_prison_mappings_changed(self):
+        self.assertEqual(self.get_prison_ids(), (self.prison1.pk,))
+        self.prison2.prisonusermapping_set.add(self.user.prisonusermapping)
+        self.assertEqual(self.get_prison_ids(), (self.prison1.pk, self.prison2.pk))
+        self.prison1.prisonusermapping_set.clear()
+        self.assertEqual(self.get_prison_ids(), (self.prison2.pk,))
+
+
+@mock.patch('mtp_auth.models.send_email')
+class FailedLoginAttemptConcurrencyTestCase(TransactionTestCase):
+    attempt_count = settings.MTP_AUTH_LOCKOUT_COUNT * 2
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = baker.make(User, email='user@example.com')
+        self.application = baker.make(Application, name='Cashbook')
+
+    def add_failed_attempts_concurrently(self):
+        barrier = threading.Barrier(self.attempt_count)
+
+        def add_failed_attempt():
+            try:
+                barrier.wait()
+                FailedLoginAttempt.objects.add_failed_attempt(self.user, self.application)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add_failed_attempt) for _ in range(self.attempt_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def assertAllAttemptsCounted(self, mock_send_email):  # noqa: N802
+        self.assertEqual(FailedLoginAttempt.objects.filter(user=self.user).count(), self.attempt_count)
+        failed_attempt_count, _ = FailedLoginAttempt.objects.get_failed_attempts(self.user, self.application)
+        self.assertEqual(failed_attempt_count, self.attempt_count)
+        self.assertTrue(FailedLoginAttempt.objects.is_locked_out(self.user, self.application))
+        self.assertEqual(mock_send_email.call_count, 1, msg='Exactly one attempt should reach the lockout count')
+
+    def test_concurrent_attempts_counted_in_database(self, mock_send_email):
+        self.add_failed_attempts_concurrently()
+        self.assertAllAttemptsCounted(mock_send_email)
+
+    @override_settings(MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS=True)
+    def test_concurrent_attempts_counted_in_cache(self, mock_send_email):
+        self.add_failed_attempts_concurrently()
+        self.assertAllAttemptsCounted(mock_send_email)
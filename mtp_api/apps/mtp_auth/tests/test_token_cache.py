@@ -0,0 +1,78 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from oauth2_provider.models import AccessToken
+
+from core.tests.utils import make_test_users
+from mtp_auth.tests.utils import AuthTestCaseMixin
+
+
+@override_settings(OAUTH2_TOKEN_CACHE_TTL=60)
+class AccessTokenCacheTestCase(AuthTestCaseMixin, TestCase):
+    fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = make_test_users()['prison_clerks'][0]
+        self.authorisation = self.get_http_authorization_for_user(self.user)
+
+    def get_credits(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('credit-list'), HTTP_AUTHORIZATION=self.authorisation)
+        return response, [query['sql'] for query in queries]
+
+    def assertQueriedTable(self, queries, table, queried=True):  # noqa: N802
+        self.assertEqual(any(f'"{table}"' in query for query in queries), queried)
+
+    def test_token_user_and_permissions_cached(self):
+        response, queries = self.get_credits()
+        self.assertEqual(response.status_code, 200)
+        self.assertQueriedTable(queries, 'oauth2_provider_accesstoken')
+        self.assertQueriedTable(queries, 'auth_permission')
+
+        response, queries = self.get_credits()
+        self.assertEqual(response.status_code, 200)
+        self.assertQueriedTable(queries, 'oauth2_provider_accesstoken', queried=False)
+        self.assertQueriedTable(queries, 'auth_permission', queried=False)
+
+    @override_settings(OAUTH2_TOKEN_CACHE_TTL=0)
+    def test_caching_disabled(self):
+        self.get_credits()
+        response, queries = self.get_credits()
+        self.assertEqual(response.status_code, 200)
+        self.assertQueriedTable(queries, 'oauth2_provider_accesstoken')
+        self.assertQueriedTable(queries, 'auth_permission')
+
+        AccessToken.objects.get(user=self.user).revoke()
+        self.assertEqual(self.get_credits()[0].status_code, 401)
+
+    def test_revoked_token_rejected(self):
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+        AccessToken.objects.get(user=self.user).revoke()
+        self.assertEqual(self.get_credits()[0].status_code, 401)
+
+    def test_group_changes_apply(self):
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+        self.user.groups.remove(Group.objects.get(name='PrisonClerk'))
+        self.assertEqual(self.get_credits()[0].status_code, 403)
+        self.user.groups.add(Group.objects.get(name='PrisonClerk'))
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+
+    def test_group_permission_changes_apply(self):
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+        group = Group.objects.get(name='PrisonClerk')
+        permissions = list(group.permissions.all())
+        group.permissions.clear()
+        self.assertEqual(self.get_credits()[0].status_code, 403)
+        group.permissions.set(permissions)
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+
+    def test_deactivated_user_rejected(self):
+        self.assertEqual(self.get_credits()[0].status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIn(self.get_credits()[0].status_code, (401, 403))
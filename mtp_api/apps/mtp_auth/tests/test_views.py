@@ -9,6 +9,10 @@ from urllib.parse import urlencode
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse, reverse_lazy
 from django.utils.timezone import now
 from model_bakery import baker
@@ -764,6 +768,34 @@ class ListUserTestCase(AuthBaseTestCase):
         users = response.json()['results']
         self.assertEqual(sum(1 if user['is_locked_out'] else 0 for user in users), 1)
 
+    def test_list_users_query_count_does_not_grow(self):
+        admin = self.cashbook_uas[0]
+        prison = PrisonUserMapping.objects.get_prison_set_for_user(admin).first()
+        authorisation = self.get_http_authorization_for_user(admin)
+
+        def list_users():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.get_url(), format='json', HTTP_AUTHORIZATION=authorisation)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response.json()['results'], len(queries)
+
+        users, query_count = list_users()
+        for _ in range(5):
+            create_prison_clerk(name_and_password='extra', prisons=[prison])
+        more_users, more_query_count = list_users()
+        self.assertEqual(len(more_users), len(users) + 5)
+        self.assertEqual(more_query_count, query_count)
+
+        detailed_user = self.client.get(
+            reverse('user-detail', kwargs={'username': self.prison_clerks[0].username}),
+            format='json', HTTP_AUTHORIZATION=authorisation,
+        ).json()
+        listed_user = next(user for user in more_users if user['username'] == self.prison_clerks[0].username)
+        self.assertEqual(
+            {**listed_user, 'permissions': set(listed_user['permissions'])},
+            {**detailed_user, 'permissions': set(detailed_user['permissions'])},
+        )
+
 
 @mock.patch('mtp_auth.serializers.send_email')
 class CreateUserTestCase(AuthBaseTestCase):
@@ -1904,6 +1936,53 @@ class AccountLockoutTestCase(AuthBaseTestCase):
         self.assertFalse(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
         self.assertEqual(mock_send_email.call_count, 1)
 
+    @override_settings(MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS=True)
+    def test_lockout_checks_do_not_query_database(self, mock_send_email):
+        cache.clear()
+        prison_clerk = self.prison_clerks[0]
+        cashbook_client = Application.objects.get(client_id=CASHBOOK_OAUTH_CLIENT_ID)
+
+        for _ in range(settings.MTP_AUTH_LOCKOUT_COUNT):
+            self.fail_login(prison_clerk, cashbook_client)
+        with self.assertNumQueries(0):
+            self.assertTrue(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+            self.assertFalse(FailedLoginAttempt.objects.is_lockout_imminent(prison_clerk, cashbook_client))
+
+        # attempts made while locked out are not recorded
+        self.fail_login(prison_clerk, cashbook_client)
+        self.assertEqual(
+            FailedLoginAttempt.objects.filter(user=prison_clerk).count(),
+            settings.MTP_AUTH_LOCKOUT_COUNT,
+        )
+
+    @override_settings(MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS=True)
+    def test_lockout_cache_follows_database_changes(self, mock_send_email):
+        cache.clear()
+        prison_clerk = self.prison_clerks[0]
+        cashbook_client = Application.objects.get(client_id=CASHBOOK_OAUTH_CLIENT_ID)
+
+        self.assertFalse(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+        for _ in range(settings.MTP_AUTH_LOCKOUT_COUNT):
+            FailedLoginAttempt.objects.create(user=prison_clerk, application=cashbook_client)
+        self.assertTrue(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+
+        # e.g. unlocked by a user admin
+        FailedLoginAttempt.objects.filter(user=prison_clerk).delete()
+        self.assertFalse(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+        self.pass_login(prison_clerk, cashbook_client)
+
+    def test_uncached_lockout_checks_query_database_once(self, mock_send_email):
+        prison_clerk = self.prison_clerks[0]
+        cashbook_client = Application.objects.get(client_id=CASHBOOK_OAUTH_CLIENT_ID)
+
+        for _ in range(settings.MTP_AUTH_LOCKOUT_COUNT):
+            self.fail_login(prison_clerk, cashbook_client)
+        with self.assertNumQueries(1):
+            self.assertTrue(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+
+        FailedLoginAttempt.objects.filter(user=prison_clerk).delete()
+        self.assertFalse(FailedLoginAttempt.objects.is_locked_out(prison_clerk, cashbook_client))
+
     def test_email_sent_when_account_locked(self, mock_send_email):
         prison_clerk = self.prison_clerks[0]
         cashbook_client = Application.objects.get(client_id=CASHBOOK_OAUTH_CLIENT_ID)
@@ -0,0 +1,140 @@
+"""
+Caches what is needed to authenticate requests using OAuth2 access tokens: the token's scope and expiry,
+its application and user, and the user's permissions. Entries are invalidated by signal receivers in
+`mtp_auth.models` when tokens are revoked or users, their groups or group permissions change,
+and otherwise expire after OAUTH2_TOKEN_CACHE_TTL seconds. Nothing is cached unless that is set, which it is
+by default only with the redis cache backend where invalidation reaches every process.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+
+cache_key_prefix = 'oauth2-'
+permissions_version_key = f'{cache_key_prefix}permissions-version'
+
+
+def get_access_token_cache_key(token):
+    # tokens are secret so are not used as keys directly
+    return f'{cache_key_prefix}access-token-{hashlib.sha256(token.encode()).hexdigest()}'
+
+
+def get_user_cache_key(user_id):
+    return f'{cache_key_prefix}user-{user_id}'
+
+
+def get_user_permissions_cache_key(user_id):
+    return f'{cache_key_prefix}user-permissions-{user_id}'
+
+
+def get_application_cache_key(application_id):
+    return f'{cache_key_prefix}application-{application_id}'
+
+
+def load_access_token(token):
+    """
+    Returns the AccessToken, with application and user, for a bearer token or None if it does not exist;
+    the token is rebuilt from the cache if possible
+    """
+    ttl = settings.OAUTH2_TOKEN_CACHE_TTL
+    if ttl <= 0:
+        return AccessToken.objects.select_related('application', 'user').filter(token=token).first()
+
+    cache_key = get_access_token_cache_key(token)
+    cached_token = cache.get(cache_key)
+    if cached_token:
+        application_key = get_application_cache_key(cached_token['application_id'])
+        user_key = get_user_cache_key(cached_token['user_id'])
+        cached_objects = cache.get_many([application_key, user_key])
+        application = cached_objects.get(application_key)
+        user = cached_objects.get(user_key)
+        if application and (user or not cached_token['user_id']):
+            access_token = AccessToken(
+                id=cached_token['id'], token=token, scope=cached_token['scope'], expires=cached_token['expires'],
+                application=application, user=user,
+            )
+            access_token._state.adding = False
+            access_token._state.db = cached_token['db']
+            return access_token
+
+    access_token = AccessToken.objects.select_related('application', 'user').filter(token=token).first()
+    if not access_token:
+        return None
+    timeout = min(ttl, (access_token.expires - timezone.now()).total_seconds())
+    if timeout > 0:
+        cache.set_many({
+            cache_key: {
+                'id': access_token.pk,
+                'db': access_token._state.db,
+                'scope': access_token.scope,
+                'expires': access_token.expires,
+                'application_id': access_token.application_id,
+                'user_id': access_token.user_id,
+            },
+            get_application_cache_key(access_token.application_id): access_token.application,
+        }, timeout=timeout)
+        if access_token.user:
+            cache.set(get_user_cache_key(access_token.user_id), access_token.user, timeout=ttl)
+    return access_token
+
+
+def load_user_permissions(user):
+    """
+    Fills the permission caches that ModelBackend keeps on user instances
+    so that permission checks do not need to query the database
+    """
+    if not user.is_active or settings.OAUTH2_TOKEN_CACHE_TTL <= 0:
+        return
+    cache_key = get_user_permissions_cache_key(user.pk)
+    cached_objects = cache.get_many([cache_key, permissions_version_key])
+    permissions_version = cached_objects.get(permissions_version_key, 0)
+    version, user_permissions, group_permissions = cached_objects.get(cache_key, (None, None, None))
+    if version != permissions_version:
+        backend = ModelBackend()
+        user_permissions = backend.get_user_permissions(user)
+        group_permissions = backend.get_group_permissions(user)
+        cache.set(
+            cache_key, (permissions_version, user_permissions, group_permissions),
+            timeout=settings.OAUTH2_TOKEN_CACHE_TTL,
+        )
+    user._user_perm_cache = user_permissions
+    user._group_perm_cache = group_permissions
+    user._perm_cache = {*user_permissions, *group_permissions}
+
+
+def forget(cache_keys):
+    if not cache_keys or settings.OAUTH2_TOKEN_CACHE_TTL <= 0:
+        return
+    cache.delete_many(cache_keys)
+    # another request may have cached previous values before this transaction is committed
+    transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def forget_access_tokens(tokens):
+    forget([get_access_token_cache_key(token) for token in tokens])
+
+
+def forget_users(user_ids):
+    forget([
+        cache_key
+        for user_id in user_ids
+        for cache_key in (get_user_cache_key(user_id), get_user_permissions_cache_key(user_id))
+    ])
+
+
+def forget_applications(application_ids):
+    forget([get_application_cache_key(application_id) for application_id in application_ids])
+
+
+def forget_all_permissions():
+    # permissions of any number of users may change when groups change so cached sets are discarded by version
+    if settings.OAUTH2_TOKEN_CACHE_TTL <= 0:
+        return
+    try:
+        cache.incr(permissions_version_key)
+    except ValueError:
+        cache.set(permissions_version_key, 1, timeout=None)
@@ -6,6 +6,7 @@ from oauthlib.oauth2 import OAuth2Error
 from rest_framework.validators import UniqueValidator
 
 from mtp_auth.models import ApplicationUserMapping, FailedLoginAttempt
+from mtp_auth.token_cache import load_access_token, load_user_permissions
 
 logger = logging.getLogger('mtp')
 
@@ -29,6 +30,15 @@ class LockedOutError(OAuth2Error):
 
 
 class ApplicationRequestValidator(OAuth2Validator):
+    def validate_bearer_token(self, token, scopes, request):
+        valid = super().validate_bearer_token(token, scopes, request)
+        if valid and request.user:
+            load_user_permissions(request.user)
+        return valid
+
+    def _load_access_token(self, token):
+        return load_access_token(token)
+
     def validate_user(self, username, password, client, request, *args, **kwargs):
         user_model = get_user_model()
         try:
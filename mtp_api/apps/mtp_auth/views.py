@@ -3,12 +3,12 @@ from datetime import datetime
 import logging
 from urllib.parse import urlsplit, urlunsplit, urlencode, parse_qs
 
-from django.conf import settings
 from django.contrib.admin.models import LogEntry, CHANGE as CHANGE_LOG_ENTRY, DELETION as DELETION_LOG_ENTRY
 from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.auth import password_validation, get_user_model
+from django.contrib.auth.models import Group, Permission
 from django.core.exceptions import NON_FIELD_ERRORS
-from django.db import connection
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Subquery
 from django.db.transaction import atomic
 from django.forms import ValidationError
 from django.http import Http404
@@ -20,7 +20,6 @@ from django.views.decorators.debug import sensitive_post_parameters, sensitive_v
 import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from mtp_common.tasks import send_email
-from oauth2_provider.models import Application
 from rest_framework import viewsets, generics, status, filters
 from rest_framework.exceptions import ValidationError as RestValidationError
 from rest_framework.permissions import IsAuthenticated
@@ -32,7 +31,7 @@ from core.filters import BaseFilterSet, SplitTextInMultipleFieldsFilter
 from mtp_auth.forms import LoginStatsForm
 from mtp_auth.models import (
     PrisonUserMapping, Role, Flag,
-    FailedLoginAttempt, PasswordChangeRequest, AccountRequest, Login,
+    FailedLoginAttempt, PasswordChangeRequest, AccountRequest, Login, MonthlyLoginCount,
 )
 from mtp_auth.permissions import UserPermissions, AnyAdminClientIDPermissions, AccountRequestPermissions
 from mtp_auth.serializers import (
@@ -76,9 +75,10 @@ def get_managed_user_queryset(user):
 
     NB: Does not check that the user has management permissions
     """
-    user_key_groups = list(user.groups.filter(
-        pk__in=Role.objects.values_list('key_group')
-    ).values_list('pk', flat=True))
+    user_groups = list(user.groups.annotate(
+        is_key_group=Exists(Role.objects.filter(key_group=OuterRef('pk')))
+    ).values_list('pk', 'name', 'is_key_group'))
+    user_key_groups = [group_id for group_id, group_name, is_key_group in user_groups if is_key_group]
     if len(user_key_groups) != 1 or user.is_superuser:
         return User.objects.filter(pk=user.pk)
     user_key_group = user_key_groups[0]
@@ -86,18 +86,41 @@ def get_managed_user_queryset(user):
     queryset = User.objects.exclude(is_superuser=True).filter(groups=user_key_group).order_by('username')
 
     # Do not match prison for FIU, instead return security & FIU group members (excluding superusers?)
-    if user.groups.filter(name='FIU').exists():
+    if any(group_name == 'FIU' for group_id, group_name, is_key_group in user_groups):
         return queryset
-    prisons = list(PrisonUserMapping.objects.get_prison_set_for_user(user).values_list('pk', flat=True))
+    prisons = PrisonUserMapping.objects.get_prison_ids_for_user(user)
     if prisons:
-        for prison in prisons:
-            queryset = queryset.filter(prisonusermapping__prisons=prison)
+        # users must be mapped to every one of the administering user's prisons
+        matching_prison_count = PrisonUserMapping.prisons.through.objects.filter(
+            prisonusermapping__user=OuterRef('pk'),
+            prison__in=prisons,
+        ).order_by().values('prisonusermapping__user').annotate(count=Count('pk')).values('count')
+        queryset = queryset.alias(
+            matching_prison_count=Subquery(matching_prison_count),
+        ).filter(matching_prison_count=len(prisons))
     else:
         queryset = queryset.filter(prisonusermapping__isnull=True)
 
     return queryset
 
 
+def prefetch_user_details(queryset):
+    """
+    Loads everything UserSerializer needs for a list of users in a fixed number of queries
+    """
+    permissions = Permission.objects.select_related('content_type')
+    failed_login_attempts = FailedLoginAttempt.objects.filter(user=OuterRef('pk')).order_by().values('user')
+    return queryset.prefetch_related(
+        'flags',
+        Prefetch('groups', queryset=Group.objects.prefetch_related(Prefetch('permissions', queryset=permissions))),
+        Prefetch('user_permissions', queryset=permissions),
+        'prisonusermapping__prisons',
+    ).annotate(
+        failed_login_attempt_count=Subquery(failed_login_attempts.annotate(count=Count('pk')).values('count')),
+        last_failed_login_attempt=Subquery(failed_login_attempts.annotate(last=Max('created')).values('last')),
+    )
+
+
 class UserFilterset(BaseFilterSet):
     simple_search = SplitTextInMultipleFieldsFilter(
         field_names=('username', 'first_name', 'last_name', 'email'),
@@ -121,7 +144,15 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
 
     def get_queryset(self):
-        return get_managed_user_queryset(self.request.user)
+        queryset = get_managed_user_queryset(self.request.user)
+        if self.action == 'list':
+            queryset = prefetch_user_details(queryset)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['user_details_prefetched'] = self.action == 'list'
+        return context
 
     def get_object(self):
         """
@@ -402,7 +433,7 @@ class AccountRequestViewSet(viewsets.ModelViewSet):
             return super().get_queryset()
         roles = Role.objects.get_roles_for_user(user)
         queryset = AccountRequest.objects.filter(role__in=roles)
-        prisons = list(PrisonUserMapping.objects.get_prison_set_for_user(user).values_list('pk', flat=True))
+        prisons = PrisonUserMapping.objects.get_prison_ids_for_user(user)
         if prisons:
             queryset = queryset.filter(prison__in=prisons)
         return queryset
@@ -641,38 +672,17 @@ class LoginStatsView(BaseAdminReportView):
         return prisons
 
     def get_login_counts(self, application):
-        login_count_query = f"""
-            WITH users AS (
-              SELECT user_id, COUNT(*) AS login_count
-              FROM mtp_auth_login
-              WHERE application_id = %(application_id)s
-                AND date_trunc('month', created AT TIME ZONE '{settings.TIME_ZONE}') = %(month)s
-              GROUP BY user_id
-            )
-            SELECT prison_id, SUM(login_count)::integer AS login_count
-            FROM users
-            LEFT OUTER JOIN mtp_auth_prisonusermapping ON mtp_auth_prisonusermapping.user_id = users.user_id
-            LEFT OUTER JOIN mtp_auth_prisonusermapping_prisons ON
-              mtp_auth_prisonusermapping_prisons.prisonusermapping_id = mtp_auth_prisonusermapping.id
-            GROUP BY prison_id
-        """
+        months = {month.date(): date_format(month, 'Y-m') for month in self.months}
+        this_month = self.months[0].date()
+        monthly_login_counts = MonthlyLoginCount.objects.filter(
+            application__client_id=application,
+            month__in=months,
+        ).values_list('prison_id', 'month', 'count')
+
         login_counts = collections.defaultdict(int)
-        try:
-            application = Application.objects.get(client_id=application)
-        except Application.DoesNotExist:
-            return login_counts
-        for i, month in enumerate(self.months):
-            if i == 0:
-                def scale_func(count):
-                    return int(round(count / self.current_month_progress))
-            else:
-                def scale_func(count):
-                    return count
-            with connection.cursor() as cursor:
-                cursor.execute(login_count_query, {
-                    'application_id': application.id,
-                    'month': month.date(),
-                })
-                for nomis_id, login_count in cursor.fetchall():
-                    login_counts[(nomis_id, date_format(month, 'Y-m'))] = scale_func(login_count)
+        for nomis_id, month, login_count in monthly_login_counts:
+            if month == this_month:
+                # extrapolate to the whole of the current month
+                login_count = int(round(login_count / self.current_month_progress))
+            login_counts[(nomis_id, months[month])] = login_count
         return login_counts
@@ -16,6 +16,7 @@ import openpyxl
 from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
+from core.db_router import use_replica
 from credit.constants import CreditStatus, LogAction as CreditLogAction
 from credit.models import Credit
 from disbursement.constants import DisbursementResolution, DisbursementMethod, LogAction as DisbursementLogAction
@@ -33,6 +34,7 @@ class Command(BaseCommand):
         parser.add_argument('--rules', nargs='*', choices=RULES.keys(), help='Notification rule codes')
         parser.add_argument('emails', nargs='+', help='Email addresses to send reports to')
 
+    @use_replica()
     def handle(self, **options):
         emails = options['emails']
         for email in emails:
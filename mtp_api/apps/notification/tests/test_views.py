@@ -46,6 +46,16 @@ class ListRuleViewTestCase(AuthTestCaseMixin, APITestCase):
             'previous': None,
         })
 
+    def test_unchanged_rules_not_modified(self):
+        authorisation = self.get_http_authorization_for_user(self.security_staff[0])
+        response = self.client.get(reverse('rule-list'), format='json', HTTP_AUTHORIZATION=authorisation)
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(
+            reverse('rule-list'), format='json', HTTP_AUTHORIZATION=authorisation,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
 
 class ListEventPagesTestCase(AuthTestCaseMixin, APITestCase):
     fixtures = ['initial_types.json', 'test_prisons.json', 'initial_groups.json']
@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status, views, viewsets
@@ -7,6 +10,7 @@ from rest_framework.response import Response
 from core.filters import IsoDateTimeFilter, SafeOrderingFilter, MultipleValueFilter, BaseFilterSet
 from core.models import TruncLocalDate
 from core.permissions import ActionsBasedPermissions
+from core.views import reference_data_response
 from mtp_auth.permissions import NomsOpsClientIDPermissions
 from notification.constants import EmailFrequency
 from notification.models import Event, EmailNotificationPreferences
@@ -81,18 +85,20 @@ class EventView(mixins.ListModelMixin, viewsets.GenericViewSet):
 class RuleView(views.APIView):
     permission_classes = (IsAuthenticated, NomsOpsClientIDPermissions)
 
-    def get(self, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         rules = [
             {'code': code, 'description': RULES[code].description}
             for code in RULES
             if code in ENABLED_RULE_CODES
         ]
-        return Response({
+        # rules only change when the code is deployed so their contents version the response
+        etag = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+        return reference_data_response(request, {
             'count': len(rules),
             'next': None,
             'previous': None,
             'results': rules,
-        })
+        }, etag=etag)
 
 
 class EmailPreferencesView(views.APIView):
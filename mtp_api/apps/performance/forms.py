@@ -1,5 +1,6 @@
 import collections
 import datetime
+import itertools
 import logging
 import re
 
@@ -13,10 +14,13 @@ from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
-from core.excel import ExcelWorkbook, ExcelWorksheet
+from core.excel import ExcelWorkbook
 
 logger = logging.getLogger('mtp')
 
+# number of rows saved per query
+upsert_batch_size = 500
+
 
 class DigitalTakeupUploadForm(forms.Form):
     excel_file = forms.FileField(label=_('Excel file'), widget=AdminFileWidget)
@@ -70,20 +74,23 @@ class DigitalTakeupUploadForm(forms.Form):
         return self.prison_name_map[prison_str]
 
     @classmethod
-    def find_worksheet_start(cls, sheet: ExcelWorksheet):
+    def find_worksheet_start(cls, rows):
         # find beginning of spreadsheet as blank rows/columns has appeared over the years
-        for row in range(3):
-            for col in range(3):
-                if (sheet.cell_value(row, col) or '').strip() == 'Parameters':
-                    return row, col
+        for row in itertools.islice(rows, 3):
+            for col in range(min(3, len(row))):
+                if str(row[col] or '').strip() == 'Parameters':
+                    return col
+        raise ValueError('Cannot find start of report')
 
     def parse_workbook(self, workbook: ExcelWorkbook):
-        sheet = workbook.get_sheet(0)
-        start_row, start_col = self.find_worksheet_start(sheet)
+        # rows are read once, in order, so that large sheets are not held in memory
+        rows = workbook.get_sheet(0).iter_rows()
+        start_col = self.find_worksheet_start(rows)
 
         date_formats = ['%d/%m/%Y'] + list(settings.DATE_INPUT_FORMATS)
 
-        def parse_date(date_str, alt_date_str):
+        def parse_date(row):
+            date_str, alt_date_str = str(row[start_col]), str(row[start_col + 1] or '')
             date_str = date_str.split(':', 1)[1].strip().lstrip('0') or alt_date_str.strip().lstrip('0')
             for date_format in date_formats:
                 try:
@@ -92,21 +99,17 @@ class DigitalTakeupUploadForm(forms.Form):
                     continue
             raise ValueError('Cannot parse date header %s' % date_str)
 
-        start_date = parse_date(
-            sheet.cell_value(start_row + 1, start_col),
-            sheet.cell_value(start_row + 1, start_col + 1),
-        )
-        end_date = parse_date(
-            sheet.cell_value(start_row + 2, start_col),
-            sheet.cell_value(start_row + 2, start_col + 1),
-        )
+        start_date = parse_date(next(rows, ()))
+        end_date = parse_date(next(rows, ()))
         if start_date != end_date:
             raise ValidationError(self.error_messages['invalid_date'], code='invalid_date')
         self.date = start_date
 
-        row = start_row + 5
-        while row < sheet.row_count:
-            prison_name = sheet.cell_value(row, start_col)
+        # skip blank and heading rows
+        next(rows, None)
+        next(rows, None)
+        for row_number, row in enumerate(rows):
+            prison_name = row[start_col] if start_col < len(row) else None
             if not prison_name:
                 break
             try:
@@ -121,23 +124,22 @@ class DigitalTakeupUploadForm(forms.Form):
                     'amount_by_post': 0,
                     'amount_by_mtp': 0,
                 }
-            if sheet.cell_value(row, start_col + 1):
-                credit_type = sheet.cell_value(row, start_col + 1).upper()
-                count = sheet.cell_value(row, start_col + 2)
-                amount = sheet.cell_value(row, start_col + 4)
+            if row[start_col + 1]:
+                credit_type = row[start_col + 1].upper()
+                count = row[start_col + 2]
+                amount = row[start_col + 4]
             else:
-                credit_type = sheet.cell_value(row, start_col + 2).upper()
-                count = sheet.cell_value(row, start_col + 3)
-                amount = sheet.cell_value(row, start_col + 5)
+                credit_type = row[start_col + 2].upper()
+                count = row[start_col + 3]
+                amount = row[start_col + 5]
             if credit_type == 'CHEQ':
-                row += 1
                 continue
             if credit_type not in self.credit_types:
-                raise ValueError('Cannot parse credit type %s in row %d' % (credit_type, row))
+                raise ValueError('Cannot parse credit type %s in row %d' % (credit_type, row_number))
             credits_key, amount_key = self.credit_types[credit_type]
-            self.credits_by_prison[nomis_id][credits_key] = int(count)
-            self.credits_by_prison[nomis_id][amount_key] = int(amount * 100)
-            row += 1
+            # CSV files contain text rather than numbers
+            self.credits_by_prison[nomis_id][credits_key] = int(float(count))
+            self.credits_by_prison[nomis_id][amount_key] = int(float(amount) * 100)
 
     def clean_excel_file(self):
         excel_file = self.cleaned_data.get('excel_file')
@@ -158,12 +160,25 @@ class DigitalTakeupUploadForm(forms.Form):
     def save(self):
         from performance.models import DigitalTakeup
 
-        for nomis_id, credit_by_prison in self.credits_by_prison.items():
-            DigitalTakeup.objects.update_or_create(
-                defaults=credit_by_prison,
-                date=self.date,
-                prison_id=nomis_id,
+        fields = ['credits_by_post', 'credits_by_mtp', 'amount_by_post', 'amount_by_mtp']
+        existing = {
+            digital_takeup.prison_id: digital_takeup
+            for digital_takeup in DigitalTakeup.objects.select_for_update().filter(
+                date=self.date, prison_id__in=self.credits_by_prison,
             )
+        }
+        to_update = []
+        to_create = []
+        for nomis_id, credit_by_prison in self.credits_by_prison.items():
+            digital_takeup = existing.get(nomis_id)
+            if digital_takeup:
+                for field, value in credit_by_prison.items():
+                    setattr(digital_takeup, field, value)
+                to_update.append(digital_takeup)
+            else:
+                to_create.append(DigitalTakeup(date=self.date, prison_id=nomis_id, **credit_by_prison))
+        DigitalTakeup.objects.bulk_update(to_update, fields, batch_size=upsert_batch_size)
+        DigitalTakeup.objects.bulk_create(to_create, batch_size=upsert_batch_size)
 
 
 class UserSatisfactionUploadForm(forms.Form):
@@ -229,20 +244,26 @@ class UserSatisfactionUploadForm(forms.Form):
     def save(self):
         from performance.models import UserSatisfaction
 
-        self.date_min = list(self.records)[0]
-        self.date_max = self.date_min
+        # Keep track of records date range
+        self.date_min = min(self.records)
+        self.date_max = max(self.records)
 
-        for date, record in self.records.items():
-            UserSatisfaction.objects.update_or_create(
-                defaults={
-                    f'rated_{rating}': record[rating]
-                    for rating in range(1, 6)
-                },
-                date=date,
+        dates = list(self.records)
+        for chunk_start in range(0, len(dates), upsert_batch_size):
+            chunk = dates[chunk_start:chunk_start + upsert_batch_size]
+            existing = set(
+                UserSatisfaction.objects.select_for_update().filter(date__in=chunk).values_list('date', flat=True)
             )
-
-            # Keep track of records date range
-            if date < self.date_min:
-                self.date_min = date
-            if date > self.date_max:
-                self.date_max = date
+            to_update = []
+            to_create = []
+            for date in chunk:
+                user_satisfaction = UserSatisfaction(date=date, **{
+                    f'rated_{rating}': self.records[date][rating]
+                    for rating in range(1, 6)
+                })
+                if date in existing:
+                    to_update.append(user_satisfaction)
+                else:
+                    to_create.append(user_satisfaction)
+            UserSatisfaction.objects.bulk_update(to_update, UserSatisfaction.rating_field_names)
+            UserSatisfaction.objects.bulk_create(to_create)
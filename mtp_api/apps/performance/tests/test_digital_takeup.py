@@ -85,3 +85,30 @@ class DigitalTakeupUploadTestCase(TestCase):
         uptake_in_brixton = DigitalTakeup.objects.get(prison='BXI')
         self.assertEqual(uptake_in_brixton.amount_by_mtp, expected_bxi_amount)
         self.assertAlmostEqual(uptake_in_brixton.digital_takeup, expected_bxi_takeup, places=2)
+
+    def test_csv_parsing(self):
+        path = pathlib.Path(__file__).parent / 'files' / 'Money to Prisoner Stats - 07.12.2021.csv'
+        with File(path.open('rb')) as f:
+            form = DigitalTakeupUploadForm(data={}, files={'excel_file': f})
+            self.assertTrue(form.is_valid(), msg=form.errors.as_text())
+        form.save()
+        self.assertEqual(DigitalTakeup.objects.count(), 103)
+        uptake_in_brixton = DigitalTakeup.objects.get(prison='BXI')
+        self.assertEqual(uptake_in_brixton.amount_by_mtp, 62315)
+
+    def test_reupload_updates_existing_rows(self):
+        path = pathlib.Path(__file__).parent / 'files' / 'Money to Prisoner Stats - 07.12.2021.xlsx'
+        DigitalTakeup.objects.create(
+            date=datetime.date(2021, 12, 7), prison_id='BXI',
+            credits_by_post=1, credits_by_mtp=1, amount_by_post=100, amount_by_mtp=100,
+        )
+        with File(path.open('rb')) as f:
+            form = DigitalTakeupUploadForm(data={}, files={'excel_file': f})
+            self.assertTrue(form.is_valid(), msg=form.errors.as_text())
+        with self.assertNumQueries(5):
+            # savepoint, select existing rows, update in bulk, insert in bulk, release savepoint
+            form.save()
+        self.assertEqual(DigitalTakeup.objects.count(), 103)
+        uptake_in_brixton = DigitalTakeup.objects.get(prison='BXI')
+        self.assertEqual(uptake_in_brixton.credits_by_post, 0)
+        self.assertEqual(uptake_in_brixton.amount_by_mtp, 62315)
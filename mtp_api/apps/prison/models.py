@@ -7,6 +7,8 @@ from django.utils.translation import gettext_lazy as _
 
 from model_utils.models import TimeStampedModel
 
+from core.reference_cache import invalidate_on_change
+
 validate_prisoner_number = RegexValidator(r'^[A-Z]\d{4}[A-Z]{2}$', message=_('Invalid prisoner number'))
 
 
@@ -64,6 +66,9 @@ class Prison(TimeStampedModel):
         return self.shorten_name(self.name)
 
 
+invalidate_on_change('prisons', Prison, Population, Category)
+
+
 class PrisonBankAccount(models.Model):
     prison = models.OneToOneField(Prison, on_delete=models.CASCADE)
 
@@ -1,11 +1,15 @@
 from collections import defaultdict
 from copy import copy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
 import re
+import threading
+import time
 
 from django.conf import settings
 from django.core.cache import cache
-from django.test import override_settings, TestCase
+from django.test import override_settings, SimpleTestCase, TestCase
+import requests
 import responses
 
 from prison.models import PrisonerLocation
@@ -15,6 +19,7 @@ from prison.tests.utils import (
     random_prisoner_name,
     random_prisoner_dob,
 )
+from prison.utils import HousingResolver
 
 
 class LoadPrisonerLocationsFromDevPrisonAPITestCase(TestCase):
@@ -141,3 +146,140 @@ class LoadPrisonerLocationsFromDevPrisonAPITestCase(TestCase):
             expected_name = prisoner_info['given_name'] + ' ' + prisoner_info['surname']
             self.assertEqual(location.prisoner_name, expected_name)
             self.assertEqual(str(location.prisoner_dob), prisoner_info['date_of_birth'])
+
+
+class FakeNomisHousingServer(ThreadingHTTPServer):
+    """
+    Local HTTP server responding with prisoner housing locations after a configurable delay
+    """
+    daemon_threads = True
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.requested = []
+        self.in_progress = 0
+        self.max_in_progress = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), FakeNomisHousingRequestHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class FakeNomisHousingRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        server = self.server
+        prisoner_number = self.path.rstrip('/').split('/')[-1]
+        with server.lock:
+            server.requested.append(prisoner_number)
+            server.in_progress += 1
+            server.max_in_progress = max(server.max_in_progress, server.in_progress)
+        try:
+            time.sleep(server.delays.get(prisoner_number, 0.05))
+            body = json.dumps({
+                'housing_location': {
+                    'description': f'{prisoner_number}-A-1-001',
+                    'levels': [{'type': 'Wing', 'value': 'A'}],
+                },
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_progress -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+# resolved housing is cached so a local memory cache keeps these tests away from the database
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class HousingResolverTestCase(SimpleTestCase):
+    prisoner_numbers = [f'A{number:04}BC' for number in range(12)]
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def start_server(self, delays=None):
+        server = FakeNomisHousingServer(delays or {})
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def make_lookup(self, server):
+        def lookup(prisoner_number):
+            response = requests.get(f'{server.url}/offenders/{prisoner_number}/location', timeout=5)
+            response.raise_for_status()
+            return response.json()['housing_location']
+
+        return lookup
+
+    def test_lookups_made_concurrently_within_limit(self):
+        server = self.start_server()
+        resolver = HousingResolver(self.make_lookup(server), concurrency=4, timeout=10, cache_ttl=0)
+
+        locations = resolver.resolve(self.prisoner_numbers)
+
+        self.assertSetEqual(set(locations), set(self.prisoner_numbers))
+        self.assertEqual(locations['A0003BC']['description'], 'A0003BC-A-1-001')
+        # each prisoner is looked up once with several, but not too many, lookups in progress at a time
+        self.assertCountEqual(server.requested, self.prisoner_numbers)
+        self.assertGreater(server.max_in_progress, 1)
+        self.assertLessEqual(server.max_in_progress, 4)
+
+    def test_results_remembered_by_resolver(self):
+        server = self.start_server()
+        resolver = HousingResolver(self.make_lookup(server), concurrency=4, timeout=10, cache_ttl=0)
+
+        resolver.resolve(self.prisoner_numbers[:6])
+        locations = resolver.resolve(self.prisoner_numbers)
+
+        self.assertEqual(len(locations), 12)
+        self.assertCountEqual(server.requested, self.prisoner_numbers)
+
+    def test_results_cached_across_runs_with_ttl(self):
+        server = self.start_server()
+        HousingResolver(self.make_lookup(server), concurrency=4, timeout=10, cache_ttl=60).resolve(
+            self.prisoner_numbers
+        )
+        locations = HousingResolver(self.make_lookup(server), concurrency=4, timeout=10, cache_ttl=60).resolve(
+            self.prisoner_numbers
+        )
+        self.assertTrue(all(locations.values()))
+        self.assertCountEqual(server.requested, self.prisoner_numbers)
+
+        HousingResolver(self.make_lookup(server), concurrency=4, timeout=10, cache_ttl=0).resolve(
+            self.prisoner_numbers[:2]
+        )
+        self.assertEqual(len(server.requested), 14)
+
+    def test_slow_and_failed_lookups_have_no_location(self):
+        slow_prisoner_number, failing_prisoner_number = self.prisoner_numbers[:2]
+        server = self.start_server({slow_prisoner_number: 3})
+        lookup = self.make_lookup(server)
+
+        def lookup_or_fail(prisoner_number):
+            if prisoner_number == failing_prisoner_number:
+                raise requests.ConnectionError
+            return lookup(prisoner_number)
+
+        resolver = HousingResolver(lookup_or_fail, concurrency=4, timeout=1, cache_ttl=60)
+        with self.assertLogs('mtp', level='WARNING'):
+            locations = resolver.resolve(self.prisoner_numbers)
+
+        self.assertIsNone(locations[slow_prisoner_number])
+        self.assertIsNone(locations[failing_prisoner_number])
+        self.assertTrue(all(
+            locations[prisoner_number]
+            for prisoner_number in self.prisoner_numbers[2:]
+        ))
+        # missing locations are not cached for future runs
+        self.assertIsNone(cache.get(HousingResolver.cache_key_prefix + slow_prisoner_number))
@@ -1,6 +1,9 @@
+import concurrent.futures
 import logging
-from typing import Optional
+from typing import Callable, Dict, Iterable, Optional
 
+from django.conf import settings
+from django.core.cache import cache
 import requests
 from mtp_common import nomis
 
@@ -45,3 +48,71 @@ def fetch_prisoner_location_from_nomis(prisoner_location: PrisonerLocation) -> O
         # takes too long to do synchronously off the back of a user-triggered API Request
         prisoner_location.prison = new_prison
         return prisoner_location
+
+
+class HousingResolver:
+    """
+    Looks up housing locations of many prisoners concurrently, remembering results for the lifetime
+    of the resolver and, if a TTL is set, in the cache so that they can be reused by subsequent runs.
+    Prisoners whose housing cannot be found within the timeout are given no location.
+    """
+    cache_key_prefix = 'nomis-housing-'
+
+    def __init__(self, lookup: Callable[[str], Optional[dict]], concurrency=None, timeout=None, cache_ttl=None):
+        """
+        :param lookup: function returning the housing location of one prisoner or None
+        :param concurrency: maximum number of lookups in progress at once
+        :param timeout: seconds to wait for all outstanding lookups
+        :param cache_ttl: seconds to cache found locations across runs; 0 disables
+        """
+        self.lookup = lookup
+        self.concurrency = concurrency or settings.NOMIS_HOUSING_LOOKUP_CONCURRENCY
+        self.timeout = timeout or settings.NOMIS_HOUSING_LOOKUP_TIMEOUT
+        self.cache_ttl = settings.NOMIS_HOUSING_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.locations = {}
+
+    def resolve(self, prisoner_numbers: Iterable[str]) -> Dict[str, Optional[dict]]:
+        prisoner_numbers = set(prisoner_numbers)
+        to_look_up = prisoner_numbers - self.locations.keys()
+        if to_look_up and self.cache_ttl:
+            cached_locations = cache.get_many([self.cache_key_prefix + number for number in to_look_up])
+            for key, location in cached_locations.items():
+                self.locations[key[len(self.cache_key_prefix):]] = location
+            to_look_up -= self.locations.keys()
+        if to_look_up:
+            self.look_up(sorted(to_look_up))
+        return {
+            prisoner_number: self.locations.get(prisoner_number)
+            for prisoner_number in prisoner_numbers
+        }
+
+    def look_up(self, prisoner_numbers):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        futures = {
+            executor.submit(self.lookup, prisoner_number): prisoner_number
+            for prisoner_number in prisoner_numbers
+        }
+        done, not_done = concurrent.futures.wait(futures, timeout=self.timeout)
+        # do not wait for outstanding lookups
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not_done:
+            logger.warning(
+                'Housing lookup in NOMIS timed out for %(count)d prisoners',
+                {'count': len(not_done)}
+            )
+
+        found_locations = {}
+        for future in done:
+            prisoner_number = futures[future]
+            try:
+                location = future.result()
+            except Exception:
+                logger.exception('Cannot look up housing for %(prisoner_number)s', {'prisoner_number': prisoner_number})
+                location = None
+            self.locations[prisoner_number] = location
+            if location:
+                found_locations[self.cache_key_prefix + prisoner_number] = location
+        for future in not_done:
+            self.locations[futures[future]] = None
+        if found_locations and self.cache_ttl:
+            cache.set_many(found_locations, timeout=self.cache_ttl)
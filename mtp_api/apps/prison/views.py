@@ -14,7 +14,7 @@ from rest_framework.response import Response
 
 from core.permissions import ActionsBasedPermissions, ActionsBasedViewPermissions
 from core.serializers import NullSerializer
-from core.views import AdminViewMixin
+from core.views import AdminViewMixin, ReferenceDataCacheMixin
 from credit.signals import credit_prisons_need_updating
 from mtp_auth.models import PrisonUserMapping
 from mtp_auth.permissions import (
@@ -74,7 +74,7 @@ class PrisonerLocationView(
 
     def check_object_permissions(self, request, obj):
         super().check_object_permissions(request, obj)
-        if obj.prison not in PrisonUserMapping.objects.get_prison_set_for_user(
+        if obj.prison_id not in PrisonUserMapping.objects.get_prison_ids_for_user(
             self.request.user
         ):
             self.permission_denied(
@@ -171,10 +171,17 @@ class PrisonerAccountBalanceView(mixins.RetrieveModelMixin, viewsets.GenericView
     lookup_value_regex = '[A-Za-z][0-9]{4}[A-Za-z]{2}'
 
 
-class PrisonView(mixins.ListModelMixin, viewsets.GenericViewSet):
+class PrisonView(ReferenceDataCacheMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     permission_classes = (AllowAny,)
     serializer_class = PrisonSerializer
-    queryset = Prison.objects.all()
+    queryset = Prison.objects.prefetch_related('populations', 'categories')
+    reference_data_namespace = 'prisons'
+
+    def get_reference_data_cache_key(self, request):
+        if self.request.GET.get('exclude_empty_prisons', '').lower() == 'true':
+            # depends on prisoner locations
+            return None
+        return super().get_reference_data_cache_key(request)
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
@@ -183,16 +190,18 @@ class PrisonView(mixins.ListModelMixin, viewsets.GenericViewSet):
         return queryset
 
 
-class PopulationView(mixins.ListModelMixin, viewsets.GenericViewSet):
+class PopulationView(ReferenceDataCacheMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = PopulationSerializer
     queryset = Population.objects.all()
+    reference_data_namespace = 'prisons'
 
 
-class CategoryView(mixins.ListModelMixin, viewsets.GenericViewSet):
+class CategoryView(ReferenceDataCacheMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    reference_data_namespace = 'prisons'
 
 
 class PrisonerBalanceUploadView(AdminViewMixin, FormView):
@@ -265,5 +274,5 @@ class PrisonerCreditNoticeEmailView(
         queryset = super().filter_queryset(queryset)
         if not self.detail:
             # only filter list view so access to detail objects are controlled by permissions instead
-            queryset = queryset.filter(prison__in=PrisonUserMapping.objects.get_prison_set_for_user(self.request.user))
+            queryset = queryset.filter(prison__in=PrisonUserMapping.objects.get_prison_ids_for_user(self.request.user))
         return queryset
@@ -9,6 +9,7 @@ class FIUMonitoredDebitCardsSerialiser(Serialiser):
     Serialises debit cards that are monitored by FIU
     """
     record_type = 'fiu_senders_debit_cards'
+    incremental = False
 
     def get_queryset(self):
         return DebitCardSenderDetails.objects.filter(monitoring_users__groups__name='FIU').distinct()
@@ -45,6 +46,7 @@ class FIUMonitoredPrisonerSerialiser(Serialiser):
     Serialises prisoners that are monitored by FIU
     """
     record_type = 'fiu_prisoners'
+    incremental = False
 
     def get_queryset(self):
         return PrisonerProfile.objects.filter(monitoring_users__groups__name='FIU').distinct()
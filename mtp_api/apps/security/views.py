@@ -15,6 +15,8 @@ from core.filters import (
     MultipleValueFilter,
     SplitTextInMultipleFieldsFilter,
 )
+from core.db_router import ReplicaReadMixin
+from core.pagination import EstimatedCountPagination
 from core.permissions import ActionsBasedPermissions
 from credit.constants import CreditSource
 from credit.models import Credit
@@ -169,7 +171,7 @@ class SenderProfileListFilter(BaseFilterSet):
 
 
 class SenderProfileView(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
+    ReplicaReadMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
     viewsets.GenericViewSet
 ):
     queryset = SenderProfile.objects.all().annotate(
@@ -181,6 +183,7 @@ class SenderProfileView(
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
     filterset_class = SenderProfileListFilter
     serializer_class = SenderProfileSerializer
+    pagination_class = EstimatedCountPagination
     ordering_param = api_settings.ORDERING_PARAM
     ordering_fields = (
         'prisoner_count', 'prison_count', 'credit_count', 'credit_total',
@@ -286,7 +289,7 @@ class PrisonerProfileListFilter(BaseFilterSet):
 
 
 class PrisonerProfileView(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
+    ReplicaReadMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
     viewsets.GenericViewSet
 ):
     queryset = PrisonerProfile.objects.all().annotate(
@@ -298,6 +301,7 @@ class PrisonerProfileView(
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
     filterset_class = PrisonerProfileListFilter
     serializer_class = PrisonerProfileSerializer
+    pagination_class = EstimatedCountPagination
     ordering_fields = (
         'sender_count',
         'credit_count',
@@ -410,7 +414,7 @@ class RecipientProfileListFilter(BaseFilterSet):
 
 
 class RecipientProfileView(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
+    ReplicaReadMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, MonitorProfileMixin,
     viewsets.GenericViewSet
 ):
     queryset = RecipientProfile.objects.exclude(
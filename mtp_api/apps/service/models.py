@@ -3,6 +3,7 @@ from django.db import models
 from django.utils import timezone
 from django.utils.text import capfirst
 
+from core.reference_cache import Snapshot, invalidate_on_change
 from service.constants import NotificationTarget, Service
 
 
@@ -53,3 +54,34 @@ class Notification(models.Model):
     @property
     def level_label(self):
         return messages.DEFAULT_TAGS.get(self.level, messages.DEFAULT_TAGS[messages.ERROR])
+
+
+def get_next_boundary(records, now):
+    boundaries = [
+        boundary
+        for record in records
+        for boundary in (record.start, record.end)
+        if boundary and boundary > now
+    ]
+    if boundaries:
+        return min(boundaries).timestamp()
+
+
+def load_downtimes():
+    now = timezone.now()
+    downtimes = list(Downtime.objects.exclude(end__lte=now))
+    return downtimes, get_next_boundary(downtimes, now)
+
+
+def load_notifications():
+    now = timezone.now()
+    notifications = list(Notification.objects.exclude(end__lt=now))
+    return notifications, get_next_boundary(notifications, now)
+
+
+# downtimes and notifications are read by every public page so they are held in memory
+# and reloaded when they change or when one starts or ends
+downtime_snapshot = Snapshot('downtimes', load_downtimes)
+notification_snapshot = Snapshot('notifications', load_notifications)
+invalidate_on_change('downtimes', Downtime)
+invalidate_on_change('notifications', Notification)
@@ -4,6 +4,7 @@ import json
 from django.test import TestCase
 from django.utils import timezone
 
+from core.reference_cache import clear_snapshots
 from service.constants import Service
 from service.models import Downtime
 
@@ -66,6 +67,10 @@ class DowntimeTestCase(TestCase):
 
 
 class DowntimeHealthcheckTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        clear_snapshots()
+
     def _get_healthcheck_data(self):
         response = self.client.get('/service-availability/')
         return json.loads(str(response.content, 'utf-8'))
@@ -108,3 +113,13 @@ class DowntimeHealthcheckTestCase(TestCase):
         data = self._get_healthcheck_data()
         self.assertTrue(data['*']['status'])
         self.assertTrue(data['gov_uk_pay']['status'])
+
+    def test_healthcheck_read_from_memory(self):
+        self._get_healthcheck_data()
+        with self.assertNumQueries(0):
+            data = self._get_healthcheck_data()
+        self.assertTrue(data['*']['status'])
+
+        Downtime.objects.create(service=Service.gov_uk_pay, start=timezone.now() - timedelta(hours=1))
+        data = self._get_healthcheck_data()
+        self.assertFalse(data['gov_uk_pay']['status'])
@@ -6,6 +6,7 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from core.reference_cache import clear_snapshots
 from core.tests.utils import make_test_users
 from mtp_auth.tests.utils import AuthTestCaseMixin
 from service.constants import NotificationTarget
@@ -18,6 +19,7 @@ class NotificationsTestCase(AuthTestCaseMixin, APITestCase):
 
     def setUp(self):
         super().setUp()
+        clear_snapshots()
         self.users = list(itertools.chain.from_iterable(
             make_test_users(clerks_per_prison=1).values())
         )
@@ -147,3 +149,23 @@ class NotificationsTestCase(AuthTestCaseMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 0)
         self.assertEqual(len(response.data['results']), 0)
+
+    def test_notifications_read_from_memory(self):
+        Notification.objects.create(
+            target=NotificationTarget.cashbook_login, level=20, public=True,
+            headline='Login', start=timezone.now() - datetime.timedelta(minutes=1),
+        )
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.data['count'], 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Notification.objects.create(
+            target=NotificationTarget.cashbook_login, level=20, public=True,
+            headline='Later', start=timezone.now() + datetime.timedelta(hours=1),
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, format='json')
+        self.assertEqual(response.data['count'], 1)
+        self.assertLessEqual(int(response['Cache-Control'].split('max-age=')[1].split(',')[0]), 60)
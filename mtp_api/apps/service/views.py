@@ -1,15 +1,39 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework import mixins, viewsets
 
+from core.views import reference_data_response
 from service.constants import Service
-from service.models import Downtime, Notification
+from service.models import downtime_snapshot, notification_snapshot
 from service.serializers import NotificationSerializer
 
 
+def get_active_downtime(downtimes, service: Service, now):
+    # matches Downtime.objects.active_downtime where downtimes without an end sort first
+    active_downtimes = sorted(
+        (
+            downtime
+            for downtime in downtimes
+            if downtime.service == service and downtime.start <= now and (not downtime.end or downtime.end > now)
+        ),
+        key=lambda downtime: (downtime.end is None, downtime.end or now),
+        reverse=True,
+    )
+    if active_downtimes:
+        return active_downtimes[0]
+
+
 def service_availability_view(_):
+    downtimes = downtime_snapshot.get()
+    now = timezone.now()
+
     def service_availability(service: Service):
-        downtime = Downtime.objects.active_downtime(service)
+        downtime = get_active_downtime(downtimes, service, now)
         if not downtime:
             return {'status': True}
         status = {'status': False}
@@ -33,13 +57,24 @@ class NotificationView(mixins.ListModelMixin, viewsets.GenericViewSet):
 
     def get_queryset(self):
         now = timezone.now()
-        return Notification.objects.exclude(end__lt=now).exclude(start__gt=now)
+        return [
+            notification
+            for notification in notification_snapshot.get()
+            if notification.start <= now and (notification.end is None or notification.end >= now)
+        ]
 
     def filter_queryset(self, queryset):
-        queryset = super().filter_queryset(queryset)
+        # notifications are filtered in memory as they are held in a snapshot
         if not self.request.user.is_authenticated:
-            queryset = queryset.filter(public=True)
+            queryset = [notification for notification in queryset if notification.public]
         target_filter = self.request.GET.get('target__startswith')
         if target_filter:
-            queryset = queryset.filter(target__startswith=target_filter)
+            queryset = [notification for notification in queryset if notification.target.startswith(target_filter)]
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        etag = hashlib.sha1(json.dumps(response.data, cls=DjangoJSONEncoder).encode()).hexdigest()
+        # clients must not keep notifications once one starts or ends
+        max_age = min(settings.REFERENCE_DATA_HTTP_MAX_AGE, notification_snapshot.time_to_expiry)
+        return reference_data_response(request, response.data, etag=etag, max_age=max_age)
@@ -0,0 +1,20 @@
+from user_event_log.utils import user_event_buffer
+
+
+class UserEventBufferMiddleware:
+    """
+    Saves buffered user events at the end of a response once USER_EVENT_LOG_FLUSH_SIZE are waiting,
+    while the request's database connection is still open
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        try:
+            user_event_buffer.flush_if_full()
+        except Exception:
+            # already logged and the events are kept to be retried
+            pass
+        return response
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:00
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('user_event_log', '0002_alter_userevent_data'),
+    ]
+    operations = [
+        migrations.AlterField(
+            model_name='userevent',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 from user_event_log.constants import UserEventKind
 
@@ -33,7 +34,8 @@ class UserEvent(models.Model):
     """
 
     id = models.BigAutoField(primary_key=True)
-    timestamp = models.DateTimeField(auto_now=True, db_index=True)
+    # set when the event happens rather than when buffered events are saved
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -1,17 +1,23 @@
 from datetime import datetime
+from unittest import mock
 from unittest.mock import Mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
 from django.utils.timezone import make_aware
 from model_bakery import baker
 
 from user_event_log.constants import UserEventKind
-from user_event_log.utils import record_user_event
+from user_event_log.models import UserEvent
+from user_event_log.middleware import UserEventBufferMiddleware
+from user_event_log.utils import record_user_event, user_event_buffer
 
 User = get_user_model()
 
 
+@override_settings(USER_EVENT_LOG_FLUSH_SIZE=0)
 class RecordUserEventTestCase(TestCase):
     """
     Tests related to the record_user_event util function.
@@ -59,3 +65,66 @@ class RecordUserEventTestCase(TestCase):
             self.assertEqual(event.kind, UserEventKind.noms_ops_search)
             self.assertEqual(event.api_url_path, 'test-path')
             self.assertEqual(event.data, expected_data)
+
+
+@override_settings(USER_EVENT_LOG_FLUSH_SIZE=3, USER_EVENT_LOG_FLUSH_INTERVAL=3600)
+class BufferedUserEventTestCase(TestCase):
+    """
+    Tests related to saving buffered user events in bulk.
+    """
+    def setUp(self):
+        super().setUp()
+        self.request = Mock(user=baker.make(User), path='test-path')
+
+    def tearDown(self):
+        user_event_buffer.flush()
+        super().tearDown()
+
+    def finish_response(self):
+        UserEventBufferMiddleware(lambda request: HttpResponse())(self.request)
+
+    def test_events_saved_at_end_of_response_once_enough_are_waiting(self):
+        first_event = record_user_event(self.request, UserEventKind.noms_ops_search, data={'a': 1})
+        record_user_event(self.request, UserEventKind.noms_ops_search, data={'a': 2})
+        self.finish_response()
+        self.assertFalse(UserEvent.objects.exists())
+
+        record_user_event(self.request, UserEventKind.noms_ops_search, data={'a': 3})
+        self.assertFalse(UserEvent.objects.exists())
+        with self.assertNumQueries(1):
+            self.finish_response()
+        self.assertEqual(len(user_event_buffer), 0)
+
+        events = UserEvent.objects.order_by('pk')
+        self.assertListEqual([event.data for event in events], [{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(events[0].user, self.request.user)
+        self.assertEqual(events[0].api_url_path, 'test-path')
+        self.assertEqual(events[0].timestamp, first_event.timestamp)
+
+    def test_events_kept_when_they_cannot_be_saved(self):
+        for _ in range(3):
+            record_user_event(self.request, UserEventKind.noms_ops_search)
+        with mock.patch.object(UserEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('mtp', level='ERROR'):
+            self.finish_response()
+        self.assertEqual(len(user_event_buffer), 3)
+
+        user_event_buffer.flush()
+        self.assertEqual(UserEvent.objects.count(), 3)
+
+    @override_settings(USER_EVENT_LOG_MAX_BUFFER_SIZE=4)
+    def test_oldest_events_discarded_when_too_many_cannot_be_saved(self):
+        for index in range(3):
+            record_user_event(self.request, UserEventKind.noms_ops_search, data={'index': index})
+        with mock.patch.object(UserEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('mtp', level='ERROR'):
+            self.finish_response()
+            for index in range(3, 6):
+                record_user_event(self.request, UserEventKind.noms_ops_search, data={'index': index})
+        self.assertEqual(len(user_event_buffer), 4)
+
+        user_event_buffer.flush()
+        self.assertListEqual(
+            [event.data['index'] for event in UserEvent.objects.order_by('pk')],
+            [2, 3, 4, 5],
+        )
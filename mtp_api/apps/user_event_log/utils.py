@@ -1,13 +1,122 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
 from user_event_log.models import UserEvent
 
+logger = logging.getLogger('mtp')
+
+
+class UserEventBuffer:
+    """
+    Collects user events in memory so that they can be saved in bulk outside of request handling:
+    by UserEventBufferMiddleware at the end of a response once USER_EVENT_LOG_FLUSH_SIZE events are waiting,
+    by a background timer once the oldest has waited USER_EVENT_LOG_FLUSH_INTERVAL seconds
+    and when the process exits. Events that cannot be saved are kept to be retried, but no more than
+    USER_EVENT_LOG_MAX_BUFFER_SIZE are held so the oldest are discarded if the database is unavailable for long.
+
+    Events are saved directly rather than in the uWSGI spooler because spooled tasks that fail are not retried.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.timer = None
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        with self.lock:
+            self.events.append(event)
+            self.discard_excess()
+            self.start_timer()
+
+    def discard_excess(self):
+        excess = len(self.events) - settings.USER_EVENT_LOG_MAX_BUFFER_SIZE
+        if excess > 0:
+            del self.events[:excess]
+            logger.error('Discarded %d unsaved user events', excess)
+
+    def start_timer(self):
+        if self.timer is None:
+            self.timer = threading.Timer(settings.USER_EVENT_LOG_FLUSH_INTERVAL, self.flush_from_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush_if_full(self):
+        if len(self.events) >= settings.USER_EVENT_LOG_FLUSH_SIZE:
+            self.flush()
+
+    def flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            # already logged and the events are kept to be retried
+            pass
+        finally:
+            # the timer thread's database connections are not closed by request handling
+            connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            events, self.events = self.events, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not events:
+            return
+
+        try:
+            UserEvent.objects.bulk_create(
+                [UserEvent(**event) for event in events],
+                batch_size=500,
+            )
+        except Exception:
+            logger.exception('Could not save %d user events, will retry', len(events))
+            with self.lock:
+                self.events[:0] = events
+                self.discard_excess()
+                self.start_timer()
+            raise
+
+
+user_event_buffer = UserEventBuffer()
+
+
+@atexit.register
+def flush_user_event_buffer_on_exit():
+    try:
+        user_event_buffer.flush()
+    except Exception:
+        pass
+
 
 def record_user_event(request, kind, data=None):
-    """Records a user event in the database."""
-    event = UserEvent(
-        user=request.user,
-        kind=kind,
-        api_url_path=request.path,
-        data=data,
-    )
-    event.save()
-    return event
+    """
+    Records a user event in the database, immediately if USER_EVENT_LOG_FLUSH_SIZE is 0
+    or otherwise in bulk with other buffered events at the end of a response
+    """
+    if settings.USER_EVENT_LOG_FLUSH_SIZE <= 0:
+        event = UserEvent(
+            user=request.user,
+            kind=kind,
+            api_url_path=request.path,
+            data=data,
+        )
+        event.save()
+        return event
+
+    event = {
+        'user_id': request.user.pk,
+        'kind': kind,
+        'api_url_path': request.path,
+        'data': data,
+        'timestamp': timezone.now(),
+    }
+    user_event_buffer.add(event)
+    return UserEvent(**event)
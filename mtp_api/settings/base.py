@@ -95,6 +95,10 @@ WSGI_APPLICATION = 'mtp_api.wsgi.application'
 ROOT_URLCONF = 'mtp_api.urls'
 MIDDLEWARE = (
     'mtp_common.metrics.middleware.RequestMetricsMiddleware',
+    'user_event_log.middleware.UserEventBufferMiddleware',
+    'core.middleware.QueryMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +128,12 @@ AUTODISCOVER_HEALTHCHECKS = True
 
 METRICS_USER = os.environ.get('METRICS_USER', 'prom')
 METRICS_PASS = os.environ.get('METRICS_PASS', 'prom')
+# log views executing more SQL queries than this per request; 0 disables logging
+QUERY_METRICS_LOG_THRESHOLD = int(os.environ.get('QUERY_METRICS_LOG_THRESHOLD', '0'))
+# log the fingerprint of SQL queries taking longer than this many milliseconds; 0 disables logging
+QUERY_METRICS_SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('QUERY_METRICS_SLOW_QUERY_THRESHOLD_MS', '0'))
+# compress JSON responses of at least this many bytes if clients accept brotli or gzip; 0 disables compression
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', '2048'))
 
 # security tightening
 # some overridden in prod/docker settings where SSL is ensured
@@ -137,14 +147,40 @@ CSRF_COOKIE_SECURE = False
 # Database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db_backends.postgresql',
         'NAME': os.environ.get('DB_NAME', 'mtp_api'),
         'USER': os.environ.get('DB_USERNAME', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', ''),
         'PORT': os.environ.get('DB_PORT', ''),
+        # connections are returned to a pool shared by each process's threads at the end of requests
+        # so CONN_MAX_AGE should stay 0; a MAX_SIZE of 0 turns pooling off
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            # seconds to wait for a connection when all are in use
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            # seconds after which connections are replaced
+            'MAX_AGE': int(os.environ.get('DB_POOL_MAX_AGE', '1800')),
+            # seconds after which unused connections are closed
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+            # connections unused for this many seconds are checked before being handed out
+            'CHECK_AFTER': int(os.environ.get('DB_POOL_CHECK_AFTER', '30')),
+        },
     }
 }
+# optional read-only replica used by reporting views and commands
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ['DB_REPLICA_HOST'],
+        PORT=os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# reads use the primary database if the replica lags by more than this many seconds
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DB_REPLICA_MAX_LAG', '30'))
+# reads use the primary database for this many seconds after a user's own writes
+DATABASE_REPLICA_READ_YOUR_WRITES_PERIOD = int(os.environ.get('DB_REPLICA_READ_YOUR_WRITES_PERIOD', '60'))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -208,12 +244,36 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# the cache is shared by all processes unless it is in local memory, which is the default only for local development;
+# the database cache needs `manage.py createcachetable`, redis needs django-redis installed
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem' if ENVIRONMENT == 'local' else 'database')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'mtp',
-    }
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'mtp',
+        },
+        'database': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'mtp_cache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '50000'))},
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '..', 'cache')),
+        },
+        'redis': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://localhost:6379/0'),
+        },
+    }[CACHE_BACKEND]
 }
+# seconds for which reference data like prisons and notifications is cached unless it changes
+REFERENCE_DATA_CACHE_TTL = int(os.environ.get('REFERENCE_DATA_CACHE_TTL', '3600'))
+# seconds for which clients may reuse reference data before revalidating it with a conditional request
+REFERENCE_DATA_HTTP_MAX_AGE = int(os.environ.get('REFERENCE_DATA_HTTP_MAX_AGE', '60'))
+# seconds between checks of whether reference data held in memory was changed by another process
+REFERENCE_DATA_SNAPSHOT_CHECK_INTERVAL = int(os.environ.get('REFERENCE_DATA_SNAPSHOT_CHECK_INTERVAL', '10'))
 
 GOVUK_NOTIFY_API_KEY = os.environ.get('GOVUK_NOTIFY_API_KEY', '')
 GOVUK_NOTIFY_REPLY_TO_PUBLIC = os.environ.get('GOVUK_NOTIFY_REPLY_TO_PUBLIC', '')
@@ -291,6 +351,8 @@ if os.environ.get('SENTRY_DSN'):
         max_request_body_size='medium' if DEBUG else 'never',
     )
 
+# use orjson to render and parse API requests and responses
+FAST_JSON = os.environ.get('FAST_JSON', 'True') == 'True'
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -299,11 +361,19 @@ REST_FRAMEWORK = {
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
 }
+# large lists count matching rows up to this many and otherwise use the query planner's estimate
+# when clients request estimate_count=true; 0 disables
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('PAGINATION_COUNT_ESTIMATE_THRESHOLD', '10000'))
 REQUEST_PAGE_DAYS = 5
 
 # control the time a session exists for; client apps should use this value as well
@@ -323,9 +393,30 @@ OAUTH2_PROVIDER = {
     },
     'OAUTH2_VALIDATOR_CLASS': 'mtp_auth.validators.ApplicationRequestValidator',
 }
+# seconds for which access tokens, their users and permissions are cached; 0 disables caching.
+# only enabled by default with redis: revocations cannot be forgotten by other processes using their own local memory
+# and reading the database cache costs as much as the queries it would save
+OAUTH2_TOKEN_CACHE_TTL = int(os.environ.get('OAUTH2_TOKEN_CACHE_TTL', '60' if CACHE_BACKEND == 'redis' else '0'))
 OAUTH2_PROVIDER_APPLICATION_MODEL = 'oauth2_provider.Application'
 MTP_AUTH_LOCKOUT_COUNT = 5  # 5 times
 MTP_AUTH_LOCKOUT_LOCKOUT_PERIOD = 10 * 60  # 10 minutes, update mtp-common locked_out message if changes
+# whether failed login attempts are counted in the cache rather than the database;
+# only enabled by default with redis, whose increments are atomic across processes so none are lost
+MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS = os.environ.get(
+    'MTP_AUTH_LOCKOUT_CACHE_ATTEMPTS', 'True' if CACHE_BACKEND == 'redis' else 'False'
+) == 'True'
+# seconds for which the prisons a user is mapped to are cached between requests; 0 disables caching.
+# only enabled by default with redis: changes cannot be forgotten by other processes using their own local memory
+# and reading the database cache costs as much as the query it would save
+PRISON_USER_MAPPING_CACHE_TTL = int(os.environ.get(
+    'PRISON_USER_MAPPING_CACHE_TTL', '60' if CACHE_BACKEND == 'redis' else '0'
+))
+# user events are buffered and saved in bulk once this many are waiting or the oldest has waited for the interval;
+# a size of 0 saves each event immediately
+USER_EVENT_LOG_FLUSH_SIZE = int(os.environ.get('USER_EVENT_LOG_FLUSH_SIZE', '50'))
+USER_EVENT_LOG_FLUSH_INTERVAL = int(os.environ.get('USER_EVENT_LOG_FLUSH_INTERVAL', '10'))
+# the oldest unsaved user events are discarded beyond this many, e.g. if the database is unavailable
+USER_EVENT_LOG_MAX_BUFFER_SIZE = int(os.environ.get('USER_EVENT_LOG_MAX_BUFFER_SIZE', '5000'))
 
 REF_CODE_BASE = 900001
 CARD_REF_CODE_BASE = 800001
@@ -351,9 +442,16 @@ HMPPS_CLIENT_ID = os.environ.get('HMPPS_CLIENT_ID', 'prisoner-money')
 HMPPS_CLIENT_SECRET = os.environ.get('HMPPS_CLIENT_SECRET', '')
 HMPPS_AUTH_BASE_URL = os.environ.get('HMPPS_AUTH_BASE_URL', '')
 HMPPS_PRISON_API_BASE_URL = os.environ.get('HMPPS_PRISON_API_BASE_URL', '')
+# housing lookups for prisoner credit notices
+NOMIS_HOUSING_LOOKUP_CONCURRENCY = int(os.environ.get('NOMIS_HOUSING_LOOKUP_CONCURRENCY', '10'))
+NOMIS_HOUSING_LOOKUP_TIMEOUT = int(os.environ.get('NOMIS_HOUSING_LOOKUP_TIMEOUT', '120'))
+NOMIS_HOUSING_CACHE_TTL = int(os.environ.get('NOMIS_HOUSING_CACHE_TTL', '0'))
 
 INVOICE_NUMBER_BASE = 1000000
 
+# number of processes rendering prisoner credit notice bundles in parallel
+PRISONER_CREDIT_NOTICE_WORKERS = int(os.environ.get('PRISONER_CREDIT_NOTICE_WORKERS', '4'))
+
 ANALYTICAL_PLATFORM_BUCKET = os.environ.get('ANALYTICAL_PLATFORM_BUCKET', '')
 ANALYTICAL_PLATFORM_BUCKET_PATH = os.environ.get('ANALYTICAL_PLATFORM_BUCKET_PATH', '')
 